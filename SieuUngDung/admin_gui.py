@@ -2,9 +2,10 @@ import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 import nltk
 from nltk.corpus import wordnet as wn
-import requests
 import threading
 import os
+from harvester import harvest_rules
+from lookup_cache import LookupCache, CacheStats
 
 # ==========================================
 # 1. SETUP
@@ -19,31 +20,6 @@ except LookupError:
 # 2. ENGINES
 # ==========================================
 
-def fetch_wikidata_composition_only(keyword):
-    """WIKIDATA: Chỉ lấy luật AND (Parts/Material)"""
-    parts = []
-    url = "https://query.wikidata.org/sparql"
-    query = f"""
-    SELECT DISTINCT ?compLabel WHERE {{
-      ?item rdfs:label "{keyword.lower()}"@en.
-      {{ ?item wdt:P527 ?comp. }} UNION {{ ?item wdt:P186 ?comp. }}
-      SERVICE wikibase:label {{ bd:serviceParam wikibase:language "en". }}
-    }}
-    LIMIT 10
-    """
-    try:
-        headers = {'User-Agent': 'ExpertSystemBot/DedupMode'}
-        r = requests.get(url, params={'format': 'json', 'query': query}, headers=headers, timeout=3)
-        data = r.json()
-        for item in data['results']['bindings']:
-            val = item['compLabel']['value'].lower()
-            if not val.startswith("q") and "http" not in val and val != keyword:
-                parts.append(val)
-        return list(set(parts))
-    except:
-        return []
-
-
 def fetch_wordnet_structure_only(keyword):
     """WORDNET: Chỉ lấy luật OR (Hyponyms)"""
     children = []
@@ -61,62 +37,18 @@ def fetch_wordnet_structure_only(keyword):
 # 3. LOGIC TẠO LUẬT
 # ==========================================
 
-def generate_optimized_rules(input_list, status_callback):
-    rules = set()
-    processed = set()
-    queue = [(w.strip().lower(), 0) for w in input_list if w.strip()]
-    MAX_NODES = 100
-    count = 0
-
-    while queue and count < MAX_NODES:
-        current_word, depth = queue.pop(0)
-        if current_word in processed: continue
-        processed.add(current_word)
-        count += 1
-
-        if status_callback:
-            status_callback(f"Processing ({count}): {current_word}...")
-
-        # --- 1. AND Rules (Wikidata) ---
-        if depth <= 1:
-            parts = fetch_wikidata_composition_only(current_word)
-            if len(parts) < 2:
-                syns = wn.synsets(current_word)
-                if syns:
-                    wn_parts = syns[0].part_meronyms() + syns[0].substance_meronyms()
-                    parts.extend([p.lemmas()[0].name().lower().replace('_', ' ') for p in wn_parts])
-
-            # Khử trùng và SẮP XẾP
-            parts = sorted(list(set(parts)))
-
-            if len(parts) >= 2:
-                # Lấy 4 phần tử đầu tiên, nhưng cũng phải đảm bảo 4 phần tử này được sắp xếp
-                selected_parts = sorted(parts[:4])
-                premises = " & ".join(selected_parts)
-
-                rule = f"{premises} -> {current_word} | Rule_AND_{current_word.replace(' ', '_')}"
-                rules.add(rule)
-
-        # --- 2. OR Rules (WordNet) ---
-        children = fetch_wordnet_structure_only(current_word)
-        chunk_size = 5
-        for i in range(0, len(children), chunk_size):
-            chunk = children[i:i + chunk_size]
-
-            if len(chunk) > 1:
-                # SẮP XẾP trước khi tạo luật OR
-                chunk = sorted(chunk)
-                premises = " v ".join(chunk)
-                rules.add(f"{premises} -> {current_word} | Rule_OR_{current_word}_{i}")
-            elif len(chunk) == 1:
-                rules.add(f"{chunk[0]} -> {current_word} | Rule_IsA_{current_word}_{i}")
-
-        if depth < 1:
-            for child in children:
-                if child not in processed:
-                    queue.append((child, depth + 1))
-
-    return sorted(list(rules))
+def fetch_wordnet_parts_only(keyword):
+    """WORDNET: Thành phần (part / substance meronyms), dùng khi Wikidata trả về quá ít"""
+    syns = wn.synsets(keyword)
+    if not syns: return []
+    wn_parts = syns[0].part_meronyms() + syns[0].substance_meronyms()
+    return [p.lemmas()[0].name().lower().replace('_', ' ') for p in wn_parts]
+
+
+def generate_optimized_rules(input_list, status_callback, cache=None):
+    # Duyệt theo tầng, truy vấn Wikidata song song (xem harvester.harvest); cache: LookupCache trên đĩa
+    return harvest_rules(input_list, fetch_wordnet_structure_only, fetch_wordnet_parts_only, status_callback,
+                         cache=cache)
 
 # ==========================================
 # 4. GUI (ĐÃ SỬA LỖI SAVE)
@@ -126,6 +58,8 @@ class AdminGUI(tk.Tk):
         super().__init__()
         self.title("Admin: Rule Generator (No Duplicates)")
         self.geometry("900x700")
+        # Kết quả tra cứu Wikidata / WordNet được giữ lại giữa các lần Generate
+        self.cache = LookupCache()
 
         tk.Label(self, text="KNOWLEDGE BASE MANAGER", font=("Arial", 16, "bold")).pack(pady=10)
 
@@ -157,12 +91,13 @@ class AdminGUI(tk.Tk):
     def run_logic(self, inp):
         topics = [x.strip() for x in inp.split(",") if x.strip()]
         # Gọi hàm logic bên ngoài class
-        self.new_rules = generate_optimized_rules(topics, lambda msg: self.lbl_status.config(text=msg))
+        self.cache.stats = CacheStats()
+        self.new_rules = generate_optimized_rules(topics, lambda msg: self.lbl_status.config(text=msg), self.cache)
 
         self.txt.insert(tk.END, f"# New Rules Generated:\n")
         for r in self.new_rules:
             self.txt.insert(tk.END, r + "\n")
-        self.lbl_status.config(text=f"Done. Generated {len(self.new_rules)} new rules.")
+        self.lbl_status.config(text=f"Done. Generated {len(self.new_rules)} new rules. ({self.cache.stats})")
 
     # =================================================
     # PHẦN SỬA LỖI Ở ĐÂY (Thêm @staticmethod)
@@ -0,0 +1,267 @@
+# ==========================================
+# HARVESTER - Thu thập tri thức song song (Wikidata SPARQL + WordNet) cho bộ sinh luật
+# ==========================================
+import asyncio
+import os
+import random
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from lookup_cache import LookupCache
+
+# Có thể trỏ sang một SPARQL server giả lập cục bộ khi kiểm thử
+DEFAULT_ENDPOINT = os.environ.get("WIKIDATA_SPARQL_ENDPOINT", "https://query.wikidata.org/sparql")
+USER_AGENT = 'ExpertSystemBot/DedupMode'
+MAX_NODES = 100
+CHUNK_SIZE = 5
+BATCH_SIZE = 25           # Số từ khóa trong một truy vấn VALUES
+PARTS_PER_KEYWORD = 10
+TIMEOUT_PER_KEYWORD = 0.2  # Thời gian đọc thêm cho mỗi từ khóa của lô (giây)
+
+# Mã HTTP đáng thử lại (quá tải / lỗi tạm thời phía server)
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+def _literal(keyword: str) -> str:
+    return '"' + keyword.lower().replace('\\', '\\\\').replace('"', '\\"') + '"@en'
+
+
+def composition_query(keywords: List[str]) -> str:
+    """
+    Một câu SPARQL lấy thành phần / vật liệu (P527, P186) cho cả lô từ khóa; ?kw cho biết mỗi dòng
+    thuộc từ khóa nào. Mỗi từ khóa là một truy vấn con có LIMIT PARTS_PER_KEYWORD riêng (nối bằng UNION),
+    nên từ khóa có rất nhiều thành phần không chiếm chỗ của các từ khóa khác trong lô.
+    """
+    blocks = " UNION ".join(f"""{{
+        SELECT DISTINCT ?kw ?comp WHERE {{
+          VALUES ?kw {{ {_literal(k)} }}
+          ?item rdfs:label ?kw.
+          {{ ?item wdt:P527 ?comp. }} UNION {{ ?item wdt:P186 ?comp. }}
+        }} LIMIT {PARTS_PER_KEYWORD}
+      }}""" for k in keywords)
+    return f"""
+    SELECT ?kw ?compLabel WHERE {{
+      {blocks}
+      SERVICE wikibase:label {{ bd:serviceParam wikibase:language "en". }}
+    }}
+    """
+
+
+def parse_composition(data: dict, keywords: List[str]) -> Dict[str, List[str]]:
+    """
+    Tách kết quả theo từ khóa: mỗi từ khóa giữ tối đa PARTS_PER_KEYWORD nhãn đầu tiên (như LIMIT của
+    truy vấn con), rồi bỏ mã Q chưa có nhãn, URL và chính từ khóa.
+    """
+    labels: Dict[str, List[str]] = {k.lower(): [] for k in keywords}
+    for item in data['results']['bindings']:
+        rows = labels.get(item['kw']['value'].lower())
+        if rows is not None and len(rows) < PARTS_PER_KEYWORD:
+            rows.append(item['compLabel']['value'].lower())
+    parts = {}
+    for k in keywords:
+        kw = k.lower()
+        parts[k] = list({v for v in labels[kw] if not v.startswith("q") and "http" not in v and v != kw})
+    return parts
+
+
+def word_rules(word: str, parts: List[str], children: List[str]) -> List[str]:
+    """Các luật sinh ra cho một từ: một luật AND từ thành phần, các luật OR / IsA từ từ con."""
+    rules = []
+    parts = sorted(set(parts))
+    if len(parts) >= 2:
+        selected_parts = sorted(parts[:4])
+        premises = " & ".join(selected_parts)
+        rules.append(f"{premises} -> {word} | Rule_AND_{word.replace(' ', '_')}")
+
+    for i in range(0, len(children), CHUNK_SIZE):
+        chunk = children[i:i + CHUNK_SIZE]
+        if len(chunk) > 1:
+            premises = " v ".join(sorted(chunk))
+            rules.append(f"{premises} -> {word} | Rule_OR_{word}_{i}")
+        elif len(chunk) == 1:
+            rules.append(f"{chunk[0]} -> {word} | Rule_IsA_{word}_{i}")
+    return rules
+
+
+class SparqlClient:
+    """
+    Truy vấn SPARQL bất đồng bộ trên một Session dùng chung (pool kết nối HTTP được tái sử dụng):
+    - từ khóa được gom thành lô tối đa `batch_size`, mỗi lô là một truy vấn VALUES;
+    - tối đa `concurrency` yêu cầu cùng lúc (semaphore, kích thước pool bằng nhau);
+    - từ khóa đang được truy vấn (ở lô khác) thì chờ kết quả lô đó, không gửi lại;
+    - `timeout` là thời gian chờ kết nối; thời gian chờ đọc là `timeout` cộng `timeout_per_keyword`
+      cho mỗi từ khóa của lô, vì truy vấn VALUES lớn chạy lâu hơn;
+    - lỗi mạng / 429 / 5xx được thử lại tối đa `retries` lần, chờ backoff * 2^lần (có nhiễu),
+      tôn trọng Retry-After nếu server trả về. Hết lượt thử, hoặc lỗi khác (4xx), thì trả về danh sách rỗng.
+    Có `cache` thì kết quả thành công được lưu lại (nguồn 'wikidata'), lần sau không cần mạng; mỗi lần
+    gọi compositions đọc và ghi bộ nhớ đệm bằng một giao dịch, chạy ngoài vòng lặp sự kiện.
+    """
+
+    def __init__(self, endpoint: str = None, concurrency: int = 8, timeout: float = 3.0,
+                 retries: int = 3, backoff: float = 0.5, cache: LookupCache = None,
+                 batch_size: int = BATCH_SIZE, timeout_per_keyword: float = TIMEOUT_PER_KEYWORD):
+        self.endpoint = endpoint or DEFAULT_ENDPOINT
+        self.timeout = timeout
+        self.timeout_per_keyword = timeout_per_keyword
+        self.retries = retries
+        self.backoff = backoff
+        self.concurrency = concurrency
+        self.cache = cache
+        self.batch_size = max(1, batch_size)
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = USER_AGENT
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._batches: Set[asyncio.Task] = set()
+        self.requests_sent = 0
+
+    async def composition(self, keyword: str) -> List[str]:
+        return (await self.compositions([keyword]))[keyword]
+
+    async def compositions(self, keywords: Iterable[str]) -> Dict[str, List[str]]:
+        """Thành phần của từng từ khóa (theo thứ tự đầu vào)."""
+        keywords = list(dict.fromkeys(keywords))
+        results: Dict[str, List[str]] = {}
+        if self.cache is not None:
+            results = await asyncio.to_thread(self.cache.get_many, 'wikidata', keywords)
+        waiting: Dict[str, asyncio.Future] = {}
+        fresh: List[str] = []
+        for kw in keywords:
+            if kw in results:
+                continue
+            future = self._inflight.get(kw)
+            if future is None:
+                future = self._inflight[kw] = asyncio.get_running_loop().create_future()
+                fresh.append(kw)
+            waiting[kw] = future
+
+        for i in range(0, len(fresh), self.batch_size):
+            task = asyncio.ensure_future(self._resolve(fresh[i:i + self.batch_size]))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+        store: List[Tuple[str, List[str]]] = []
+        for kw, future in waiting.items():
+            parts = await asyncio.shield(future)
+            if parts is not None and kw in fresh:
+                store.append((kw, parts))
+            results[kw] = parts if parts is not None else []
+        if store and self.cache is not None:
+            # Chỉ lời gọi đã gửi truy vấn mới ghi, cả lô trong một giao dịch
+            await asyncio.to_thread(self.cache.put_many, 'wikidata', store)
+        return {kw: results[kw] for kw in keywords}
+
+    async def _resolve(self, batch: List[str]):
+        parts_of = None
+        try:
+            parts_of = await self._fetch(batch)
+        finally:
+            for kw in batch:
+                future = self._inflight.pop(kw)
+                if not future.done():
+                    future.set_result(parts_of[kw] if parts_of is not None else None)
+
+    async def _fetch(self, batch: List[str]) -> Optional[Dict[str, List[str]]]:
+        """Kết quả đã tách theo từ khóa, hoặc None nếu hết lượt thử (khi đó không lưu vào cache)."""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        params = {'format': 'json', 'query': composition_query(batch)}
+        timeout = (self.timeout, self.timeout + self.timeout_per_keyword * len(batch))
+        for attempt in range(self.retries + 1):
+            delay = self.backoff * (2 ** attempt) * (1 + random.random() / 2)
+            async with self._semaphore:
+                try:
+                    self.requests_sent += 1
+                    # Lô lớn có thể vượt giới hạn độ dài URL của GET nên gửi bằng POST
+                    r = await asyncio.to_thread(self.session.post, self.endpoint, data=params,
+                                                timeout=timeout)
+                    if r.status_code not in RETRY_STATUS:
+                        if not r.ok:
+                            # Lỗi không đáng thử lại (4xx...): không đọc nội dung, không lưu cache
+                            return None
+                        return parse_composition(r.json(), batch)
+                    retry_after = r.headers.get('Retry-After', '')
+                    if retry_after.isdigit():
+                        delay = max(delay, float(retry_after))
+                except (requests.RequestException, ValueError, KeyError):
+                    pass
+            if attempt < self.retries:
+                await asyncio.sleep(delay)
+        return None
+
+    def close(self):
+        self.session.close()
+
+
+async def harvest(topics: Iterable[str], children_of: Callable[[str], List[str]],
+                  meronyms_of: Callable[[str], List[str]] = None, client: SparqlClient = None,
+                  max_nodes: int = MAX_NODES, max_depth: int = 1,
+                  status_callback: Callable[[str], None] = None, cache: LookupCache = None) -> List[str]:
+    """
+    Duyệt theo từng tầng từ các chủ đề (tầng 0) tới tầng max_depth, tối đa max_nodes từ.
+    Tập từ được xử lý và luật sinh ra giống hệt cách duyệt hàng đợi tuần tự (BFS) trước đây,
+    nhưng cả tầng được tra Wikidata bằng các truy vấn theo lô (VALUES) gửi song song. WordNet (cục bộ) được gọi
+    tuần tự trên vòng lặp sự kiện. Kết quả đã sắp xếp nên không phụ thuộc thứ tự hoàn thành.
+    Có `cache` thì các tra cứu WordNet cũng đi qua bộ nhớ đệm (nguồn 'wordnet', 'wordnet_parts'),
+    mỗi tầng một giao dịch đọc và một giao dịch ghi.
+    """
+    own_client = client is None
+    if own_client:
+        client = SparqlClient(cache=cache)
+
+    def lookup(source: str, fn: Callable[[str], List[str]], words: List[str]) -> Dict[str, List[str]]:
+        if cache is None:
+            return {w: fn(w) for w in words}
+        return cache.lookup_many(source, words, fn)
+
+    rules: Set[str] = set()
+    processed: Set[str] = set()
+    frontier = deque(w.strip().lower() for w in topics if w.strip())
+    count = 0
+    try:
+        for depth in range(max_depth + 1):
+            level: List[str] = []
+            while frontier and count < max_nodes:
+                word = frontier.popleft()
+                if word in processed:
+                    continue
+                processed.add(word)
+                count += 1
+                level.append(word)
+                if status_callback:
+                    status_callback(f"Processing ({count}): {word}...")
+            if not level:
+                break
+
+            parts_by_word = await client.compositions(level)
+            children = lookup('wordnet', children_of, level)
+            meronyms: Dict[str, List[str]] = {}
+            if meronyms_of is not None:
+                meronyms = lookup('wordnet_parts', meronyms_of, [w for w in level if len(parts_by_word[w]) < 2])
+            for word in level:
+                parts = parts_by_word[word] + meronyms.get(word, [])
+                rules.update(word_rules(word, parts, children[word]))
+
+            frontier = deque(c for w in level for c in children[w] if c not in processed)
+    finally:
+        if own_client:
+            client.close()
+    return sorted(rules)
+
+
+def harvest_rules(topics: Iterable[str], children_of: Callable[[str], List[str]],
+                  meronyms_of: Callable[[str], List[str]] = None, status_callback: Callable[[str], None] = None,
+                  cache: LookupCache = None, **client_options) -> List[str]:
+    """Bản đồng bộ của harvest (dùng trong luồng nền của GUI)."""
+    client = SparqlClient(cache=cache, **client_options)
+    try:
+        return asyncio.run(harvest(topics, children_of, meronyms_of, client,
+                                   status_callback=status_callback, cache=cache))
+    finally:
+        client.close()
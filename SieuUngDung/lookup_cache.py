@@ -0,0 +1,175 @@
+# ==========================================
+# LOOKUP CACHE - Bộ nhớ đệm tra cứu (Wikidata / WordNet) lưu trên đĩa bằng SQLite
+# ==========================================
+import functools
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "lookup_cache.sqlite3")
+DEFAULT_TTL = 30 * 24 * 3600      # Kết quả tra cứu hầu như không đổi: giữ 30 ngày
+DEFAULT_MAX_ENTRIES = 50_000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS lookups (
+    source   TEXT NOT NULL,
+    keyword  TEXT NOT NULL,
+    value    TEXT NOT NULL,
+    stored   REAL NOT NULL,
+    accessed REAL NOT NULL,
+    PRIMARY KEY (source, keyword)
+);
+CREATE INDEX IF NOT EXISTS lookups_accessed ON lookups (accessed);
+"""
+
+
+def normalize(keyword: str) -> str:
+    return " ".join(keyword.split()).lower()
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    expired: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def __str__(self) -> str:
+        return (f"cache: {self.hits} hits, {self.misses} misses ({self.hit_rate:.0%}), "
+                f"{self.expired} expired, {self.evictions} evicted")
+
+
+class LookupCache:
+    """
+    Lưu kết quả tra cứu (danh sách chuỗi) theo (nguồn, từ khóa đã chuẩn hóa).
+    - Mục cũ hơn `ttl` giây coi như không có (và bị xóa khi gặp lại).
+    - Quá `max_entries` mục thì bỏ các mục lâu không được đọc nhất (LRU). Số mục được đếm trong bộ nhớ,
+      nên chỉ phải xóa khi thật sự vượt ngưỡng.
+    - get_many / put_many đọc / ghi cả lô trong một giao dịch (một lần commit), ví dụ một tầng của harvest.
+    Một kết nối dùng chung có khóa, nên gọi được từ luồng nền của GUI lẫn vòng lặp asyncio.
+    """
+
+    def __init__(self, path: str = DEFAULT_PATH, ttl: float = DEFAULT_TTL,
+                 max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(SCHEMA)
+        self._rows = self._count()
+
+    def get(self, source: str, keyword: str) -> Optional[List[str]]:
+        """Danh sách đã lưu, hoặc None nếu chưa có / đã hết hạn."""
+        return self.get_many(source, [keyword]).get(keyword)
+
+    def get_many(self, source: str, keywords: Iterable[str]) -> Dict[str, List[str]]:
+        """Các từ khóa có mục còn hạn -> danh sách đã lưu; từ khóa thiếu / hết hạn không có trong kết quả."""
+        now = time.time()
+        found: Dict[str, List[str]] = {}
+        changed = False
+        with self._lock:
+            for keyword in dict.fromkeys(keywords):
+                key = normalize(keyword)
+                row = self._conn.execute("SELECT value, stored FROM lookups WHERE source = ? AND keyword = ?",
+                                         (source, key)).fetchone()
+                if row is not None and now - row[1] > self.ttl:
+                    self._conn.execute("DELETE FROM lookups WHERE source = ? AND keyword = ?", (source, key))
+                    self._rows -= 1
+                    self.stats.expired += 1
+                    changed = True
+                    row = None
+                if row is None:
+                    self.stats.misses += 1
+                    continue
+                self._conn.execute("UPDATE lookups SET accessed = ? WHERE source = ? AND keyword = ?",
+                                   (now, source, key))
+                changed = True
+                self.stats.hits += 1
+                found[keyword] = json.loads(row[0])
+            if changed:
+                self._conn.commit()
+        return found
+
+    def put(self, source: str, keyword: str, value: List[str]):
+        self.put_many(source, [(keyword, value)])
+
+    def put_many(self, source: str, items: Iterable[Tuple[str, List[str]]]):
+        """Ghi nhiều mục trong một giao dịch, rồi bỏ các mục LRU nếu vượt max_entries."""
+        now = time.time()
+        with self._lock:
+            for keyword, value in items:
+                key = normalize(keyword)
+                exists = self._conn.execute("SELECT 1 FROM lookups WHERE source = ? AND keyword = ?",
+                                            (source, key)).fetchone()
+                self._conn.execute("INSERT OR REPLACE INTO lookups VALUES (?, ?, ?, ?, ?)",
+                                   (source, key, json.dumps(list(value)), now, now))
+                if exists is None:
+                    self._rows += 1
+            excess = self._rows - self.max_entries
+            if excess > 0:
+                self._conn.execute("DELETE FROM lookups WHERE rowid IN "
+                                   "(SELECT rowid FROM lookups ORDER BY accessed LIMIT ?)", (excess,))
+                self._rows -= excess
+                self.stats.evictions += excess
+            self._conn.commit()
+
+    def lookup_many(self, source: str, keywords: Iterable[str],
+                    fn: Callable[[str], List[str]]) -> Dict[str, List[str]]:
+        """Tra cả lô qua bộ nhớ đệm: một giao dịch đọc, gọi `fn` cho từ khóa còn thiếu, một giao dịch ghi."""
+        keywords = list(dict.fromkeys(keywords))
+        found = self.get_many(source, keywords)
+        missing = [(kw, list(fn(kw))) for kw in keywords if kw not in found]
+        if missing:
+            self.put_many(source, missing)
+            found.update(missing)
+        return {kw: found[kw] for kw in keywords}
+
+    def memoize(self, source: str, fn: Callable[[str], List[str]]) -> Callable[[str], List[str]]:
+        """Bọc một hàm tra cứu đồng bộ (ví dụ WordNet) để đọc / ghi qua bộ nhớ đệm."""
+
+        @functools.wraps(fn)
+        def wrapper(keyword: str) -> List[str]:
+            value = self.get(source, keyword)
+            if value is None:
+                value = list(fn(keyword))
+                self.put(source, keyword, value)
+            return value
+
+        return wrapper
+
+    def _count(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM lookups").fetchone()[0]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._rows
+
+    def purge_expired(self) -> int:
+        """Xóa mọi mục đã hết hạn; trả về số mục bị xóa."""
+        with self._lock:
+            n = self._conn.execute("DELETE FROM lookups WHERE stored < ?", (time.time() - self.ttl,)).rowcount
+            self._conn.commit()
+            self._rows -= n
+        self.stats.expired += n
+        return n
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM lookups")
+            self._conn.commit()
+            self._rows = 0
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -3,52 +3,27 @@ from tkinter import ttk, messagebox
 from PIL import Image, ImageTk
 import requests
 from io import BytesIO
-from ToanHoc import forward_chain_bfs, Rule
+from ToanHoc import Rule
+from rete import ReteNetwork
+from truth_maintenance import TruthMaintenanceSession
+from kb_snapshot import load_rules_cached
+from rule_parser import parse_rules_file
 
 def load_rules(filename="knowledge_base.txt"):
-    rules = []
-    possible_objects = set()
-
-    with open(filename, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line or line.startswith("#") or "->" not in line:
-                continue
-
-            left, right = line.split("->", 1)
-            left = left.strip()
-            right = right.strip()
-
-            if "|" in right:
-                conclusion, label = right.split("|", 1)
-                conclusion = conclusion.strip().lower()
-                label = label.strip()
-            else:
-                conclusion = right.strip().lower()
-                label = f"RULE_{len(rules)}"
+    # Dùng lại snapshot đã biên dịch nếu knowledge base chưa thay đổi; RuleStore dùng trực tiếp
+    # như List[Rule] nên không phải dựng lại mọi Rule sau khi mmap
+    rules = load_rules_cached(filename, parse_rules, "user_gui.parse_rules")
+    possible_objects = {rules.symbols[c] for c in set(rules.conclusions)}
+    return rules, possible_objects
 
-            possible_objects.add(conclusion)
 
-            if "&" in left:
-                prem = [p.strip().lower() for p in left.split("&")]
-                op = "AND"
-            elif "v" in left:
-                prem = [p.strip().lower() for p in left.split("v")]
-                op = "OR"
-            else:
-                prem = [left.strip().lower()]
-                op = "AND"
-
-            rules.append(
-                Rule(
-                    premises=tuple(prem),
-                    conclusion=conclusion,
-                    label=label,
-                    id=len(rules),
-                    op=op
-                )
-            )
-    return rules, possible_objects
+def parse_rules(filename):
+    # 'v' chỉ là toán tử OR khi đứng riêng (không tách "convertible"), fact được đưa về chữ thường
+    rules, diagnostics = parse_rules_file(filename, lowercase=True, label_format="RULE_{index}")
+    for d in diagnostics:
+        if d.code == 'io-error':
+            raise OSError(str(d))
+    return rules
 
 class UserGUI:
     def __init__(self, master):
@@ -75,6 +50,8 @@ class UserGUI:
         )
 
         self.rules, self.possible_objects = load_rules("knowledge_base.txt")
+        self.network = ReteNetwork(self.rules, "Min", use_closure=True)
+        self.session = TruthMaintenanceSession(self.network)
 
         main_frame = ttk.Frame(master, padding=10)
         main_frame.pack(fill="both", expand=True)
@@ -145,7 +122,9 @@ class UserGUI:
             return
 
         initial_facts = {x.strip().lower() for x in user_input.split(",") if x.strip()}
-        known, _, steps = forward_chain_bfs(self.rules, initial_facts, "Min")
+        # Chỉ lan truyền các fact được thêm/bớt so với lần chạy trước
+        self.session.update(initial_facts)
+        known = self.session.known
 
         inferred = sorted(list(known.intersection(self.possible_objects)))
 
@@ -171,6 +150,13 @@ class UserGUI:
                            font=("Segoe UI", 10, "bold"), borderwidth=1, relief="solid")
             tag.pack(side="left", padx=5, pady=5)
 
+        # Chỉ dựng chuỗi các bước khi khung Steps đang hiển thị
+        if self.steps_visible:
+            self.render_steps()
+
+    def render_steps(self):
+        self.steps_text.delete("1.0", "end")
+        steps = self.session.steps
         if steps:
             self.steps_text.insert("end", "\n".join(steps))
         else:
@@ -196,6 +182,7 @@ class UserGUI:
         if self.steps_visible:
             self.steps_frame.pack_forget()
         else:
+            self.render_steps()
             self.steps_frame.pack(fill="both", expand=True, pady=10)
 
         self.steps_visible = not self.steps_visible
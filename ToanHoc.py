@@ -4,12 +4,17 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 from dataclasses import dataclass
-from typing import Tuple, List, Set, Dict, Deque
+from typing import Tuple, List, Set, Dict, Deque, Iterable, Iterator, Optional, Callable
 import matplotlib.pyplot as plt
 import networkx as nx
 import itertools
+import heapq
+import bisect
 from collections import deque
+from collections.abc import Sequence
+from array import array
 import textwrap
+import base64
 
 
 # ---------- Core Engine: Data Structures ----------
@@ -21,91 +26,94 @@ class Rule:
     id: int
     op: str
 
-def load_and_parse_rules(filepath: str) -> List[Rule]:
+
+class InferenceTrace(Sequence):
     """
-    Đọc luật từ file, xác thực, loại bỏ trùng lặp và trả về danh sách luật hợp lệ.
-    Hỗ trợ AND (&) hoặc OR (v) cho tiền đề, nhưng không hỗ trợ trộn lẫn.
+    Vết suy diễn dạng cấu trúc: mỗi bước chỉ ghi vị trí luật (trong rule_source) vào một bộ đệm
+    số nguyên, số thứ tự bước chính là vị trí trong bộ đệm. Bộ đệm bắt đầu nhỏ và tăng gấp đôi
+    khi đầy, nên chi phí theo số luật đã kích hoạt chứ không theo kích thước tập luật.
+    Chuỗi mô tả chỉ được dựng khi đọc, nên vết dùng được như List[str] (join, extend, duyệt).
     """
-    rules: List[Rule] = []
-    seen_rules_canonical = set()
-
-    try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            for line_num, ln in enumerate(f, 1):
-                raw = ln.strip()
-                if not raw or raw.startswith("#"):
-                    continue
-
-                if "->" not in raw:
-                    print(f"Bỏ qua dòng {line_num}: Thiếu '->'. Nội dung: '{raw}'")
-                    continue
 
-                left, right = raw.split("->", 1)
-                left = left.replace("^", "&").strip()
+    def __init__(self, rule_source: List[Rule], capacity: int = 16):
+        self.rule_source = rule_source
+        self.rule_pos = array('i', [0]) * capacity
+        self._len = 0
 
-                op = 'AND'
-                premises_list = []
+    def record(self, pos: int):
+        if self._len == len(self.rule_pos):
+            self.rule_pos.extend(array('i', [0]) * max(16, self._len))
+        self.rule_pos[self._len] = pos
+        self._len += 1
 
-                has_and = "&" in left
-                has_or = "v" in left
+    def events(self):
+        """Các sự kiện (số bước, luật) theo thứ tự kích hoạt."""
+        for i in range(self._len):
+            yield i + 1, self.rule_source[self.rule_pos[i]]
 
-                if has_and and has_or:
-                    print(f"Bỏ qua dòng {line_num}: Luật chứa cả '&' và 'v' không được hỗ trợ. Nội dung: '{raw}'")
-                    continue
-                elif has_or:
-                    op = 'OR'
-                    premises_list = [p.strip() for p in left.split("v") if p.strip()]
-                else:
-                    op = 'AND'
-                    premises_list = [p.strip() for p in left.split("&") if p.strip()]
+    def __len__(self):
+        return self._len
 
-                if not premises_list:
-                    print(f"Bỏ qua dòng {line_num}: Luật không có tiền đề. Nội dung: '{raw}'")
-                    continue
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self._len))]
+        if i < 0:
+            i += self._len
+        if not 0 <= i < self._len:
+            raise IndexError(i)
+        r = self.rule_source[self.rule_pos[i]]
+        return f"({i + 1}) Kích hoạt '{r.label}': {{{', '.join(r.premises)}}} → {r.conclusion}"
 
-                premises_sorted = tuple(sorted(premises_list))
+    def __reduce__(self):
+        # Chỉ gửi kèm các luật đã kích hoạt, không gửi cả tập luật
+        fired = [r for _, r in self.events()]
+        return _trace_from_rules, (fired,)
 
-                if "|" in right:
-                    concl, label = right.split("|", 1)
-                else:
-                    concl, label = right, f"R{len(rules) + 1}"
 
-                conclusion = concl.strip()
-                label = label.strip()
+def _trace_from_rules(fired: List[Rule]) -> InferenceTrace:
+    trace = InferenceTrace(fired, len(fired))
+    for pos in range(len(fired)):
+        trace.record(pos)
+    return trace
 
-                canonical_key = (premises_sorted, conclusion, op)
-                if canonical_key in seen_rules_canonical:
-                    print(f"Bỏ qua dòng {line_num}: Luật trùng lặp. Nội dung: '{raw}'")
-                    continue
+# Số dòng bị bỏ qua tối đa được liệt kê trong hộp thoại cảnh báo khi đọc file luật
+MAX_DIAGNOSTICS_SHOWN = 20
 
-                seen_rules_canonical.add(canonical_key)
-
-                original_premises = tuple(premises_list)
-                new_rule = Rule(premises=original_premises, conclusion=conclusion, label=label, id=len(rules), op=op)
-                rules.append(new_rule)
-
-    except FileNotFoundError:
-        messagebox.showerror("Lỗi File", f"Không tìm thấy file tại đường dẫn: {filepath}")
-        return []
-    except Exception as e:
-        messagebox.showerror("Lỗi đọc file", f"Đã xảy ra lỗi: {e}")
-        return []
 
+def load_and_parse_rules(filepath: str) -> List[Rule]:
+    """
+    Đọc luật từ file, xác thực, loại bỏ trùng lặp và trả về danh sách luật hợp lệ.
+    Hỗ trợ AND (&) hoặc OR (v) cho tiền đề, nhưng không hỗ trợ trộn lẫn.
+    Việc đọc do rule_parser đảm nhận; hàm này báo lỗi file và liệt kê các dòng bị bỏ qua.
+    """
+    from rule_parser import parse_rules_file
+
+    rules, diagnostics = parse_rules_file(filepath)
+    for d in diagnostics:
+        if d.code == 'io-error':
+            messagebox.showerror("Lỗi đọc file", str(d))
+            return []
+    if diagnostics:
+        shown = [str(d) for d in diagnostics[:MAX_DIAGNOSTICS_SHOWN]]
+        if len(diagnostics) > MAX_DIAGNOSTICS_SHOWN:
+            shown.append(f"... và {len(diagnostics) - MAX_DIAGNOSTICS_SHOWN} dòng khác.")
+        messagebox.showwarning("Bỏ qua dòng không hợp lệ",
+                               f"Đã bỏ qua {len(diagnostics)} dòng khi đọc file luật:\n\n" + "\n".join(shown))
     return rules
 
 
 # ---------- Core Engine: Forward Chaining Algorithms ----------
 
 # --- FORWARD CHAINING (BFS / Queue) ---
-def forward_chain_bfs(rules: List[Rule], facts: Set[str], selection_mode: str):
+def forward_chain_bfs(rules: List[Rule], facts: Set[str], selection_mode: str, trace: bool = True):
     known = set(facts)
     prov: Dict[str, Tuple[Rule, Tuple[str, ...]]] = {}
-    steps: List[str] = []
 
     queue: Deque[str] = deque(list(facts))
     visited_facts_for_expansion = set()
 
     rule_source = rules if selection_mode == 'Min' else list(reversed(rules))
+    steps = InferenceTrace(rule_source, 16 if trace else 0)
 
     while queue:
         current_fact = queue.popleft()
@@ -113,7 +121,7 @@ def forward_chain_bfs(rules: List[Rule], facts: Set[str], selection_mode: str):
             continue
         visited_facts_for_expansion.add(current_fact)
 
-        for r in rule_source:
+        for pos, r in enumerate(rule_source):
             if r.conclusion in known:
                 continue
 
@@ -128,47 +136,211 @@ def forward_chain_bfs(rules: List[Rule], facts: Set[str], selection_mode: str):
                     new_fact = r.conclusion
                     known.add(new_fact)
                     prov[new_fact] = (r, r.premises)
-                    steps.append(f"({len(steps) + 1}) Kích hoạt '{r.label}': {{{', '.join(r.premises)}}} → {new_fact}")
+                    if trace:
+                        steps.record(pos)
                     if new_fact not in queue:
                         queue.append(new_fact)
     return known, prov, steps
 
 
 # --- FORWARD CHAINING (DFS / Stack) ---
-def forward_chain_dfs(rules: List[Rule], facts: Set[str], selection_mode: str):
+def forward_chain_dfs(rules: List[Rule], facts: Set[str], selection_mode: str, index: "RuleIndex" = None,
+                      trace: bool = True):
+    """Suy diễn tiến theo Stack (LIFO), chạy trên ngăn xếp tường minh của forward_chain_indexed."""
+    return forward_chain_indexed(rules, facts, selection_mode, 'Stack', index, trace)
+
+
+# --- FORWARD CHAINING (Chỉ mục tiền đề + bộ đếm) ---
+class RuleIndex:
+    """
+    Chỉ mục fact -> luật cho suy diễn tiến, xây một lần cho mỗi tập luật và chế độ chọn luật.
+    Mỗi luật AND giữ số tiền đề phân biệt; luật OR chỉ cần 1 tiền đề đã biết.
+    """
+
+    def __init__(self, rules: List[Rule], selection_mode: str = 'Min'):
+        self.selection_mode = selection_mode
+        self.rule_source: List[Rule] = rules if selection_mode == 'Min' else list(reversed(rules))
+        # by_premise[f] = vị trí (trong rule_source) các luật có f là tiền đề, theo thứ tự tăng dần
+        self.by_premise: Dict[str, List[int]] = {}
+        # by_conclusion[f] = vị trí các luật kết luận ra f (dùng để truy ngược từ mục tiêu)
+        self.by_conclusion: Dict[str, List[int]] = {}
+        self.premise_count: List[int] = []
+
+        for pos, r in enumerate(self.rule_source):
+            self.by_conclusion.setdefault(r.conclusion, []).append(pos)
+            distinct = set(r.premises)
+            for p in distinct:
+                self.by_premise.setdefault(p, []).append(pos)
+            self.premise_count.append(1 if r.op == 'OR' else len(distinct))
+
+    def new_counters(self, known: Set[str]) -> List[int]:
+        """Số tiền đề còn thiếu của từng luật, tính theo tập fact đã biết."""
+        missing = list(self.premise_count)
+        for f in known:
+            for pos in self.by_premise.get(f, ()):
+                missing[pos] -= 1
+        return missing
+
+
+def forward_chain_indexed(rules: List[Rule], facts: Set[str], selection_mode: str,
+                          conflict_mode: str = 'Queue', index: RuleIndex = None, trace: bool = True,
+                          goals: Iterable[str] = None):
+    """
+    Suy diễn tiến dùng RuleIndex: cho ra cùng known/prov/steps với forward_chain_bfs (Queue)
+    và forward_chain_dfs (Stack) nhưng mỗi fact chỉ chạm tới các luật chứa nó.
+    trace=False bỏ hẳn việc ghi vết (steps rỗng) để đạt thông lượng cao nhất.
+    goals: nếu có, dừng ngay khi mọi mục tiêu đã biết (known khi đó chưa phải bao đóng đầy đủ).
+    """
+    if index is None or index.selection_mode != selection_mode:
+        index = RuleIndex(rules, selection_mode)
+
     known = set(facts)
     prov: Dict[str, Tuple[Rule, Tuple[str, ...]]] = {}
-    steps: List[str] = []
+    pending = None if goals is None else set(goals) - known
+    if pending is not None and not pending:
+        return known, prov, InferenceTrace(index.rule_source, 0)
+
+    rule_source = index.rule_source
+    by_premise = index.by_premise
+    missing = index.new_counters(known)
+    steps = InferenceTrace(rule_source, 16 if trace else 0)
+
+    def _fire(pos: int) -> str:
+        r = rule_source[pos]
+        new_fact = r.conclusion
+        known.add(new_fact)
+        prov[new_fact] = (r, r.premises)
+        if trace:
+            steps.record(pos)
+        for q in by_premise.get(new_fact, ()):
+            missing[q] -= 1
+        if pending is not None:
+            pending.discard(new_fact)
+        return new_fact
+
+    if conflict_mode == 'Queue':
+        queue: Deque[str] = deque(list(facts))
+        visited_facts_for_expansion = set()
+
+        while queue:
+            current_fact = queue.popleft()
+            if current_fact in visited_facts_for_expansion:
+                continue
+            visited_facts_for_expansion.add(current_fact)
 
-    rule_source = rules if selection_mode == 'Min' else list(reversed(rules))
+            for pos in by_premise.get(current_fact, ()):
+                if missing[pos] > 0 or rule_source[pos].conclusion in known:
+                    continue
+                queue.append(_fire(pos))
+                if pending is not None and not pending:
+                    return known, prov, steps
+    else:  # Stack
+        # Mỗi phần tử của ngăn xếp là con trỏ duyệt các luật của một fact. Khi một luật kích hoạt,
+        # fact mới được duyệt ngay rồi mới quay lại luật kế tiếp của fact cũ (đúng thứ tự đệ quy).
+        for fact in list(facts):
+            stack = [iter(by_premise.get(fact, ()))]
+            while stack:
+                for pos in stack[-1]:
+                    if missing[pos] > 0 or rule_source[pos].conclusion in known:
+                        continue
+                    stack.append(iter(by_premise.get(_fire(pos), ())))
+                    if pending is not None and not pending:
+                        return known, prov, steps
+                    break
+                else:
+                    stack.pop()
 
-    initial_facts = list(facts)
+    return known, prov, steps
 
-    def _dfs_visit(fact_to_process: str):
-        for r in rule_source:
-            if r.conclusion not in known and fact_to_process in r.premises:
-                premises_met = False
-                if r.op == 'AND':
-                    premises_met = all(p in known for p in r.premises)
-                elif r.op == 'OR':
-                    premises_met = True
 
-                if premises_met:
-                    new_fact = r.conclusion
-                    known.add(new_fact)
-                    prov[new_fact] = (r, r.premises)
-                    steps.append(f"({len(steps) + 1}) Kích hoạt '{r.label}': {{{', '.join(r.premises)}}} → {new_fact}")
-                    _dfs_visit(new_fact)
+def relevant_rules(goals: Iterable[str], facts: Set[str], index: RuleIndex) -> List[int]:
+    """
+    Vị trí (tăng dần, trong index.rule_source) các luật có thể góp phần suy ra `goals`:
+    truy ngược từ mục tiêu qua các luật kết luận ra nó, dừng ở fact đã có trong giả thiết.
+    """
+    seen = set(goals)
+    stack = [g for g in seen if g not in facts]
+    positions: Set[int] = set()
+    while stack:
+        fact = stack.pop()
+        for pos in index.by_conclusion.get(fact, ()):
+            if pos in positions:
+                continue
+            positions.add(pos)
+            for p in index.rule_source[pos].premises:
+                if p not in seen:
+                    seen.add(p)
+                    if p not in facts:
+                        stack.append(p)
+    return sorted(positions)
 
-    for fact in initial_facts:
-        _dfs_visit(fact)
 
-    return known, prov, steps
+def forward_chain_goal(rules: List[Rule], facts: Set[str], goals: Iterable[str], selection_mode: str,
+                       conflict_mode: str = 'Queue', index: RuleIndex = None, trace: bool = True):
+    """
+    Suy diễn tiến hướng mục tiêu: chỉ kích hoạt các luật liên quan (relevant_rules) và dừng
+    ngay khi mọi mục tiêu đã biết. Luật không liên quan không bao giờ ảnh hưởng tới thứ tự
+    kích hoạt các luật liên quan, nên steps là dãy con (cắt sớm) của forward_chain_indexed.
+    """
+    if index is None or index.selection_mode != selection_mode:
+        index = RuleIndex(rules, selection_mode)
+    goals = set(goals)
+    sub_rules = [index.rule_source[pos] for pos in relevant_rules(goals, facts, index)]
+    # sub_rules đã theo thứ tự Min/Max của index nên chạy ở chế độ 'Min'
+    return forward_chain_indexed(sub_rules, facts, 'Min', conflict_mode, trace=trace, goals=goals)
 
 
 # ---------- Core Engine: Backward Chaining Algorithm ----------
-def backward_chain_all(goal: str, rules: List[Rule], facts: Set[str], seen: Set[str], selection_mode: str) -> List[
-    List[Rule]]:
+class ConclusionIndex:
+    """
+    Chỉ mục kết luận -> các luật kết luận ra nó, xếp theo id (thứ tự Min); thứ tự Max là ngược lại.
+    Dựng một lần cho mỗi tập luật và cập nhật tăng dần khi thêm / sửa / xóa luật.
+    """
+
+    def __init__(self, rules: Iterable[Rule] = ()):
+        self.by_conclusion: Dict[str, List[Rule]] = {}
+        for r in rules:
+            self.by_conclusion.setdefault(r.conclusion, []).append(r)
+
+    def rules_for(self, goal: str, selection_mode: str = 'Min') -> List[Rule]:
+        """Các luật kết luận ra `goal` theo thứ tự chọn luật (danh sách chỉ để đọc)."""
+        rules = self.by_conclusion.get(goal, [])
+        return rules if selection_mode == 'Min' else rules[::-1]
+
+    def add(self, rule: Rule):
+        bisect.insort(self.by_conclusion.setdefault(rule.conclusion, []), rule, key=lambda r: r.id)
+
+    def remove(self, rule: Rule):
+        rules = self.by_conclusion.get(rule.conclusion, [])
+        for i, r in enumerate(rules):
+            if r == rule:
+                del rules[i]
+                break
+        if not rules:
+            self.by_conclusion.pop(rule.conclusion, None)
+
+    def replace(self, old: Rule, new: Rule):
+        self.remove(old)
+        self.add(new)
+
+    def relevant(self, goals: Iterable[str], facts: Set[str]) -> List[Rule]:
+        """Các luật có thể góp phần chứng minh `goals` (truy ngược, dừng ở giả thiết)."""
+        seen = set(goals)
+        stack = [g for g in seen if g not in facts]
+        found: List[Rule] = []
+        while stack:
+            for r in self.by_conclusion.get(stack.pop(), ()):
+                found.append(r)
+                for p in r.premises:
+                    if p not in seen:
+                        seen.add(p)
+                        if p not in facts:
+                            stack.append(p)
+        return found
+
+
+def backward_chain_all(goal: str, rules: List[Rule], facts: Set[str], seen: Set[str], selection_mode: str,
+                       index: ConclusionIndex = None) -> List[List[Rule]]:
     if goal in facts:
         return [[]]
     if goal in seen:
@@ -177,8 +349,9 @@ def backward_chain_all(goal: str, rules: List[Rule], facts: Set[str], seen: Set[
 
     paths = []
 
-    rule_source = rules if selection_mode == 'Min' else list(reversed(rules))
-    relevant_rules = [r for r in rule_source if r.conclusion == goal]
+    if index is None:
+        index = ConclusionIndex(rules)
+    relevant_rules = index.rules_for(goal, selection_mode)
 
     for r in relevant_rules:
 
@@ -186,7 +359,7 @@ def backward_chain_all(goal: str, rules: List[Rule], facts: Set[str], seen: Set[
             all_subpaths = []
             valid = True
             for p in r.premises:
-                sub = backward_chain_all(p, rules, facts, seen.copy(), selection_mode)
+                sub = backward_chain_all(p, rules, facts, seen.copy(), selection_mode, index)
                 if not sub:
                     valid = False
                     break
@@ -198,7 +371,7 @@ def backward_chain_all(goal: str, rules: List[Rule], facts: Set[str], seen: Set[
 
         elif r.op == 'OR':
             for p in r.premises:
-                subpaths_for_p = backward_chain_all(p, rules, facts, seen.copy(), selection_mode)
+                subpaths_for_p = backward_chain_all(p, rules, facts, seen.copy(), selection_mode, index)
 
                 for sub_path in subpaths_for_p:
                     chain = sub_path + [r]
@@ -207,18 +380,167 @@ def backward_chain_all(goal: str, rules: List[Rule], facts: Set[str], seen: Set[
     return paths
 
 
+class _ProofSizeBounds:
+    """
+    Cận kích thước chứng minh (số luật) cho các mục tiêu liên quan tới `goal`, bỏ qua ràng buộc tổ tiên:
+    - lower(g): kích thước nhỏ nhất, lấy từ bảng Knuth của TabledBackwardChainer; None nếu g
+      không chứng minh được.
+    - upper(g): kích thước lớn nhất khi mỗi nhánh đi qua mỗi thành phần liên thông mạnh tối đa
+      |thành phần| mục tiêu (nhánh đã rời một thành phần thì không quay lại được). Tính theo thành
+      phần, lá trước; thành phần k mục tiêu cần tối đa k lượt trên các luật của riêng nó.
+    Bỏ ràng buộc tổ tiên chỉ làm tăng số chứng minh, nên cả hai đều là cận hợp lệ.
+    should_stop được kiểm tra trong lúc dựng cận; trả về True thì ném SolveInterrupted.
+    """
+
+    def __init__(self, goal: str, facts: Set[str], index: ConclusionIndex, longest: bool,
+                 tabled=None, should_stop: Callable[[], bool] = None):
+        from tabled_backward import TabledBackwardChainer, strongly_connected_components
+
+        self.facts = facts
+        if tabled is None:
+            tabled = TabledBackwardChainer([], facts, 'Min', index, should_stop)
+        self.tabled = tabled
+        self._upper: Dict[str, int] = {}
+        if not longest:
+            return
+
+        def subgoals(g: str) -> List[str]:
+            tabled.check_stop()
+            return [p for r in index.rules_for(g) for p in r.premises if p not in facts]
+
+        for component in strongly_connected_components(goal, subgoals):
+            members = set(component)
+            rules = [r for g in component for r in index.rules_for(g)]
+            cur: Dict[str, int] = {}
+            for _ in component:
+                prev, cur = cur, {}
+                for r in rules:
+                    tabled.check_stop()
+                    size = self._combine(r, lambda p: prev.get(p) if p in members else self._upper.get(p), max)
+                    if size is not None and size > cur.get(r.conclusion, -1):
+                        cur[r.conclusion] = size
+                if cur == prev:
+                    break
+            self._upper.update(cur)
+
+    def _combine(self, r: Rule, size_of, pick) -> Optional[int]:
+        sizes = [0 if p in self.facts else size_of(p) for p in r.premises]
+        if r.op == 'AND':
+            return None if None in sizes else 1 + sum(sizes)
+        sizes = [x for x in sizes if x is not None]
+        return 1 + pick(sizes) if sizes else None
+
+    def lower(self, g: str, ancestors: frozenset) -> Optional[int]:
+        return self.tabled.cost(g)
+
+    def upper(self, g: str, ancestors: frozenset) -> Optional[int]:
+        return self._upper.get(g)
+
+
+def iter_proofs(goal: str, rules: List[Rule], facts: Set[str], selection_mode: str = 'Min',
+                longest: bool = False, index: ConclusionIndex = None, max_depth: Optional[int] = None,
+                should_stop: Callable[[], bool] = None, tabled=None) -> Iterator[List[Rule]]:
+    """
+    Sinh lần lượt các đường chứng minh của backward_chain_all theo thứ tự độ dài tăng dần
+    (longest=True: giảm dần); các đường cùng độ dài giữ đúng thứ tự của backward_chain_all.
+    Tìm kiếm best-first trên chứng minh dở dang: ưu tiên = số luật đã chọn + cận của các mục tiêu
+    còn mở, nên có thể lấy k đường đầu tiên mà không phải dựng các đường còn lại.
+    - max_depth: bỏ các đường có mục tiêu con sâu hơn max_depth (mục tiêu gốc có độ sâu 0).
+    - should_stop: được gọi định kỳ trong lúc dựng cận và tìm kiếm; trả về True thì dừng sinh tiếp.
+    - tabled: TabledBackwardChainer dùng lại cho cận dưới (cùng `facts`), ví dụ bảng đã dựng để
+      kiểm tra mục tiêu chứng minh được hay không.
+    """
+    from tabled_backward import SolveInterrupted
+
+    if index is None:
+        index = ConclusionIndex(rules)
+    if goal in facts:
+        yield []
+        return
+
+    try:
+        bounds = _ProofSizeBounds(goal, facts, index, longest, tabled, should_stop)
+        bound = bounds.upper if longest else bounds.lower
+        root_h = bound(goal, frozenset())
+    except SolveInterrupted:
+        return
+    if root_h is None:
+        return
+    sign = -1 if longest else 1
+
+    # Phần tử heap: (ưu tiên, lựa chọn, stt, chi phí, tổng cận, mục mở, luật đã xuất)
+    # Mục mở là danh sách liên kết ((kind, ...), tiếp): ('goal', g, tổ tiên, cận) hoặc ('rule', r);
+    # luật được xuất theo hậu thứ tự nên đường chứng minh trùng với cách backward_chain_all ghép.
+    # Lựa chọn của mỗi bước là (thứ hạng luật,) với AND, (thứ hạng luật, chỉ số tiền đề) với OR.
+    counter = itertools.count()
+    heap = [(sign * root_h, (), next(counter), 0, root_h, (('goal', goal, frozenset(), root_h), None), None)]
+    pops = 0
+    while heap:
+        pops += 1
+        if should_stop is not None and pops % 256 == 0 and should_stop():
+            return
+        _, choices, _, cost, h_sum, pending, emitted = heapq.heappop(heap)
+        while pending is not None and pending[0][0] == 'rule':
+            emitted = (pending[0][1], emitted)
+            pending = pending[1]
+        if pending is None:
+            proof = []
+            while emitted is not None:
+                proof.append(emitted[0])
+                emitted = emitted[1]
+            proof.reverse()
+            yield proof
+            continue
+
+        _, g, ancestors, g_h = pending[0]
+        child_anc = ancestors | {g}
+        too_deep = max_depth is not None and len(child_anc) > max_depth
+        for rank, r in enumerate(index.rules_for(g, selection_mode)):
+            if r.op == 'AND':
+                options = [((rank,), r.premises)]
+            else:
+                options = [((rank, i), (p,)) for i, p in enumerate(r.premises)]
+            for choice, premises in options:
+                items = []
+                for p in premises:
+                    if p in facts:
+                        continue
+                    h = None if too_deep or p in child_anc else bound(p, child_anc)
+                    if h is None:
+                        break
+                    items.append(('goal', p, child_anc, h))
+                else:
+                    new_pending = (('rule', r), pending[1])
+                    new_h = h_sum - g_h
+                    for item in reversed(items):
+                        new_pending = (item, new_pending)
+                        new_h += item[3]
+                    heapq.heappush(heap, (sign * (cost + 1 + new_h), choices + choice, next(counter),
+                                          cost + 1, new_h, new_pending, emitted))
+
+
 # ---------- Graph Drawing ----------
 # --- FPG (Flow Process Graph) ---
+# Scaling factor để điều chỉnh độ thu gọn (Giá trị < 1.0 sẽ thu gọn)
+SCALE_FACTOR = 0.7
+FPG_FIGSIZE = (20 * SCALE_FACTOR, 14 * SCALE_FACTOR)
+
+
 def draw_process_graph(prov: Dict[str, Tuple[Rule, Tuple[str, ...]]], facts: Set[str], all_rules: List[Rule]):
     """Vẽ Process Graph: Vết Suy diễn (FPG) nếu có prov, hoặc toàn bộ luật nếu không."""
     if not all_rules:
         messagebox.showwarning("Lỗi", "Không có luật nào để vẽ đồ thị.")
         return
 
-    G = nx.DiGraph()
+    plt.figure(figsize=FPG_FIGSIZE)
+    draw_process_graph_on(plt.gca(), prov, facts, all_rules)
+    plt.tight_layout()
+    plt.show()
+
 
-    # Scaling factor để điều chỉnh độ thu gọn (Giá trị < 1.0 sẽ thu gọn)
-    SCALE_FACTOR = 0.7
+def draw_process_graph_on(ax, prov: Dict[str, Tuple[Rule, Tuple[str, ...]]], facts: Set[str], all_rules: List[Rule]):
+    """Vẽ Process Graph lên trục `ax` (không dùng pyplot nên chạy được ở luồng nền với Figure + Agg)."""
+    G = nx.DiGraph()
 
     # --- 1. Thêm TẤT CẢ các nodes và edges từ TẤT CẢ các luật ---
 
@@ -255,13 +577,15 @@ def draw_process_graph(prov: Dict[str, Tuple[Rule, Tuple[str, ...]]], facts: Set
 
     initial_facts = facts
     derived_facts = set(prov.keys())  # Các fact được suy diễn
+    from fpg_layout import premises_used, fpg_levels, longest_path_levels, order_layers, layered_positions
+    used_premises = premises_used(prov)
 
     if prov:
         # Nếu có prov (vết suy diễn), ta phân loại lại nodes
         for node in all_facts_in_rules:
             is_initial = node in initial_facts
             is_derived = node in derived_facts
-            is_used_as_premise = any(node in used for r, used in prov.values())
+            is_used_as_premise = node in used_premises
 
             if is_initial:
                 G.nodes[node]['node_type'] = "initial"
@@ -308,61 +632,26 @@ def draw_process_graph(prov: Dict[str, Tuple[Rule, Tuple[str, ...]]], facts: Set
         # Layout chỉ tính trên các nodes tham gia Vết suy diễn (nếu có prov)
         # Hoặc tất cả nếu không có prov (vẽ toàn bộ Rule Process)
         if prov:
-            # Logic tính levels (giữ nguyên để phân tầng FPG)
+            # Tầng = đường dài nhất trong vết (tính một lần theo hậu thứ tự, không đệ quy lặp lại)
+            depth = fpg_levels(prov, initial_facts)
             levels = {}
-            for node in G.nodes():
-                if G.nodes[node]['in_fpg']:
-                    if node in initial_facts:
-                        levels[node] = 0
-                    elif node in derived_facts:
-                        # Logic get_depth (được sửa lỗi cú pháp)
-                        def get_depth(n, depth=0):
-                            if n in initial_facts:
-                                return depth
-                            if n not in prov:
-                                return depth
-                            max_d = depth
-                            for premise in prov[n][1]:
-                                max_d = max(max_d, get_depth(premise, depth + 1))
-                            return max_d
-
-                        levels[node] = get_depth(node)
-                    else:
-                        levels[node] = -1  # Nodes không tham gia FPG
-                else:
-                    levels[node] = -2  # Nodes không tham gia (kể cả không phải initial)
-
-            # Phân nhóm nodes
-            level_groups = {}
             unused_nodes_for_layout = []
-            for node, level in levels.items():
-                if level < 0:
-                    unused_nodes_for_layout.append(node)
+            for node in G.nodes():
+                if G.nodes[node]['in_fpg'] and (node in initial_facts or node in derived_facts):
+                    levels[node] = depth[node]
                 else:
-                    if level not in level_groups:
-                        level_groups[level] = []
-                    level_groups[level].append(node)
-
-            # Tạo vị trí thủ công cho nodes tham gia FPG
-            y_spacing = 5.0 * SCALE_FACTOR
-            max_level = max(level_groups.keys()) if level_groups else 0
-
-            for level, nodes in sorted(level_groups.items()):
-                num_nodes = len(nodes)
-                x_spacing = 6.0 * SCALE_FACTOR
-                total_width = (num_nodes - 1) * x_spacing
-                x_start = -total_width / 2
-                y_pos = (max_level - level) * y_spacing
+                    unused_nodes_for_layout.append(node)  # Nodes không tham gia FPG
 
-                for i, node in enumerate(nodes):
-                    pos[node] = (x_start + i * x_spacing, y_pos)
+            # Tạo vị trí thủ công cho nodes tham gia FPG, thứ tự trong tầng giảm cạnh cắt nhau
+            fpg_edges_for_layout = [(p, concl) for concl, (r, used) in prov.items() for p in used]
+            layers = order_layers(levels, fpg_edges_for_layout)
+            pos = layered_positions(layers, 6.0 * SCALE_FACTOR, 5.0 * SCALE_FACTOR)
 
             # Đặt các nodes KHÔNG THAM GIA FPG ở vị trí riêng biệt (unused_nodes_for_layout)
             if unused_nodes_for_layout:
                 num_unused = len(unused_nodes_for_layout)
 
                 if pos:
-                    x_coords = [x for x, y in pos.values()]
                     min_y = min([y for x, y in pos.values()]) if pos else 0
 
                     unused_y = min_y - 3.0 * SCALE_FACTOR
@@ -377,8 +666,10 @@ def draw_process_graph(prov: Dict[str, Tuple[Rule, Tuple[str, ...]]], facts: Set
                         pos[node] = (i * 4.0 * SCALE_FACTOR, -5.0 * SCALE_FACTOR)
 
         else:
-            # Nếu KHÔNG có prov, dùng spring layout cho TẤT CẢ nodes
-            pos = nx.spring_layout(G, k=6.0 * SCALE_FACTOR, iterations=200, seed=42)
+            # Nếu KHÔNG có prov, phân tầng toàn bộ đồ thị luật thay cho spring layout
+            levels = longest_path_levels(sorted(G.nodes()), G.predecessors)
+            layers = order_layers(levels, G.edges())
+            pos = layered_positions(layers, 6.0 * SCALE_FACTOR, 5.0 * SCALE_FACTOR)
 
     except Exception as e:
         print(f"Layout error: {e}")
@@ -387,8 +678,6 @@ def draw_process_graph(prov: Dict[str, Tuple[Rule, Tuple[str, ...]]], facts: Set
 
     # --- 4. Vẽ đồ thị ---
 
-    plt.figure(figsize=(20 * SCALE_FACTOR, 14 * SCALE_FACTOR))
-
     # Vẽ nodes theo loại (initial, derived, unused / all_facts)
     # Nếu có prov, chỉ vẽ các loại FPG. Nếu không có prov, tất cả là 'all_facts' hoặc 'initial'
     node_types_to_draw = [
@@ -401,38 +690,38 @@ def draw_process_graph(prov: Dict[str, Tuple[Rule, Tuple[str, ...]]], facts: Set
     for node_type, color in node_types_to_draw:
         nodes_of_type = [n for n, d in G.nodes(data=True) if d.get('node_type') == node_type]
         if nodes_of_type:
-            nx.draw_networkx_nodes(G, pos, nodelist=nodes_of_type,
+            nx.draw_networkx_nodes(G, pos, ax=ax, nodelist=nodes_of_type,
                                    node_color=color, node_size=3500,
                                    edgecolors="black", linewidths=2.5)
 
     # Vẽ labels
-    nx.draw_networkx_labels(G, pos, font_size=13, font_weight="bold", font_family="sans-serif")
+    nx.draw_networkx_labels(G, pos, ax=ax, font_size=13, font_weight="bold", font_family="sans-serif")
 
     # Vẽ edges: Highlight vết suy diễn nếu có prov, hoặc tất cả nếu không
     if prov:
         # Vẽ các edges KHÔNG nằm trong FPG (mờ hơn)
         fpg_edges = set(fpg_edge_labels.keys())
         non_fpg_edges = [e for e in G.edges() if e not in fpg_edges]
-        nx.draw_networkx_edges(G, pos, edgelist=non_fpg_edges, arrows=True, arrowstyle="-|>",
+        nx.draw_networkx_edges(G, pos, ax=ax, edgelist=non_fpg_edges, arrows=True, arrowstyle="-|>",
                                arrowsize=25, width=1.0, edge_color="#AAAAAA",
                                connectionstyle="arc3,rad=0.15", alpha=0.4,
                                min_source_margin=20, min_target_margin=20)
 
         # Vẽ các edges NẰM trong FPG (đậm, đỏ)
-        nx.draw_networkx_edges(G, pos, edgelist=fpg_edges, arrows=True, arrowstyle="-|>",
+        nx.draw_networkx_edges(G, pos, ax=ax, edgelist=fpg_edges, arrows=True, arrowstyle="-|>",
                                arrowsize=30, width=3.0, edge_color="red",
                                connectionstyle="arc3,rad=0.15", alpha=0.8,
                                min_source_margin=20, min_target_margin=20)
 
     else:
         # Vẽ TẤT CẢ edges nếu không có prov
-        nx.draw_networkx_edges(G, pos, arrows=True, arrowstyle="-|>",
+        nx.draw_networkx_edges(G, pos, ax=ax, arrows=True, arrowstyle="-|>",
                                arrowsize=30, width=2.5, edge_color="#555555",
                                connectionstyle="arc3,rad=0.15", alpha=0.65,
                                min_source_margin=20, min_target_margin=20)
 
     # Vẽ edge labels
-    nx.draw_networkx_edge_labels(G, pos, edge_labels=edge_labels_to_draw,
+    nx.draw_networkx_edge_labels(G, pos, ax=ax, edge_labels=edge_labels_to_draw,
                                  font_size=11, font_color="red", font_weight="bold",
                                  bbox=dict(boxstyle="round,pad=0.3", facecolor="yellow",
                                            alpha=0.8, edgecolor="orange", linewidth=1.5))
@@ -446,13 +735,11 @@ def draw_process_graph(prov: Dict[str, Tuple[Rule, Tuple[str, ...]]], facts: Set
         plt.Line2D([0], [0], marker='o', color='w', markerfacecolor='#F0F0F0',
                    markersize=15, markeredgecolor='black', markeredgewidth=2, label='Không sử dụng / Các Fact khác')
     ]
-    plt.legend(handles=legend_elements, loc='upper right', fontsize=11)
+    ax.legend(handles=legend_elements, loc='upper right', fontsize=11)
 
     title = "Flow Process Graph (FPG) - Vết suy diễn" if prov else " Toàn bộ luật"
-    plt.title(title, fontsize=18, fontweight='bold', pad=20)
-    plt.axis("off")
-    plt.tight_layout()
-    plt.show()
+    ax.set_title(title, fontsize=18, fontweight='bold', pad=20)
+    ax.axis("off")
 
 
 # --- RPG (Rule Process Graph) ---
@@ -461,23 +748,12 @@ def draw_rpg(rules: List[Rule]):
         messagebox.showwarning("Lỗi", "Không có luật nào để vẽ đồ thị.")
         return
 
-    G = nx.DiGraph()
-    for r in rules:
-        G.add_node(r.label)
-
-    for r1 in rules:
-        for r2 in rules:
-            if r1.id != r2.id:
-                if r1.conclusion in r2.premises:
-                    G.add_edge(r1.label, r2.label)
+    # Cạnh lấy từ chỉ mục tiền đề (graph_export), không duyệt mọi cặp luật
+    from graph_export import build_rpg, draw_rpg_on
+    G = build_rpg(rules)
 
     plt.figure(figsize=(10, 8))
-    pos = nx.spring_layout(G, seed=42, k=0.9)
-    nx.draw_networkx_nodes(G, pos, node_color="#ffb3ba", node_size=2000, edgecolors="black")
-    nx.draw_networkx_labels(G, pos, font_size=10, font_weight="bold")
-    nx.draw_networkx_edges(G, pos, arrows=True, arrowstyle="-|>", arrowsize=20, connectionstyle="arc3,rad=0.1")
-    plt.title("Rule Process Graph (RPG)", fontsize=16)
-    plt.axis("off")
+    draw_rpg_on(plt.gca(), G)
     plt.tight_layout()
     plt.show()
 
@@ -685,6 +961,13 @@ class RuleEditor(tk.Toplevel):
 
 
 # ---------- GUI Application ----------
+# Số đường chứng minh tối đa được in ra cho mỗi mục tiêu
+MAX_PROOFS_SHOWN = 50
+# Thời gian tối đa (giây) cho mỗi mục tiêu khi suy diễn lùi trên GUI, và chu kỳ hỏi kết quả nền (ms)
+BACKWARD_DEADLINE = 30.0
+BACKWARD_POLL_MS = 100
+
+
 class App(tk.Tk):
     def __init__(self):
         super().__init__()
@@ -747,6 +1030,12 @@ class App(tk.Tk):
         ttk.Radiobutton(fc_frame, text="Chọn luật: Chỉ số Max", variable=self.fc_selection_mode, value="Max").pack(
             anchor="w")
 
+        ttk.Separator(fc_frame, orient="horizontal").pack(fill="x", pady=5)
+
+        # Tắt (mặc định): suy diễn tiến toàn bộ bao đóng; bật: chỉ các luật dẫn tới mục tiêu
+        self.fc_goal_directed = tk.BooleanVar(value=False)
+        ttk.Checkbutton(fc_frame, text="Chỉ luật liên quan tới KL", variable=self.fc_goal_directed).pack(anchor="w")
+
         # --- Backward Chaining Options ---
         bc_frame = ttk.LabelFrame(right_pane, text="Tùy chọn Suy diễn Lùi", padding=10)
         bc_frame.pack(fill="x", pady=5)
@@ -761,9 +1050,26 @@ class App(tk.Tk):
         btn_frame.pack(fill="x")
         ttk.Button(btn_frame, text="Suy diễn Tiến", command=lambda: self.on_prove("Forward")).pack(fill="x", pady=2)
         ttk.Button(btn_frame, text="Suy diễn Lùi", command=lambda: self.on_prove("Backward")).pack(fill="x", pady=2)
+        self.btn_cancel_backward = ttk.Button(btn_frame, text="Dừng Suy diễn Lùi", command=self.cancel_backward_action,
+                                              state="disabled")
+        self.btn_cancel_backward.pack(fill="x", pady=2)
         ttk.Separator(btn_frame, orient="horizontal").pack(fill="x", pady=10)
         ttk.Button(btn_frame, text="Vẽ FPG", command=self.on_draw_fpg).pack(fill="x", pady=2)
         ttk.Button(btn_frame, text="Vẽ RPG", command=self.on_draw_rpg).pack(fill="x", pady=2)
+
+        # Khung nhìn tập trung cho tập luật lớn: chỉ vẽ phần đồ thị quanh một fact / mục tiêu
+        view_frame = ttk.Frame(btn_frame)
+        view_frame.pack(fill="x", pady=2)
+        ttk.Label(view_frame, text="Fact:").pack(side="left")
+        self.ent_view_center = ttk.Entry(view_frame, width=14)
+        self.ent_view_center.pack(side="left", fill="x", expand=True, padx=2)
+        ttk.Label(view_frame, text="k:").pack(side="left")
+        self.view_hops = tk.IntVar(value=2)
+        ttk.Spinbox(view_frame, from_=1, to=6, width=3, textvariable=self.view_hops).pack(side="left", padx=2)
+        ttk.Button(btn_frame, text="Vẽ lân cận k bước", command=lambda: self.on_draw_view('hop')).pack(fill="x",
+                                                                                                        pady=2)
+        ttk.Button(btn_frame, text="Vẽ nón suy diễn", command=lambda: self.on_draw_view('cone')).pack(fill="x",
+                                                                                                       pady=2)
         ttk.Separator(btn_frame, orient="horizontal").pack(fill="x", pady=10)
         ttk.Button(btn_frame, text="Xóa kết quả", command=lambda: self.txt_out.delete("1.0", "end")).pack(fill="x",
                                                                                                           pady=2)
@@ -804,15 +1110,58 @@ class App(tk.Tk):
         self.last_prov = {}
         self.last_facts = set()
         self.last_rules = []
+        # Chỉ mục luật theo chế độ Min/Max, dựng lại khi tập luật thay đổi
+        self.rule_indexes: Dict[str, RuleIndex] = {}
+        # Chỉ mục kết luận cho suy diễn lùi: dựng ở lần suy diễn lùi đầu tiên,
+        # sau đó cập nhật tăng dần khi thêm / sửa / xóa luật
+        self.conclusion_index: Optional[ConclusionIndex] = None
+        # Suy diễn lùi chạy nền: pool dựng khi cần, truy vấn đang chạy (nếu có)
+        self._backward_executor = None
+        self._backward_query = None
+        # Vẽ đồ thị ở luồng nền, có bộ nhớ đệm ảnh; băm tập luật (khóa bộ nhớ đệm) tính một lần
+        # cho mỗi tập luật, bỏ đi khi tải hoặc sửa luật
+        self._graph_renderer = None
+        self._rules_digest: Optional[str] = None
+        # (last_facts, last_prov, khóa): khóa kết quả suy diễn, tính lại khi hai đối tượng được thay mới
+        self._inference_cache: Optional[Tuple] = None
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
 
     # THÊM CÁC PHƯƠNG THỨC NÀY VÀO BÊN TRONG LỚP App
 
+    def _rule_index(self, selection_mode: str) -> RuleIndex:
+        index = self.rule_indexes.get(selection_mode)
+        if index is None:
+            index = self.rule_indexes[selection_mode] = RuleIndex(self.last_rules, selection_mode)
+        return index
+
+    def _backward_index(self) -> ConclusionIndex:
+        if self.conclusion_index is None:
+            self.conclusion_index = ConclusionIndex(self.last_rules)
+        return self.conclusion_index
+
+    def _editable_rules(self) -> List[Rule]:
+        """
+        Bản sao dạng list của tập luật để thêm / sửa / xóa; tác vụ vẽ nền vẫn giữ tập luật cũ nguyên vẹn.
+        Tập luật tải từ snapshot (.kbc) là RuleStore chỉ đọc trên mmap; nó chỉ được chuyển thành các
+        đối tượng Rule ở lần sửa đầu tiên.
+        """
+        if isinstance(self.last_rules, list):
+            self.last_rules = list(self.last_rules)
+        else:
+            self.last_rules = self.last_rules.to_rules()
+        self._rules_digest = None
+        return self.last_rules
+
     def _update_rules_display(self):
         """Cập nhật Listbox hiển thị từ self.last_rules."""
+        self.rule_indexes = {}
         self.rules_listbox.delete(0, "end")
         for i, r in enumerate(self.last_rules):
-            # Cập nhật lại ID
-            self.last_rules[i] = Rule(premises=r.premises, conclusion=r.conclusion, label=r.label, id=i, op=r.op)
+            # Cập nhật lại ID (chỉ dựng lại Rule khi ID thay đổi)
+            if r.id != i:
+                self.last_rules[i] = Rule(premises=r.premises, conclusion=r.conclusion, label=r.label, id=i, op=r.op)
+                if self.conclusion_index is not None:
+                    self.conclusion_index.replace(r, self.last_rules[i])
 
             # SỬA: Dùng đúng toán tử
             op_str = ' & ' if r.op == 'AND' else ' v '
@@ -841,6 +1190,9 @@ class App(tk.Tk):
     # SỬA ĐỔI: App.add_rule_action (để kiểm tra trùng lặp)
     def add_rule_action(self):
         """Mở cửa sổ để thêm một luật mới."""
+        if self._backward_running():
+            messagebox.showwarning("Đang suy diễn", "Hãy dừng suy diễn lùi trước khi thay đổi tập luật.")
+            return
         # ... (code mở editor y như cũ) ...
 
         editor = RuleEditor(self, title="Thêm Luật Mới")
@@ -858,13 +1210,21 @@ class App(tk.Tk):
                 messagebox.showwarning("Trùng lặp", "Luật này đã tồn tại.")
                 return
 
-            self.last_rules.append(new_rule)
+            new_rule = Rule(premises=new_rule.premises, conclusion=new_rule.conclusion, label=new_rule.label,
+                            id=len(self.last_rules), op=new_rule.op)
+            self._editable_rules().append(new_rule)
+            self.rule_indexes = {}
+            if self.conclusion_index is not None:
+                self.conclusion_index.add(new_rule)
             if self._save_rules_to_file():
                 self._update_rules_display()
                 messagebox.showinfo("Thành công", "Đã thêm và lưu luật mới.")
 
     def edit_rule_action(self):
         """Mở cửa sổ để sửa luật đã chọn."""
+        if self._backward_running():
+            messagebox.showwarning("Đang suy diễn", "Hãy dừng suy diễn lùi trước khi thay đổi tập luật.")
+            return
         try:
             selected_index = self.rules_listbox.curselection()[0]
         except IndexError:
@@ -875,13 +1235,21 @@ class App(tk.Tk):
 
         editor = RuleEditor(self, title="Sửa Luật", rule=original_rule)
         if editor.result:
-            self.last_rules[selected_index] = editor.result
+            r = editor.result
+            new_rule = Rule(premises=r.premises, conclusion=r.conclusion, label=r.label, id=selected_index, op=r.op)
+            self._editable_rules()[selected_index] = new_rule
+            self.rule_indexes = {}
+            if self.conclusion_index is not None:
+                self.conclusion_index.replace(original_rule, new_rule)
             if self._save_rules_to_file():
                 self._update_rules_display()
                 messagebox.showinfo("Thành công", "Đã cập nhật và lưu luật.")
 
     def delete_rule_action(self):
         """Xóa luật đã chọn."""
+        if self._backward_running():
+            messagebox.showwarning("Đang suy diễn", "Hãy dừng suy diễn lùi trước khi thay đổi tập luật.")
+            return
         try:
             selected_index = self.rules_listbox.curselection()[0]
         except IndexError:
@@ -889,13 +1257,19 @@ class App(tk.Tk):
             return
 
         if messagebox.askyesno("Xác nhận", "Bạn có chắc chắn muốn xóa luật này?"):
-            self.last_rules.pop(selected_index)
+            removed = self._editable_rules().pop(selected_index)
+            if self.conclusion_index is not None:
+                self.conclusion_index.remove(removed)
+            self.rule_indexes = {}
             if self._save_rules_to_file():
                 self._update_rules_display()
                 messagebox.showinfo("Thành công", "Đã xóa luật.")
 
     def load_rules_action(self):
         """Mở hộp thoại để chọn file .txt và tải các luật."""
+        if self._backward_running():
+            messagebox.showwarning("Đang suy diễn", "Hãy dừng suy diễn lùi trước khi thay đổi tập luật.")
+            return
         filepath = filedialog.askopenfilename(
             title="Chọn file luật",
             filetypes=(("Text Files", "*.txt"), ("All files", "*.*"))
@@ -904,7 +1278,12 @@ class App(tk.Tk):
             return  # Người dùng không chọn file
 
         self.rules_filepath = filepath  # Lưu đường dẫn file
-        self.last_rules = load_and_parse_rules(filepath)
+        # Dùng lại bản biên dịch (.kbc) nếu file luật chưa thay đổi kể từ lần đọc trước. RuleStore được
+        # dùng trực tiếp như List[Rule] (Rule dựng khi truy cập), không chuyển cả tập luật thành đối tượng
+        from kb_snapshot import load_rules_cached
+        self.last_rules = load_rules_cached(filepath, load_and_parse_rules)
+        self.conclusion_index = None
+        self._rules_digest = None
         self._update_rules_display()
 
         if self.last_rules:
@@ -935,12 +1314,17 @@ class App(tk.Tk):
 
             conflict_mode = self.fc_conflict_mode.get()
             selection_mode = self.fc_selection_mode.get()
-            lines.append(f"[Suy diễn Tiến - {conflict_mode} - Chỉ số {selection_mode}]")
-
-            if conflict_mode == "Queue":
-                known, prov, steps = forward_chain_bfs(self.last_rules, self.last_facts, selection_mode)
-            else:  # Stack
-                known, prov, steps = forward_chain_dfs(self.last_rules, self.last_facts, selection_mode)
+            index = self._rule_index(selection_mode)
+            if self.fc_goal_directed.get():
+                lines.append(f"[Suy diễn Tiến - {conflict_mode} - Chỉ số {selection_mode} - Hướng mục tiêu]")
+                lines.append("(Chỉ chạy các luật có thể dẫn tới KL và dừng khi đã chứng minh đủ: "
+                             "các bước và FPG không phải toàn bộ bao đóng)")
+                known, prov, steps = forward_chain_goal(self.last_rules, self.last_facts, goals, selection_mode,
+                                                        conflict_mode, index)
+            else:
+                lines.append(f"[Suy diễn Tiến - {conflict_mode} - Chỉ số {selection_mode}]")
+                known, prov, steps = forward_chain_indexed(self.last_rules, self.last_facts, selection_mode,
+                                                           conflict_mode, index)
 
             self.last_prov = prov
             lines.append(f"GT = {{{', '.join(sorted(self.last_facts))}}}")
@@ -955,52 +1339,174 @@ class App(tk.Tk):
                 messagebox.showerror("Lỗi đầu vào", "Mục tiêu (KL) không được rỗng cho Suy diễn lùi.")
                 return
 
+            if self._backward_running():
+                messagebox.showwarning("Đang suy diễn", "Suy diễn lùi đang chạy, hãy dừng trước khi chạy lại.")
+                return
+
+            # Chạy trên pool nền để GUI không bị treo; kết quả được lấy định kỳ bằng after()
+            from backward_executor import BackwardExecutor, ProofBudget
             selection_mode = self.bc_selection_mode.get()
+            if self._backward_executor is None:
+                self._backward_executor = BackwardExecutor()
+            self._backward_query = self._backward_executor.submit(self.last_rules, self.last_facts, goals,
+                                                                  selection_mode,
+                                                                  ProofBudget(BACKWARD_DEADLINE, MAX_PROOFS_SHOWN),
+                                                                  self._backward_index())
+            self.btn_cancel_backward.state(["!disabled"])
             lines.append(f"[Suy diễn Lùi - Chỉ số {selection_mode}]")
-            prov_for_fpg = {}
-            all_goals_proved = True
+            lines.append("Đang suy diễn...")
+            self.after(BACKWARD_POLL_MS, self._poll_backward, selection_mode, goals)
 
-            for g in goals:
-                paths = backward_chain_all(g, self.last_rules, self.last_facts, set(), selection_mode)
-                if not paths:
+        self.txt_out.delete("1.0", "end")
+        self.txt_out.insert("1.0", "\n".join(lines))
+
+    def _backward_running(self) -> bool:
+        return self._backward_query is not None and not self._backward_query.done()
+
+    def cancel_backward_action(self):
+        if self._backward_running():
+            self._backward_query.cancel()
+
+    def _poll_backward(self, selection_mode: str, goals: Set[str]):
+        """Hiển thị kết quả suy diễn lùi khi mọi mục tiêu đã xong (hoặc đã hủy)."""
+        from backward_executor import CANCELLED
+        if self._backward_running():
+            self.after(BACKWARD_POLL_MS, self._poll_backward, selection_mode, goals)
+            return
+        results = self._backward_query.results()
+        self.btn_cancel_backward.state(["disabled"])
+
+        lines = [f"[Suy diễn Lùi - Chỉ số {selection_mode}]"]
+        prov_for_fpg = {}
+        all_goals_proved = True
+        for g in goals:
+            res = results[g]
+            if not res.proofs:
+                if res.status == CANCELLED:
+                    lines.append(f"\nĐã hủy chứng minh '{g}'.")
+                elif res.status == 'unprovable':
                     lines.append(f"\nKhông chứng minh được '{g}'.")
-                    all_goals_proved = False
                 else:
-                    if selection_mode == 'Min':
-                        min_len = min(len(p) for p in paths)
-                        filtered_paths = [p for p in paths if len(p) == min_len]
-                        lines.append(
-                            f"\nTìm thấy {len(filtered_paths)} đường chứng minh NGẮN NHẤT cho '{g}' (Số bước: {min_len}):")
-                    else:  # 'Max'
-                        max_len = max(len(p) for p in paths)
-                        filtered_paths = [p for p in paths if len(p) == max_len]
-                        lines.append(
-                            f"\nTìm thấy {len(filtered_paths)} đường chứng minh DÀI NHẤT cho '{g}' (Số bước: {max_len}):")
-
-                    for i, chain in enumerate(filtered_paths, 1):
-                        lines.append(f"  Đường chứng minh #{i}:")
-                        for r in chain:
-                            lines.append(f"    - Áp dụng '{r.label}': {{{', '.join(r.premises)}}} → {r.conclusion}")
-
-                    best_path_rules = filtered_paths[0]
-                    for r in best_path_rules:
-                        prov_for_fpg[r.conclusion] = (r, r.premises)
-
-            self.last_prov = prov_for_fpg
-            lines.append(
-                f"\nKết quả: {'CHỨNG MINH ĐƯỢC' if all_goals_proved else 'KHÔNG CHỨNG MINH ĐƯỢC'} KL = {{{', '.join(goals)}}}")
+                    lines.append(f"\nHết ngân sách khi chứng minh '{g}', chưa tìm được đường nào.")
+                all_goals_proved = False
+                continue
 
+            # Chỉ lấy các đường ngắn nhất (Min) / dài nhất (Max); số đường tính bằng quy hoạch động
+            first = res.proofs[0]
+            filtered_paths = list(itertools.takewhile(lambda p: len(p) == len(first), res.proofs))
+            n_best = res.best_count if res.best_count is not None else len(filtered_paths)
+            complete = res.best_count is not None and len(filtered_paths) >= min(n_best, MAX_PROOFS_SHOWN)
+            n_text = str(n_best) if res.best_count is not None else f"ít nhất {n_best}"
+
+            if selection_mode == 'Min':
+                lines.append(f"\nTìm thấy {n_text} đường chứng minh NGẮN NHẤT cho '{g}' (Số bước: {len(first)}):")
+            else:  # 'Max'
+                lines.append(f"\nTìm thấy {n_text} đường chứng minh DÀI NHẤT cho '{g}' (Số bước: {len(first)}):")
+            if res.total is not None:
+                lines.append(f"  (Tổng số đường chứng minh: {res.total})")
+            if not complete:
+                reason = "đã hủy" if res.status == CANCELLED else "hết ngân sách"
+                lines.append(f"  ({reason}, kết quả chưa đầy đủ)")
+
+            for i, chain in enumerate(filtered_paths[:MAX_PROOFS_SHOWN], 1):
+                lines.append(f"  Đường chứng minh #{i}:")
+                for r in chain:
+                    lines.append(f"    - Áp dụng '{r.label}': {{{', '.join(r.premises)}}} → {r.conclusion}")
+            if n_best > MAX_PROOFS_SHOWN:
+                lines.append(f"  ... và {n_best - MAX_PROOFS_SHOWN} đường khác.")
+
+            for r in first:
+                prov_for_fpg[r.conclusion] = (r, r.premises)
+
+        self.last_prov = prov_for_fpg
+        lines.append(
+            f"\nKết quả: {'CHỨNG MINH ĐƯỢC' if all_goals_proved else 'KHÔNG CHỨNG MINH ĐƯỢC'} KL = {{{', '.join(goals)}}}")
         self.txt_out.delete("1.0", "end")
         self.txt_out.insert("1.0", "\n".join(lines))
 
+    def on_close(self):
+        if self._backward_executor is not None:
+            self.cancel_backward_action()
+            self._backward_executor.shutdown(wait=False)
+        if self._graph_renderer is not None:
+            self._graph_renderer.shutdown(wait=False)
+        self.destroy()
+
     def on_draw_fpg(self):
-        draw_process_graph(self.last_prov, self.last_facts, self.last_rules)
+        if not self.last_rules:
+            messagebox.showwarning("Lỗi", "Không có luật nào để vẽ đồ thị.")
+            return
+        self._render_graph('fpg', "Flow Process Graph (FPG)")
 
     def on_draw_rpg(self):
         if not self.last_rules:
             messagebox.showerror("Lỗi", "Vui lòng tải tập luật từ file để vẽ đồ thị.")
             return
-        draw_rpg(self.last_rules)
+        self._render_graph('rpg', "Rule Process Graph (RPG)")
+
+    def on_draw_view(self, view_kind: str):
+        """Vẽ lân cận k bước quanh một fact, hoặc nón suy diễn của một mục tiêu (mặc định: KL đầu tiên)."""
+        if not self.last_rules:
+            messagebox.showerror("Lỗi", "Vui lòng tải tập luật từ file để vẽ đồ thị.")
+            return
+        center = self.ent_view_center.get().strip()
+        if not center:
+            center = next((x.strip() for x in self.ent_goal.get().split(",") if x.strip()), "")
+        if not center:
+            messagebox.showerror("Lỗi đầu vào", "Hãy nhập fact hoặc mục tiêu cần xem.")
+            return
+        if view_kind == 'hop':
+            try:
+                k = max(1, int(self.view_hops.get()))
+            except (tk.TclError, ValueError):
+                messagebox.showerror("Lỗi đầu vào", "k phải là số nguyên dương.")
+                return
+            self._render_graph('view', f"Lân cận {k} bước: {center}", ('hop', center, k))
+        else:
+            self._render_graph('view', f"Nón suy diễn: {center}", ('cone', center))
+
+    def _render_graph(self, kind: str, title: str, view: Tuple = None):
+        """Vẽ đồ thị ở luồng nền (ảnh đã có trong bộ nhớ đệm thì hiện ngay), rồi hiện trong cửa sổ con."""
+        from graph_render import GraphRenderer, rules_digest, inference_key
+        if self._graph_renderer is None:
+            self._graph_renderer = GraphRenderer()
+        if self._rules_digest is None:
+            self._rules_digest = rules_digest(self.last_rules)
+        cached = self._inference_cache
+        if cached is None or cached[0] is not self.last_facts or cached[1] is not self.last_prov:
+            cached = self._inference_cache = (self.last_facts, self.last_prov,
+                                              inference_key(self.last_facts, self.last_prov))
+        future = self._graph_renderer.submit(kind, self.last_rules, self._rules_digest, self.last_facts,
+                                             self.last_prov, cached[2], view)
+        self._poll_render(future, title)
+
+    def _poll_render(self, future, title: str):
+        if not future.done():
+            self.after(BACKWARD_POLL_MS, self._poll_render, future, title)
+            return
+        try:
+            result = future.result()
+        except Exception as e:
+            messagebox.showerror("Lỗi Vẽ Đồ Thị", f"Không thể vẽ đồ thị: {e}")
+            return
+        self._show_image(result.png, title)
+
+    def _show_image(self, png: bytes, title: str):
+        win = tk.Toplevel(self)
+        win.title(title)
+        image = tk.PhotoImage(data=base64.b64encode(png))
+        canvas = tk.Canvas(win, width=min(image.width(), 1200), height=min(image.height(), 800),
+                           scrollregion=(0, 0, image.width(), image.height()))
+        x_scroll = ttk.Scrollbar(win, orient="horizontal", command=canvas.xview)
+        y_scroll = ttk.Scrollbar(win, orient="vertical", command=canvas.yview)
+        canvas.config(xscrollcommand=x_scroll.set, yscrollcommand=y_scroll.set)
+        canvas.grid(row=0, column=0, sticky="nsew")
+        y_scroll.grid(row=0, column=1, sticky="ns")
+        x_scroll.grid(row=1, column=0, sticky="ew")
+        win.rowconfigure(0, weight=1)
+        win.columnconfigure(0, weight=1)
+        canvas.create_image(0, 0, image=image, anchor="nw")
+        canvas.image = image  # Giữ tham chiếu để ảnh không bị thu hồi
 
 
 if __name__ == "__main__":
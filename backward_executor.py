@@ -0,0 +1,198 @@
+# =============================
+# Backward Executor - Suy diễn lùi song song cho nhiều mục tiêu, có ngân sách và hủy giữa chừng
+# =============================
+import multiprocessing as mp
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import List, Set, Dict, Iterable, Optional, Callable
+
+from ToanHoc import Rule, ConclusionIndex, iter_proofs
+
+# Trạng thái kết quả của một mục tiêu
+PROVED = 'proved'
+UNPROVABLE = 'unprovable'
+BUDGET_EXHAUSTED = 'budget_exhausted'
+CANCELLED = 'cancelled'
+
+
+@dataclass(frozen=True)
+class ProofBudget:
+    """
+    Ngân sách cho mỗi mục tiêu của một truy vấn (None = không giới hạn):
+    - deadline: số giây tính từ lúc gửi truy vấn.
+    - max_proofs: số đường chứng minh tối đa được thu thập.
+    - max_depth: độ sâu mục tiêu con tối đa (mục tiêu gốc có độ sâu 0).
+    """
+    deadline: Optional[float] = None
+    max_proofs: Optional[int] = None
+    max_depth: Optional[int] = None
+
+
+@dataclass
+class GoalResult:
+    """
+    Kết quả của một mục tiêu. `proofs` theo thứ tự độ dài tăng dần (Max: giảm dần) như iter_proofs,
+    có thể chỉ là một phần khi status là budget_exhausted / cancelled.
+    best_count / total: số đường ngắn nhất (Max: dài nhất) và tổng số đường, None nếu không tính.
+    """
+    goal: str
+    status: str
+    proofs: List[List[Rule]] = field(default_factory=list)
+    best_count: Optional[int] = None
+    total: Optional[int] = None
+    elapsed: float = 0.0
+
+
+def stop_condition(expires: Optional[float] = None, cancel_event=None) -> Callable[[], bool]:
+    """Hàm trả về True khi truy vấn bị hủy hoặc đã quá `expires`."""
+    def should_stop() -> bool:
+        return (cancel_event is not None and cancel_event.is_set()) or \
+            (expires is not None and time.time() > expires)
+    return should_stop
+
+
+def prove_goal(goal: str, rules: List[Rule], facts: Set[str], selection_mode: str = 'Min',
+               budget: ProofBudget = ProofBudget(), expires: Optional[float] = None,
+               cancel_event=None, index: ConclusionIndex = None, tabled=None) -> GoalResult:
+    """
+    Chứng minh một mục tiêu trong ngân sách; dừng hợp tác khi `cancel_event` được bật hoặc quá `expires`.
+    tabled: TabledBackwardChainer dùng chung giữa các mục tiêu của cùng truy vấn (cùng rules / facts /
+    selection_mode, should_stop theo cùng expires / cancel_event); None thì dựng bảng riêng.
+    """
+    from tabled_backward import TabledBackwardChainer, SolveInterrupted
+    from proof_analysis import ProofAnalysis
+
+    started = time.time()
+    if tabled is not None:
+        index = tabled.index
+    elif index is None:
+        index = ConclusionIndex(rules)
+
+    def cancelled() -> bool:
+        return cancel_event is not None and cancel_event.is_set()
+
+    should_stop = stop_condition(expires, cancel_event)
+
+    def result(status: str, proofs=(), best_count=None, total=None) -> GoalResult:
+        return GoalResult(goal, status, list(proofs), best_count, total, time.time() - started)
+
+    def interrupted(proofs=()) -> GoalResult:
+        return result(CANCELLED if cancelled() else BUDGET_EXHAUSTED, proofs)
+
+    if cancelled():
+        return result(CANCELLED)
+    # Bảng mục tiêu con (đa thức) loại ngay mục tiêu không chứng minh được và dùng lại làm cận dưới
+    # cho iter_proofs; mọi bước đều kiểm tra hủy / hết hạn trong lúc chạy
+    if tabled is None:
+        tabled = TabledBackwardChainer(rules, facts, selection_mode, index, should_stop)
+    try:
+        if not tabled.is_provable(goal):
+            return result(UNPROVABLE)
+    except SolveInterrupted:
+        return interrupted()
+
+    proofs: List[List[Rule]] = []
+    more = False
+    it = iter_proofs(goal, rules, facts, selection_mode, longest=selection_mode == 'Max', index=index,
+                     max_depth=budget.max_depth, should_stop=should_stop, tabled=tabled)
+    for proof in it:
+        if budget.max_proofs is not None and len(proofs) >= budget.max_proofs:
+            more = True
+            break
+        proofs.append(proof)
+        if should_stop():
+            break
+
+    if should_stop():
+        # Bị hủy hoặc hết thời gian: giữ các đường đã có, không đếm nữa
+        return interrupted(proofs)
+    status = BUDGET_EXHAUSTED if more or not proofs else PROVED
+
+    # Đếm bằng quy hoạch động (đồ thị có chu trình: trên rừng chứng minh); chỉ có nghĩa khi không giới hạn độ sâu
+    best_count = total = None
+    if budget.max_depth is None:
+        try:
+            analysis = ProofAnalysis(rules, facts, selection_mode, tabled=tabled)
+            best_count = analysis.count_shortest(goal) if selection_mode == 'Min' else analysis.count_longest(goal)
+            total = analysis.count(goal)
+        except SolveInterrupted:
+            return interrupted(proofs)
+    return result(status, proofs, best_count, total)
+
+
+class BackwardQuery:
+    """Một truy vấn nhiều mục tiêu đang chạy: theo dõi, hủy và lấy kết quả (kể cả kết quả dở dang)."""
+
+    def __init__(self, futures: Dict[str, Future], cancel_event):
+        self.futures = futures
+        self._cancel_event = cancel_event
+
+    def cancel(self):
+        """Hủy hợp tác: mục tiêu chưa chạy bị bỏ, mục tiêu đang chạy dừng ở lần kiểm tra kế tiếp."""
+        self._cancel_event.set()
+        for future in self.futures.values():
+            future.cancel()
+
+    def cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def done(self) -> bool:
+        return all(future.done() for future in self.futures.values())
+
+    def results(self, timeout: Optional[float] = None) -> Dict[str, GoalResult]:
+        """Chờ (tối đa `timeout` giây mỗi mục tiêu) rồi trả về kết quả theo thứ tự mục tiêu."""
+        out: Dict[str, GoalResult] = {}
+        for goal, future in self.futures.items():
+            if future.cancelled():
+                out[goal] = GoalResult(goal, CANCELLED)
+            else:
+                out[goal] = future.result(timeout)
+        return out
+
+
+class BackwardExecutor:
+    """
+    Pool chạy suy diễn lùi cho nhiều mục tiêu song song, mỗi mục tiêu một tác vụ.
+    - Mặc định dùng luồng: tập luật, chỉ mục và bảng mục tiêu con (TabledBackwardChainer) được dùng
+      chung giữa các mục tiêu của một truy vấn, nên mục tiêu con chung chỉ được giải một lần; phù hợp
+      cho GUI (luồng Tk chỉ cần hỏi định kỳ bằng after()).
+    - use_processes=True dùng pool tiến trình cho suy diễn nặng CPU; tập luật đi kèm từng tác vụ,
+      chỉ mục và bảng được dựng lại trong tiến trình con.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, use_processes: bool = False):
+        self.use_processes = use_processes
+        if use_processes:
+            self._manager = mp.Manager()
+            self._pool = ProcessPoolExecutor(max_workers)
+        else:
+            self._manager = None
+            self._pool = ThreadPoolExecutor(max_workers, thread_name_prefix="backward")
+
+    def submit(self, rules: List[Rule], facts: Set[str], goals: Iterable[str], selection_mode: str = 'Min',
+               budget: ProofBudget = None, index: ConclusionIndex = None) -> BackwardQuery:
+        if budget is None:
+            budget = ProofBudget()
+        expires = None if budget.deadline is None else time.time() + budget.deadline
+        cancel_event = self._manager.Event() if self.use_processes else threading.Event()
+        facts = set(facts)
+        tabled = None
+        if self.use_processes:
+            index = None
+        else:
+            from tabled_backward import TabledBackwardChainer
+            tabled = TabledBackwardChainer(rules, facts, selection_mode, index,
+                                           stop_condition(expires, cancel_event))
+
+        futures: Dict[str, Future] = {}
+        for g in dict.fromkeys(goals):
+            futures[g] = self._pool.submit(prove_goal, g, rules, facts, selection_mode, budget, expires,
+                                           cancel_event, index, tabled)
+        return BackwardQuery(futures, cancel_event)
+
+    def shutdown(self, wait: bool = True):
+        self._pool.shutdown(wait=wait, cancel_futures=True)
+        if self._manager is not None:
+            self._manager.shutdown()
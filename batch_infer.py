@@ -0,0 +1,72 @@
+# =============================
+# Batch Inference - Suy diễn hàng loạt trên nhiều tiến trình
+# =============================
+import multiprocessing as mp
+from typing import Tuple, List, Set, Dict, Iterable, Iterator, Union, Optional
+
+from ToanHoc import Rule, RuleIndex, ConclusionIndex, forward_chain_indexed, backward_chain_all
+from rule_parser import parse_rules_file
+
+# Trạng thái riêng của mỗi tiến trình con: tập luật và chỉ mục chỉ được nạp một lần
+_worker_rules: List[Rule] = []
+_worker_indexes: Dict[str, RuleIndex] = {}
+_worker_conclusions: Optional[ConclusionIndex] = None
+
+
+def _init_worker(rules: List[Rule]):
+    global _worker_rules, _worker_indexes, _worker_conclusions
+    _worker_rules = rules
+    _worker_indexes = {}
+    _worker_conclusions = None
+
+
+def _worker_index(selection_mode: str) -> RuleIndex:
+    index = _worker_indexes.get(selection_mode)
+    if index is None:
+        index = _worker_indexes[selection_mode] = RuleIndex(_worker_rules, selection_mode)
+    return index
+
+
+def _worker_conclusion_index() -> ConclusionIndex:
+    global _worker_conclusions
+    if _worker_conclusions is None:
+        _worker_conclusions = ConclusionIndex(_worker_rules)
+    return _worker_conclusions
+
+
+def _run_query(task):
+    i, facts, goals, mode, selection_mode, trace = task
+    if mode == 'Backward':
+        index = _worker_conclusion_index()
+        return i, {g: backward_chain_all(g, _worker_rules, facts, set(), selection_mode, index) for g in goals}
+    return i, forward_chain_indexed(_worker_rules, facts, selection_mode, mode, _worker_index(selection_mode),
+                                    trace)
+
+
+def batch_infer(rules: Union[List[Rule], str], list_of_fact_sets: Iterable[Set[str]], mode: str = 'Queue',
+                selection_mode: str = 'Min', goals: Iterable[str] = (), ordered: bool = True,
+                processes: Optional[int] = None, chunksize: int = 16,
+                trace: bool = True) -> Iterator[Tuple[int, object]]:
+    """
+    Chạy nhiều truy vấn song song trên một pool tiến trình, trả về dần các cặp (chỉ số, kết quả).
+    - rules: danh sách Rule hoặc đường dẫn file luật (được đọc một lần ở tiến trình gọi).
+      Tập luật chỉ được gửi cho mỗi tiến trình một lần qua initializer, không đi kèm từng truy vấn.
+    - mode: 'Queue' / 'Stack' (suy diễn tiến, kết quả là (known, prov, steps))
+      hoặc 'Backward' (kết quả là {goal: các đường chứng minh} cho từng goal trong `goals`).
+    - ordered: True trả về theo thứ tự đầu vào, False theo thứ tự hoàn thành.
+    - trace: False để bỏ ghi vết suy diễn (steps rỗng) khi chỉ cần known/prov.
+    """
+    if mode not in ('Queue', 'Stack', 'Backward'):
+        raise ValueError(f"Chế độ suy diễn không hợp lệ: {mode}")
+
+    if isinstance(rules, str):
+        # Đọc ở tiến trình cha: tiến trình con của pool là daemon nên không mở được pool đọc song song
+        rules = parse_rules_file(rules)[0]
+
+    goals = tuple(goals)
+    tasks = ((i, set(facts), goals, mode, selection_mode, trace) for i, facts in enumerate(list_of_fact_sets))
+
+    with mp.Pool(processes, initializer=_init_worker, initargs=(rules,)) as pool:
+        results = pool.imap(_run_query, tasks, chunksize) if ordered else \
+            pool.imap_unordered(_run_query, tasks, chunksize)
+        yield from results
@@ -0,0 +1,175 @@
+# =============================
+# Bitset Engine - Suy diễn tiến theo lô (NumPy)
+# =============================
+from typing import Tuple, List, Set, Dict, Iterable
+
+import numpy as np
+
+from ToanHoc import Rule, forward_chain_indexed
+
+WORD_BITS = 64
+
+
+def _csr(groups: List[List[int]]) -> Tuple[np.ndarray, np.ndarray]:
+    """Danh sách nhóm -> (ptr, ids) dạng CSR."""
+    lengths = np.fromiter((len(g) for g in groups), dtype=np.int64, count=len(groups))
+    ptr = np.zeros(len(groups) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=ptr[1:])
+    ids = np.fromiter((i for g in groups for i in g), dtype=np.int64, count=int(ptr[-1]))
+    return ptr, ids
+
+
+def _gather_segments(ptr: np.ndarray, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Lấy các đoạn CSR của `rows`: trả về (chỉ số phần tử, điểm bắt đầu từng đoạn)."""
+    lengths = ptr[rows + 1] - ptr[rows]
+    starts = np.zeros(len(rows), dtype=np.int64)
+    np.cumsum(lengths[:-1], out=starts[1:])
+    offsets = np.arange(int(lengths.sum()), dtype=np.int64) - np.repeat(starts, lengths)
+    return np.repeat(ptr[rows], lengths) + offsets, starts
+
+
+class _RuleMatrix:
+    """Ma trận liên thuộc thưa tiền đề/kết luận cho một nhóm luật cùng toán tử."""
+
+    def __init__(self, positions: List[int], premises: List[List[int]], conclusions: List[int], n_facts: int):
+        self.positions = np.asarray(positions, dtype=np.int64)
+        self.ptr, self.premises = _csr(premises)
+        self.conclusions = np.asarray(conclusions, dtype=np.int64)
+        # fact -> các luật có nó làm tiền đề (để chỉ tính lại luật bị ảnh hưởng)
+        by_fact: List[List[int]] = [[] for _ in range(n_facts)]
+        for rid, prem in enumerate(premises):
+            for f in prem:
+                by_fact[f].append(rid)
+        self.fact_ptr, self.fact_rules = _csr(by_fact)
+
+    def __len__(self):
+        return len(self.conclusions)
+
+    def affected(self, facts: np.ndarray) -> np.ndarray:
+        idx, _ = _gather_segments(self.fact_ptr, facts)
+        return np.unique(self.fact_rules[idx])
+
+    def satisfied(self, state: np.ndarray, rows: np.ndarray, reducer) -> np.ndarray:
+        """Bitset các đầu vào thỏa mãn từng luật trong `rows` (AND/OR theo reducer)."""
+        idx, starts = _gather_segments(self.ptr, rows)
+        return reducer.reduceat(state[self.premises[idx]], starts, axis=0)
+
+
+class BitsetEngine:
+    """
+    Biên dịch tập luật thành ma trận liên thuộc thưa (fact được ánh xạ sang số nguyên) và tính
+    điểm bất động cho cả một lô tập fact cùng lúc. Trạng thái là ma trận bit đóng gói
+    state[fact, word]: bit j của dòng f bật khi đầu vào thứ j đã biết f.
+    """
+
+    def __init__(self, rules: List[Rule]):
+        self.rules = rules
+        self.fact_ids: Dict[str, int] = {}
+        self.fact_names: List[str] = []
+
+        groups = {'AND': ([], [], []), 'OR': ([], [], [])}
+        for pos, r in enumerate(rules):
+            if not r.premises or r.op not in groups:
+                continue
+            positions, premises, conclusions = groups[r.op]
+            positions.append(pos)
+            premises.append(sorted({self._intern(p) for p in r.premises}))
+            conclusions.append(self._intern(r.conclusion))
+
+        n = len(self.fact_names)
+        self._name_array = np.array(self.fact_names, dtype=object)
+        self.and_rules = _RuleMatrix(*groups['AND'], n)
+        self.or_rules = _RuleMatrix(*groups['OR'], n)
+
+    def _intern(self, fact: str) -> int:
+        fid = self.fact_ids.get(fact)
+        if fid is None:
+            fid = len(self.fact_names)
+            self.fact_ids[fact] = fid
+            self.fact_names.append(fact)
+        return fid
+
+    # ---------- Suy diễn theo lô ----------
+    def closure_bits(self, fact_sets: List[Set[str]]) -> np.ndarray:
+        """Ma trận bit known[fact, word] sau khi đạt điểm bất động."""
+        n_words = max(1, (len(fact_sets) + WORD_BITS - 1) // WORD_BITS)
+        state = np.zeros((len(self.fact_names), n_words), dtype=np.uint64)
+
+        rows, cols = [], []
+        for j, facts in enumerate(fact_sets):
+            for f in facts:
+                fid = self.fact_ids.get(f)
+                if fid is not None:
+                    rows.append(fid)
+                    cols.append(j)
+        if rows:
+            rows = np.asarray(rows, dtype=np.int64)
+            cols = np.asarray(cols, dtype=np.uint64)
+            bits = np.left_shift(np.uint64(1), cols % np.uint64(WORD_BITS))
+            np.bitwise_or.at(state, (rows, (cols // np.uint64(WORD_BITS)).astype(np.int64)), bits)
+
+        # Semi-naive: mỗi vòng chỉ tính lại các luật có tiền đề vừa thay đổi
+        changed = np.unique(np.asarray(rows, dtype=np.int64))
+        while len(changed):
+            update = np.zeros_like(state)
+            for matrix, reducer in ((self.and_rules, np.bitwise_and), (self.or_rules, np.bitwise_or)):
+                if not len(matrix):
+                    continue
+                active = matrix.affected(changed)
+                if not len(active):
+                    continue
+                sat = matrix.satisfied(state, active, reducer)
+                np.bitwise_or.at(update, matrix.conclusions[active], sat)
+
+            new_bits = update & ~state
+            changed = np.flatnonzero(new_bits.any(axis=1))
+            state |= new_bits
+        return state
+
+    def infer_batch(self, fact_sets: Iterable[Iterable[str]], with_prov: bool = False,
+                    selection_mode: str = 'Min', conflict_mode: str = 'Queue'):
+        """
+        Trả về (knowns, provs): knowns[j] là tập fact đã biết của đầu vào j. Nếu with_prov,
+        provs[j] là prov mà forward_chain_indexed (Queue/Stack, Min/Max) sẽ cho ra; ngược lại None.
+        """
+        fact_sets = [set(fs) for fs in fact_sets]
+        state = self.closure_bits(fact_sets)
+
+        knowns = [set(fs) for fs in fact_sets]
+        for j, rows in self._columns(state, len(fact_sets)):
+            knowns[j].update(self._name_array[rows].tolist())
+
+        if not with_prov:
+            return knowns, None
+
+        # Luật không thỏa trong bao đóng cuối cùng thì không bao giờ kích hoạt, nên chạy engine
+        # vô hướng chỉ trên các luật thỏa sẽ cho đúng prov của engine vô hướng đầy đủ.
+        applicable: List[List[int]] = [[] for _ in fact_sets]
+        for matrix, reducer in ((self.and_rules, np.bitwise_and), (self.or_rules, np.bitwise_or)):
+            if not len(matrix):
+                continue
+            sat = matrix.satisfied(state, np.arange(len(matrix), dtype=np.int64), reducer)
+            for j, rids in self._columns(sat, len(fact_sets)):
+                applicable[j].extend(matrix.positions[rids].tolist())
+
+        provs = []
+        for facts, positions in zip(fact_sets, applicable):
+            sub_rules = [self.rules[pos] for pos in sorted(positions)]
+            _, prov, _ = forward_chain_indexed(sub_rules, facts, selection_mode, conflict_mode, trace=False)
+            provs.append(prov)
+        return knowns, provs
+
+    @staticmethod
+    def _columns(bits: np.ndarray, n_inputs: int):
+        """Duyệt (j, các dòng có bit j bật) theo từng word để giới hạn bộ nhớ."""
+        for w in range(bits.shape[1]):
+            block = np.unpackbits(np.ascontiguousarray(bits[:, w], dtype="<u8").view(np.uint8).reshape(-1, 8),
+                                  axis=1, bitorder='little')
+            cols, rows = np.nonzero(block.T)
+            if not len(cols):
+                continue
+            splits = np.flatnonzero(np.diff(cols)) + 1
+            for col_rows, col in zip(np.split(rows, splits), cols[np.r_[0, splits]]):
+                j = w * WORD_BITS + int(col)
+                if j < n_inputs:
+                    yield j, col_rows
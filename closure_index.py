@@ -0,0 +1,362 @@
+# =============================
+# Closure Index - Bao đóng bắc cầu dựng sẵn cho luật một tiền đề / luật OR
+# =============================
+from array import array
+from collections import deque
+from typing import Tuple, List, Set, Dict, Iterator, Optional
+
+from ToanHoc import Rule, InferenceTrace
+
+
+def is_unit_rule(r: Rule) -> bool:
+    """Luật kích hoạt chỉ từ một tiền đề bất kỳ: luật OR hoặc luật AND có đúng một tiền đề (khác nhau)."""
+    return r.op == 'OR' or len(set(r.premises)) == 1
+
+
+class ClosureIndex:
+    """
+    Chỉ mục bao đóng cho phần luật "đơn vị" (OR, IsA một tiền đề) của tập luật, nén theo DAG:
+    - Các fact được gom thành thành phần liên thông mạnh (Tarjan); mọi fact trong một thành phần
+      có cùng bao đóng, nên bao đóng chỉ lưu theo thành phần.
+    - Đồ thị thành phần (DAG) được phủ bằng một rừng khung duyệt sâu với một preorder chung:
+      cây con của thành phần c là khoảng comp_order[comp_pre[c]:comp_end[c]], luật dẫn vào c trên
+      cây là comp_entry_rule[c] (từ fact comp_entry_fact[c]).
+    - Bao đóng của thành phần c là hợp của vài cây con không lồng nhau (cover): cov_root[k] với k trong
+      [cov_ptr[c], cov_ptr[c + 1]), kèm luật dẫn vào gốc mỗi cây con. Cây con được dùng chung giữa
+      mọi thành phần đạt tới nó, nên một chuỗi IsA dài chỉ tốn một khoảng cho mỗi thành phần
+      (O(V) thay vì một danh sách riêng cho từng fact nguồn).
+    Khi tra cứu, gặp fact đã mở rộng thì nhảy qua cả cây con của nó (mọi fact trong đó đã biết),
+    nên chi phí gần với số fact mới suy ra được.
+    Các luật AND nhiều tiền đề được giữ lại trong join_by_premise / premise_count để chạy bằng bộ đếm.
+    """
+
+    def __init__(self, rules: List[Rule], selection_mode: str = 'Min'):
+        self.selection_mode = selection_mode
+        self.rule_source: List[Rule] = rules if selection_mode == 'Min' else list(reversed(rules))
+
+        self.fact_ids: Dict[str, int] = {}
+        self.fact_names: List[str] = []
+        self.join_by_premise: Dict[str, List[int]] = {}
+        self.premise_count: List[int] = []
+
+        # Cạnh p -> (kết luận, vị trí luật), theo thứ tự ưu tiên Min/Max
+        edges: Dict[int, List[Tuple[int, int]]] = {}
+        for pos, r in enumerate(self.rule_source):
+            if is_unit_rule(r):
+                self.premise_count.append(0)
+                c = self._intern(r.conclusion)
+                for p in dict.fromkeys(r.premises):
+                    edges.setdefault(self._intern(p), []).append((c, pos))
+            else:
+                distinct = dict.fromkeys(r.premises)
+                self.premise_count.append(len(distinct))
+                for p in distinct:
+                    self.join_by_premise.setdefault(p, []).append(pos)
+
+        # Cạnh đơn vị dạng CSR: cạnh của fact f là adj_fact / adj_rule [adj_ptr[f], adj_ptr[f + 1])
+        self.adj_ptr = array('q', [0])
+        self.adj_fact = array('i')
+        self.adj_rule = array('i')
+        for f in range(len(self.fact_names)):
+            for c, pos in edges.get(f, ()):
+                self.adj_fact.append(c)
+                self.adj_rule.append(pos)
+            self.adj_ptr.append(len(self.adj_fact))
+        del edges
+
+        self._condense()
+        self._span()
+        self._cover()
+
+    def _intern(self, fact: str) -> int:
+        fid = self.fact_ids.get(fact)
+        if fid is None:
+            fid = len(self.fact_names)
+            self.fact_ids[fact] = fid
+            self.fact_names.append(fact)
+        return fid
+
+    # ---------- Dựng chỉ mục ----------
+    def _condense(self):
+        """
+        Tarjan không đệ quy trên toàn đồ thị luật đơn vị. Thành phần được đánh số theo thứ tự hoàn
+        thành, nên thành phần chỉ trỏ tới thành phần có số nhỏ hơn (số lớn hơn đứng trước theo thứ tự tô-pô).
+        """
+        n = len(self.fact_names)
+        adj_ptr, adj_fact = self.adj_ptr, self.adj_fact
+        order = array('i', [-1]) * n
+        low = array('i', [0]) * n
+        on_stack = bytearray(n)
+        self.comp_of = array('i', [-1]) * n
+        self.comp_size = array('i')
+        tarjan_stack: List[int] = []
+        counter = 0
+
+        for root in range(n):
+            if order[root] >= 0:
+                continue
+            order[root] = low[root] = counter
+            counter += 1
+            tarjan_stack.append(root)
+            on_stack[root] = 1
+            work = [[root, adj_ptr[root]]]
+            while work:
+                frame = work[-1]
+                v, k = frame
+                stop = adj_ptr[v + 1]
+                while k < stop:
+                    w = adj_fact[k]
+                    k += 1
+                    if order[w] < 0:
+                        frame[1] = k
+                        order[w] = low[w] = counter
+                        counter += 1
+                        tarjan_stack.append(w)
+                        on_stack[w] = 1
+                        work.append([w, adj_ptr[w]])
+                        break
+                    if on_stack[w] and order[w] < low[v]:
+                        low[v] = order[w]
+                else:
+                    work.pop()
+                    if work:
+                        u = work[-1][0]
+                        if low[v] < low[u]:
+                            low[u] = low[v]
+                    if low[v] == order[v]:
+                        comp = len(self.comp_size)
+                        size = 0
+                        while True:
+                            w = tarjan_stack.pop()
+                            on_stack[w] = 0
+                            self.comp_of[w] = comp
+                            size += 1
+                            if w == v:
+                                break
+                        self.comp_size.append(size)
+
+        # Fact của từng thành phần (CSR), theo thứ tự id fact
+        n_comps = len(self.comp_size)
+        self.member_ptr = array('q', [0]) * (n_comps + 1)
+        for c in self.comp_of:
+            self.member_ptr[c + 1] += 1
+        for c in range(n_comps):
+            self.member_ptr[c + 1] += self.member_ptr[c]
+        fill = array('q', self.member_ptr[:-1])
+        self.members = array('i', [0]) * n
+        for f, c in enumerate(self.comp_of):
+            self.members[fill[c]] = f
+            fill[c] += 1
+
+    def _comp_successors(self, comp: int) -> List[Tuple[int, int, int, int]]:
+        """Các thành phần kề sau `comp`: (thành phần, tiền đề, fact đích, vị trí luật), mỗi thành phần một cạnh đại diện."""
+        adj_ptr, adj_fact, adj_rule, comp_of = self.adj_ptr, self.adj_fact, self.adj_rule, self.comp_of
+        out: Dict[int, Tuple[int, int, int, int]] = {}
+        for i in range(self.member_ptr[comp], self.member_ptr[comp + 1]):
+            f = self.members[i]
+            for k in range(adj_ptr[f], adj_ptr[f + 1]):
+                d = comp_of[adj_fact[k]]
+                if d != comp and d not in out:
+                    out[d] = (d, f, adj_fact[k], adj_rule[k])
+        return list(out.values())
+
+    def _span(self):
+        """Rừng khung duyệt sâu trên DAG thành phần, gốc lấy theo thứ tự tô-pô (nên gốc là nguồn)."""
+        n_comps = len(self.comp_size)
+        self.comp_order = array('i')
+        self.comp_pre = array('i', [-1]) * n_comps
+        self.comp_end = array('i', [0]) * n_comps
+        self.comp_entry_fact = array('i', [-1]) * n_comps
+        self.comp_entry_rule = array('i', [-1]) * n_comps
+        # Tổng số fact của các thành phần đứng trước trong preorder (để đếm kích thước bao đóng)
+        self.size_prefix = array('q', [0])
+
+        for root in range(n_comps - 1, -1, -1):
+            if self.comp_pre[root] >= 0:
+                continue
+            self._visit(root)
+            work = [iter(self._comp_successors(root))]
+            path = [root]
+            while work:
+                for d, _, fact, pos in work[-1]:
+                    if self.comp_pre[d] >= 0:
+                        continue
+                    self.comp_entry_fact[d] = fact
+                    self.comp_entry_rule[d] = pos
+                    self._visit(d)
+                    work.append(iter(self._comp_successors(d)))
+                    path.append(d)
+                    break
+                else:
+                    work.pop()
+                    self.comp_end[path.pop()] = len(self.comp_order)
+
+    def _visit(self, comp: int):
+        self.comp_pre[comp] = len(self.comp_order)
+        self.comp_order.append(comp)
+        self.size_prefix.append(self.size_prefix[-1] + self.comp_size[comp])
+
+    def _cover(self):
+        """
+        Bao đóng của mỗi thành phần = cây con của nó cùng cover của các thành phần kề sau,
+        chỉ giữ các cây con lớn nhất (khoảng preorder lồng nhau hoặc rời nhau). Tính từ lá lên.
+        Mục đầu của cover là chính thành phần; các mục sau xếp theo thứ tự tô-pô, nên luật dẫn
+        vào mỗi cây con luôn có tiền đề nằm trong một cây con đã duyệt trước đó.
+        """
+        pre, end = self.comp_pre, self.comp_end
+        self.cov_ptr = array('q', [0])
+        self.cov_root = array('i')
+        self.cov_premise = array('i')
+        self.cov_fact = array('i')
+        self.cov_rule = array('i')
+        # Cover của thành phần c bắt đầu tại cov_ptr[c] (thành phần được xử lý theo số tăng dần)
+        for comp in range(len(self.comp_size)):
+            candidates = [(comp, -1, -1, -1)]
+            for succ in self._comp_successors(comp):
+                candidates.append(succ)
+                d = succ[0]
+                for k in range(self.cov_ptr[d] + 1, self.cov_ptr[d + 1]):
+                    candidates.append((self.cov_root[k], self.cov_premise[k], self.cov_fact[k], self.cov_rule[k]))
+
+            candidates.sort(key=lambda cand: (pre[cand[0]], -end[cand[0]]))
+            kept = []
+            reach_end = -1
+            for cand in candidates:
+                if pre[cand[0]] >= reach_end:
+                    kept.append(cand)
+                    reach_end = end[cand[0]]
+            kept.sort(key=lambda cand: -cand[0])
+            for root, premise, fact, pos in kept:
+                self.cov_root.append(root)
+                self.cov_premise.append(premise)
+                self.cov_fact.append(fact)
+                self.cov_rule.append(pos)
+            self.cov_ptr.append(len(self.cov_root))
+
+    # ---------- Tra cứu ----------
+    def reach_size(self, fact: str) -> int:
+        """Số fact đạt tới được từ `fact` qua các luật đơn vị (không kể chính nó)."""
+        fid = self.fact_ids.get(fact)
+        if fid is None:
+            return 0
+        comp = self.comp_of[fid]
+        total = 0
+        for k in range(self.cov_ptr[comp], self.cov_ptr[comp + 1]):
+            root = self.cov_root[k]
+            total += self.size_prefix[self.comp_end[root]] - self.size_prefix[self.comp_pre[root]]
+        return total - 1
+
+    def reach(self, fact: str, known: Set[str], expanded: Optional[Set[str]] = None) -> Iterator[int]:
+        """
+        Vị trí các luật đơn vị suy ra fact mới từ `fact`, theo thứ tự cha trước con.
+        Người gọi phải thêm kết luận của mỗi luật vào `known` trước khi lấy phần tử tiếp theo.
+        Cây con của fact thuộc `expanded` (mặc định là `known`) được bỏ qua vì bao đóng của nó
+        đã biết; fact đã biết nhưng chưa mở rộng (ví dụ giả thiết ban đầu) thì vẫn duyệt tiếp.
+        """
+        fid = self.fact_ids.get(fact)
+        if fid is None:
+            return
+        if expanded is None:
+            expanded = known
+        names, comp_order, comp_end, comp_size = self.fact_names, self.comp_order, self.comp_end, self.comp_size
+        source = self.comp_of[fid]
+        for k in range(self.cov_ptr[source], self.cov_ptr[source + 1]):
+            root = self.cov_root[k]
+            i, stop = self.comp_pre[root], comp_end[root]
+            if root == source:
+                entry_fact, entry_rule = fid, -1
+            elif names[self.cov_premise[k]] in known:
+                entry_fact, entry_rule = self.cov_fact[k], self.cov_rule[k]
+            else:
+                # Tiền đề nằm trong cây con đã bỏ qua mà chưa được suy ra (known chưa đóng, ví dụ sau khi rút fact)
+                continue
+            while i < stop:
+                comp = comp_order[i]
+                if comp != root:
+                    entry_fact, entry_rule = self.comp_entry_fact[comp], self.comp_entry_rule[comp]
+                if entry_rule >= 0:
+                    name = names[entry_fact]
+                    if name in expanded:
+                        i = comp_end[comp]
+                        continue
+                    if name not in known:
+                        yield entry_rule
+                if comp_size[comp] > 1 and (yield from self._reach_component(comp, entry_fact, known, expanded)):
+                    i = comp_end[comp]
+                    continue
+                i += 1
+
+    def _reach_component(self, comp: int, entry: int, known: Set[str], expanded: Set[str]):
+        """
+        Duyệt sâu bên trong một thành phần (có chu trình) từ fact `entry`, sinh luật cho fact mới.
+        Trả về True nếu gặp fact đã mở rộng: bao đóng của nó chứa cả thành phần và mọi thành phần
+        phía sau, nên người gọi bỏ qua cây con.
+        """
+        names, adj_ptr, adj_fact, adj_rule, comp_of = (self.fact_names, self.adj_ptr, self.adj_fact,
+                                                       self.adj_rule, self.comp_of)
+        visited = {entry}
+        stack = [entry]
+        while stack:
+            f = stack.pop()
+            for k in range(adj_ptr[f], adj_ptr[f + 1]):
+                d = adj_fact[k]
+                if d in visited or comp_of[d] != comp:
+                    continue
+                visited.add(d)
+                name = names[d]
+                if name in expanded:
+                    return True
+                if name not in known:
+                    yield adj_rule[k]
+                stack.append(d)
+        return False
+
+
+def forward_chain_closure(rules: List[Rule], facts: Set[str], selection_mode: str = 'Min',
+                          index: ClosureIndex = None, trace: bool = True):
+    """
+    Suy diễn tiến dùng ClosureIndex: phần luật đơn vị được giải bằng tra cứu bao đóng,
+    chỉ các luật AND nhiều tiền đề chạy bằng bộ đếm. Trả về (known, prov, steps) như
+    forward_chain_indexed (cùng tập known; thứ tự bước có thể khác).
+    """
+    if index is None:
+        index = ClosureIndex(rules, selection_mode)
+    rule_source = index.rule_source
+    by_premise = index.join_by_premise
+
+    known = set(facts)
+    prov: Dict[str, Tuple[Rule, Tuple[str, ...]]] = {}
+    steps = InferenceTrace(rule_source) if trace else []
+    premise_count = index.premise_count
+    # Bộ đếm chỉ tạo cho luật AND có tiền đề đã xuất hiện, không sao chép cả mảng
+    missing: Dict[int, int] = {}
+    agenda = deque(known)
+    # Giả thiết ban đầu đều đã biết nhưng chưa được mở rộng bao đóng
+    expanded: Set[str] = set()
+
+    def derive(r_pos: int):
+        r = rule_source[r_pos]
+        prov[r.conclusion] = (r, r.premises)
+        if trace:
+            steps.record(r_pos)
+        known.add(r.conclusion)
+        expanded.add(r.conclusion)
+        agenda.append(r.conclusion)
+
+    def expand(fact: str):
+        for r_pos in index.reach(fact, known, expanded):
+            derive(r_pos)
+        expanded.add(fact)
+
+    for fact in list(agenda):
+        expand(fact)
+
+    while agenda:
+        fact = agenda.popleft()
+        for pos in by_premise.get(fact, ()):
+            left = missing[pos] = missing.get(pos, premise_count[pos]) - 1
+            if left == 0 and rule_source[pos].conclusion not in known:
+                derive(pos)
+                expand(rule_source[pos].conclusion)
+
+    return known, prov, steps
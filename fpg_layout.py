@@ -0,0 +1,109 @@
+# =============================
+# FPG Layout - Bố cục phân tầng tuyến tính cho Flow Process Graph
+# =============================
+from typing import Tuple, List, Set, Dict, Iterable, Callable
+
+from ToanHoc import Rule
+
+Prov = Dict[str, Tuple[Rule, Tuple[str, ...]]]
+
+
+def premises_used(prov: Prov) -> Set[str]:
+    """Tập các fact được dùng làm tiền đề trong vết suy diễn (tính một lần thay vì cho từng nút)."""
+    used: Set[str] = set()
+    for _, premises in prov.values():
+        used.update(premises)
+    return used
+
+
+def longest_path_levels(nodes: Iterable[str], predecessors: Callable[[str], Iterable[str]]) -> Dict[str, int]:
+    """
+    Tầng của mỗi nút = độ dài đường dài nhất từ một nút không có tiền bối, tính theo hậu thứ tự
+    (mỗi nút và mỗi cạnh chỉ xét một lần). Cạnh quay lui của chu trình (nếu có) bị bỏ qua.
+    """
+    levels: Dict[str, int] = {}
+    on_path: Set[str] = set()
+    for root in nodes:
+        if root in levels:
+            continue
+        on_path.add(root)
+        stack = [(root, iter(predecessors(root)))]
+        while stack:
+            n, preds = stack[-1]
+            for p in preds:
+                if p not in levels and p not in on_path:
+                    on_path.add(p)
+                    stack.append((p, iter(predecessors(p))))
+                    break
+            else:
+                stack.pop()
+                on_path.discard(n)
+                levels[n] = max((levels[p] + 1 for p in predecessors(n) if p in levels), default=0)
+    return levels
+
+
+def fpg_levels(prov: Prov, facts: Set[str]) -> Dict[str, int]:
+    """Tầng FPG: giả thiết ở tầng 0, fact suy ra ở tầng = đường dài nhất trong vết từ giả thiết."""
+
+    def predecessors(n: str) -> Iterable[str]:
+        if n in facts or n not in prov:
+            return ()
+        return prov[n][1]
+
+    return longest_path_levels(list(facts) + list(prov), predecessors)
+
+
+def order_layers(levels: Dict[str, int], edges: Iterable[Tuple[str, str]], sweeps: int = 4) -> List[List[str]]:
+    """
+    Sắp thứ tự nút trong từng tầng để giảm số cạnh cắt nhau (heuristic barycenter):
+    lần lượt quét xuống / lên, mỗi nút đặt theo trung bình vị trí các láng giềng ở tầng khác.
+    Mỗi lượt quét O(E + V log V).
+    """
+    n_layers = max(levels.values(), default=-1) + 1
+    layers: List[List[str]] = [[] for _ in range(n_layers)]
+    for n in sorted(levels):
+        layers[levels[n]].append(n)
+
+    preds: Dict[str, List[str]] = {}
+    succs: Dict[str, List[str]] = {}
+    for u, v in edges:
+        if u in levels and v in levels and levels[u] != levels[v]:
+            preds.setdefault(v, []).append(u)
+            succs.setdefault(u, []).append(v)
+
+    # Vị trí (căn giữa) của nút trong tầng của nó
+    x: Dict[str, float] = {}
+
+    def place(layer: List[str]):
+        center = (len(layer) - 1) / 2
+        for i, n in enumerate(layer):
+            x[n] = i - center
+
+    def reorder(layer: List[str], neighbours: Dict[str, List[str]]):
+        def barycenter(n: str) -> float:
+            ns = neighbours.get(n)
+            return sum(x[m] for m in ns) / len(ns) if ns else x[n]
+
+        layer.sort(key=barycenter)
+        place(layer)
+
+    for layer in layers:
+        place(layer)
+    for _ in range(sweeps):
+        for layer in layers[1:]:
+            reorder(layer, preds)
+        for layer in reversed(layers[:-1]):
+            reorder(layer, succs)
+    return layers
+
+
+def layered_positions(layers: List[List[str]], x_spacing: float, y_spacing: float) -> Dict[str, Tuple[float, float]]:
+    """Tọa độ cho các tầng: tầng 0 ở trên cùng, mỗi tầng căn giữa theo trục x."""
+    pos: Dict[str, Tuple[float, float]] = {}
+    max_level = len(layers) - 1
+    for level, nodes in enumerate(layers):
+        x_start = -(len(nodes) - 1) * x_spacing / 2
+        y_pos = (max_level - level) * y_spacing
+        for i, node in enumerate(nodes):
+            pos[node] = (x_start + i * x_spacing, y_pos)
+    return pos
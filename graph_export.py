@@ -0,0 +1,114 @@
+# =============================
+# Graph Export - Dựng Rule Process Graph bằng chỉ mục tiền đề, xuất file không cần màn hình
+# =============================
+import os
+import sys
+from typing import List, Dict, Tuple, Union
+
+import networkx as nx
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from ToanHoc import Rule
+
+# Định dạng ảnh được vẽ qua backend Agg (không cần màn hình)
+IMAGE_FORMATS = ('svg', 'png', 'pdf')
+
+
+def build_rpg(rules: List[Rule]) -> nx.DiGraph:
+    """
+    Rule Process Graph: mỗi luật là một nút (theo nhãn), cạnh r1 -> r2 khi kết luận của r1 là
+    tiền đề của r2. Cạnh được lấy từ chỉ mục tiền đề -> luật nên chi phí là O(tổng số tiền đề
+    + số cạnh) thay vì duyệt mọi cặp luật; thứ tự nút và cạnh giống cách duyệt cặp cũ.
+    """
+    G = nx.DiGraph()
+    by_premise: Dict[str, List[Rule]] = {}
+    for r in rules:
+        G.add_node(r.label, conclusion=r.conclusion, op=r.op)
+        for p in dict.fromkeys(r.premises):
+            by_premise.setdefault(p, []).append(r)
+
+    for r1 in rules:
+        for r2 in by_premise.get(r1.conclusion, ()):
+            if r1.id != r2.id:
+                G.add_edge(r1.label, r2.label)
+    return G
+
+
+def rpg_layout(G: nx.DiGraph) -> Dict[str, Tuple[float, float]]:
+    """
+    Bố cục phân tầng (fpg_layout) cho RPG: chi phí gần tuyến tính theo số nút + cạnh, thay vì
+    spring_layout O(V^2) mỗi vòng lặp. Cạnh quay lui của chu trình không ảnh hưởng tới tầng.
+    """
+    from fpg_layout import longest_path_levels, order_layers, layered_positions
+    levels = longest_path_levels(list(G.nodes()), G.predecessors)
+    return layered_positions(order_layers(levels, G.edges()), 4.0, 3.0)
+
+
+def draw_rpg_on(ax, G: nx.DiGraph, pos=None):
+    """Vẽ RPG lên trục `ax` (dùng chung cho cửa sổ tương tác và xuất ảnh); mặc định dùng rpg_layout."""
+    if pos is None:
+        pos = rpg_layout(G)
+    nx.draw_networkx_nodes(G, pos, ax=ax, node_color="#ffb3ba", node_size=2000, edgecolors="black")
+    nx.draw_networkx_labels(G, pos, ax=ax, font_size=10, font_weight="bold")
+    nx.draw_networkx_edges(G, pos, ax=ax, arrows=True, arrowstyle="-|>", arrowsize=20,
+                           connectionstyle="arc3,rad=0.1")
+    ax.set_title("Rule Process Graph (RPG)", fontsize=16)
+    ax.axis("off")
+
+
+def _dot_id(name: str) -> str:
+    return '"' + str(name).replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def write_dot(G: nx.DiGraph, path: str, name: str = "RPG"):
+    """Ghi đồ thị ra file Graphviz DOT (không cần pydot / pygraphviz)."""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(f"digraph {_dot_id(name)} {{\n")
+        for node, attrs in G.nodes(data=True):
+            extra = "".join(f", {k}={_dot_id(v)}" for k, v in attrs.items())
+            f.write(f"  {_dot_id(node)} [label={_dot_id(node)}{extra}];\n")
+        for u, v in G.edges():
+            f.write(f"  {_dot_id(u)} -> {_dot_id(v)};\n")
+        f.write("}\n")
+
+
+def render_image(G: nx.DiGraph, path: str, fmt: str = None, pos=None, figsize=(10, 8), dpi: int = 100):
+    """Vẽ RPG ra file ảnh (svg/png/pdf) bằng Figure + Agg, không dùng pyplot nên chạy được trên server."""
+    fig = Figure(figsize=figsize, dpi=dpi)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot(1, 1, 1)
+    draw_rpg_on(ax, G, pos)
+    fig.tight_layout()
+    fig.savefig(path, format=fmt)
+
+
+def export_rpg(rules_or_graph: Union[List[Rule], nx.DiGraph], path: str, fmt: str = None) -> nx.DiGraph:
+    """Xuất RPG theo định dạng `fmt` (mặc định theo đuôi file): dot, graphml, svg, png, pdf."""
+    G = rules_or_graph if isinstance(rules_or_graph, nx.DiGraph) else build_rpg(rules_or_graph)
+    fmt = (fmt or os.path.splitext(path)[1].lstrip('.')).lower()
+    if fmt in ('dot', 'gv'):
+        write_dot(G, path)
+    elif fmt == 'graphml':
+        nx.write_graphml(G, path)
+    elif fmt in IMAGE_FORMATS:
+        render_image(G, path, fmt)
+    else:
+        raise ValueError(f"Định dạng xuất không hỗ trợ: {fmt}")
+    return G
+
+
+if __name__ == "__main__":
+    # python graph_export.py rules.txt rpg.svg [rpg.dot ...]
+    from rule_parser import parse_rules_file
+
+    if len(sys.argv) < 3:
+        print("Cách dùng: python graph_export.py <file luật> <file xuất> [<file xuất> ...]")
+        sys.exit(2)
+    rules, diagnostics = parse_rules_file(sys.argv[1])
+    for d in diagnostics:
+        print(d)
+    G = build_rpg(rules)
+    for out in sys.argv[2:]:
+        export_rpg(G, out)
+        print(f"Đã xuất {out} ({G.number_of_nodes()} nút, {G.number_of_edges()} cạnh)")
@@ -0,0 +1,187 @@
+# =============================
+# Graph Render - Vẽ đồ thị ở luồng nền, lưu bố cục và ảnh trong bộ nhớ đệm LRU
+# =============================
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Tuple, List, Set, Dict, Optional
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from ToanHoc import Rule, FPG_FIGSIZE, draw_process_graph_on
+
+Prov = Dict[str, Tuple[Rule, Tuple[str, ...]]]
+
+
+@dataclass(frozen=True)
+class RenderResult:
+    """Ảnh PNG đã vẽ."""
+    png: bytes
+
+
+def rules_digest(rules: List[Rule]) -> str:
+    """Băm nội dung tập luật (thứ tự, tiền đề, kết luận, nhãn, toán tử)."""
+    h = hashlib.blake2b(digest_size=16)
+    for r in rules:
+        h.update("\0".join((r.op, r.label, r.conclusion) + r.premises).encode('utf-8'))
+        h.update(b"\n")
+    return h.hexdigest()
+
+
+def inference_key(facts: Set[str], prov: Prov) -> str:
+    """
+    Băm một kết quả suy diễn (giả thiết, vết suy diễn); người gọi tính một lần cho mỗi kết quả.
+    Khóa là chuỗi ngắn nên tra bộ nhớ đệm không phải băm lại cả vết.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    for f in sorted(facts):
+        h.update(f.encode('utf-8') + b"\0")
+    h.update(b"\n")
+    for c, (r, used) in sorted(prov.items()):
+        h.update("\0".join((c, str(r.id), r.label) + tuple(used)).encode('utf-8'))
+        h.update(b"\n")
+    return h.hexdigest()
+
+
+def render_key(kind: str, digest: str, inference: str, view: Tuple = None) -> Tuple:
+    """Khóa bộ nhớ đệm: (loại đồ thị, băm tập luật, khóa kết quả suy diễn, tham số khung nhìn)."""
+    # RPG chỉ phụ thuộc vào tập luật
+    return kind, digest, None if kind == 'rpg' else inference, view
+
+
+def _to_png(fig: Figure) -> bytes:
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png')
+    return buf.getvalue()
+
+
+def render_fpg(rules: List[Rule], facts: Set[str], prov: Prov) -> RenderResult:
+    fig = Figure(figsize=FPG_FIGSIZE)
+    FigureCanvasAgg(fig)
+    draw_process_graph_on(fig.add_subplot(1, 1, 1), prov, facts, rules)
+    fig.tight_layout()
+    return RenderResult(_to_png(fig))
+
+
+def rpg_with_layout(rules: List[Rule]) -> Tuple:
+    """(RPG, tọa độ nút) của tập luật; GraphRenderer giữ lại theo băm tập luật."""
+    from graph_export import build_rpg, rpg_layout
+
+    G = build_rpg(rules)
+    return G, rpg_layout(G)
+
+
+def render_rpg(rules: List[Rule], layout: Tuple = None) -> RenderResult:
+    """layout: kết quả rpg_with_layout(rules) đã có (không phải dựng lại đồ thị và bố cục)."""
+    from graph_export import draw_rpg_on
+
+    G, pos = layout if layout is not None else rpg_with_layout(rules)
+    fig = Figure(figsize=(10, 8))
+    FigureCanvasAgg(fig)
+    draw_rpg_on(fig.add_subplot(1, 1, 1), G, pos)
+    fig.tight_layout()
+    return RenderResult(_to_png(fig))
+
+
+def render_view(index, facts: Set[str], prov: Prov, view: Tuple) -> RenderResult:
+    """view = ('hop', tâm, k) cho lân cận k bước hoặc ('cone', mục tiêu) cho nón suy diễn."""
+    from graph_views import neighborhood_view, cone_view, draw_view_on
+
+    if view[0] == 'hop':
+        G = neighborhood_view(index, view[1], view[2])
+        title = f"Lân cận {view[2]} bước của '{view[1]}'"
+    else:
+        G = cone_view(index, view[1], facts)
+        title = f"Nón suy diễn của '{view[1]}'"
+    fig = Figure(figsize=FPG_FIGSIZE)
+    FigureCanvasAgg(fig)
+    draw_view_on(fig.add_subplot(1, 1, 1), G, facts, prov, title)
+    fig.tight_layout()
+    return RenderResult(_to_png(fig))
+
+
+class GraphRenderer:
+    """
+    Vẽ FPG / RPG trên một luồng nền (Figure + Agg, không đụng tới pyplot hay Tk).
+    Kết quả được lưu theo render_key với tối đa `max_entries` mục, bỏ mục ít dùng gần đây nhất;
+    yêu cầu trùng khóa đang vẽ dở dùng chung một Future.
+    """
+
+    def __init__(self, max_entries: int = 16, max_workers: int = 1):
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[Tuple, RenderResult]" = OrderedDict()
+        self._pending: Dict[Tuple, Future] = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers, thread_name_prefix="render")
+        # Chỉ mục khung nhìn của tập luật gần nhất: (băm tập luật, GraphViewIndex), chỉ dùng ở luồng vẽ
+        self._view_index = None
+        # RPG và bố cục của tập luật gần nhất: (băm tập luật, (đồ thị, tọa độ)), chỉ dùng ở luồng vẽ
+        self._rpg_layout = None
+
+    def submit(self, kind: str, rules: List[Rule], digest: str, facts: Set[str], prov: Prov,
+               inference: str, view: Tuple = None) -> Future:
+        """
+        Trả về Future của RenderResult; đã xong ngay nếu ảnh có trong bộ nhớ đệm.
+        kind: 'fpg', 'rpg' hoặc 'view' (khi đó `view` là tham số khung nhìn, xem render_view).
+        digest = rules_digest(rules), inference = inference_key(facts, prov): người gọi tính một lần cho
+        mỗi tập luật / kết quả suy diễn, nên mỗi lần gửi không phải sao chép hay băm lại. Các đối tượng
+        được vẽ ở luồng nền nên không được sửa tại chỗ sau khi gửi (thay bằng đối tượng mới).
+        """
+        key = render_key(kind, digest, inference, view)
+        with self._lock:
+            cached = self.get(key)
+            if cached is not None:
+                future = Future()
+                future.set_result(cached)
+                return future
+            future = self._pending.get(key)
+            if future is None:
+                future = self._pending[key] = self._pool.submit(self._render, key, kind, rules, facts, prov, view)
+            return future
+
+    def get(self, key: Tuple) -> Optional[RenderResult]:
+        result = self._cache.get(key)
+        if result is not None:
+            self._cache.move_to_end(key)
+        return result
+
+    def _render(self, key: Tuple, kind: str, rules: List[Rule], facts: Set[str], prov: Prov,
+                view: Tuple = None) -> RenderResult:
+        try:
+            if kind == 'fpg':
+                result = render_fpg(rules, facts, prov)
+            elif kind == 'rpg':
+                result = render_rpg(rules, self._layout_for(key[1], rules))
+            else:
+                result = render_view(self._index_for(key[1], rules), facts, prov, view)
+            with self._lock:
+                self._cache[key] = result
+                self._cache.move_to_end(key)
+                while len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+            return result
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+
+    def _index_for(self, digest: str, rules: List[Rule]):
+        from graph_views import GraphViewIndex
+        if self._view_index is None or self._view_index[0] != digest:
+            self._view_index = (digest, GraphViewIndex(rules))
+        return self._view_index[1]
+
+    def _layout_for(self, digest: str, rules: List[Rule]) -> Tuple:
+        if self._rpg_layout is None or self._rpg_layout[0] != digest:
+            self._rpg_layout = (digest, rpg_with_layout(rules))
+        return self._rpg_layout[1]
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def shutdown(self, wait: bool = True):
+        self._pool.shutdown(wait=wait, cancel_futures=True)
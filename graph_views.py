@@ -0,0 +1,153 @@
+# =============================
+# Graph Views - Khung nhìn tập trung cho tập luật lớn: lân cận k bước, nón suy diễn, gộp nhánh OR
+# =============================
+from collections import deque
+from typing import Tuple, List, Set, Dict, Iterable, Optional
+
+import networkx as nx
+
+from ToanHoc import Rule, ConclusionIndex
+
+Prov = Dict[str, Tuple[Rule, Tuple[str, ...]]]
+
+# Số tiền đề OR tối thiểu của một kết luận để gộp thành siêu nút
+OR_COLLAPSE_THRESHOLD = 8
+
+COLORS = {'initial': "#90EE90", 'derived': "#87CEEB", 'fact': "#F0F0F0", 'group': "#FFD59A"}
+
+
+class GraphViewIndex:
+    """
+    Chỉ mục hai chiều fact <-> luật, dựng một lần cho mỗi tập luật; các khung nhìn chỉ duyệt
+    những luật gắn với nút trong khung nhìn nên chi phí theo kích thước khung nhìn, không theo tập luật.
+    """
+
+    def __init__(self, rules: List[Rule], conclusions: ConclusionIndex = None):
+        self.conclusions = conclusions if conclusions is not None else ConclusionIndex(rules)
+        self.by_premise: Dict[str, List[Rule]] = {}
+        for r in rules:
+            for p in dict.fromkeys(r.premises):
+                self.by_premise.setdefault(p, []).append(r)
+
+    def rules_for(self, fact: str) -> List[Rule]:
+        return self.conclusions.rules_for(fact)
+
+    def neighbours(self, fact: str) -> Iterable[str]:
+        for r in self.by_premise.get(fact, ()):
+            yield r.conclusion
+        for r in self.rules_for(fact):
+            yield from r.premises
+
+
+def neighborhood(index: GraphViewIndex, center: str, k: int, max_nodes: Optional[int] = None) -> Set[str]:
+    """Các fact cách `center` tối đa k bước (theo cạnh tiền đề - kết luận, bỏ qua chiều)."""
+    seen = {center}
+    frontier = deque([(center, 0)])
+    while frontier:
+        fact, dist = frontier.popleft()
+        if dist == k:
+            continue
+        for n in index.neighbours(fact):
+            if n not in seen:
+                if max_nodes is not None and len(seen) >= max_nodes:
+                    return seen
+                seen.add(n)
+                frontier.append((n, dist + 1))
+    return seen
+
+
+def derivation_cone(index: GraphViewIndex, goal: str, facts: Set[str] = frozenset()) -> Set[str]:
+    """Các fact có thể góp phần suy ra `goal` (truy ngược qua kết luận, dừng ở giả thiết)."""
+    seen = {goal}
+    stack = [goal]
+    while stack:
+        fact = stack.pop()
+        if fact in facts:
+            continue
+        for r in index.rules_for(fact):
+            for p in r.premises:
+                if p not in seen:
+                    seen.add(p)
+                    stack.append(p)
+    return seen
+
+
+def build_view(index: GraphViewIndex, nodes: Set[str], collapse_or: int = OR_COLLAPSE_THRESHOLD) -> nx.DiGraph:
+    """
+    Đồ thị fact của khung nhìn: cạnh p -> c (nhãn luật) cho các luật có cả hai đầu trong `nodes`.
+    Kết luận có từ `collapse_or` tiền đề OR trở lên (ví dụ các khối Rule_OR_car_*) được gộp:
+    các tiền đề chỉ nối tới kết luận đó thành một siêu nút, các tiền đề còn cạnh khác được giữ lại.
+    """
+    G = nx.DiGraph()
+    nodes = sorted(nodes)
+    for n in nodes:
+        G.add_node(n, kind='fact')
+    members = set(nodes)
+    for c in nodes:
+        for r in index.rules_for(c):
+            for p in dict.fromkeys(r.premises):
+                if p in members:
+                    if G.has_edge(p, c):
+                        G.edges[p, c]['labels'].append(r.label)
+                    else:
+                        G.add_edge(p, c, labels=[r.label], op=r.op)
+
+    if collapse_or:
+        for c in list(G.nodes()):
+            if c not in G:
+                continue  # Đã được gộp vào siêu nút của kết luận khác
+            or_premises = [p for p in G.predecessors(c) if G.edges[p, c]['op'] == 'OR']
+            if len(or_premises) < collapse_or:
+                continue
+            leaves = [p for p in or_premises if G.degree(p) == 1]
+            if len(leaves) < 2:
+                continue
+            labels = sorted({label for p in leaves for label in G.edges[p, c]['labels']})
+            group = f"{c} ⋁ ({len(leaves)})"
+            G.remove_nodes_from(leaves)
+            G.add_node(group, kind='group', members=tuple(sorted(leaves)))
+            G.add_edge(group, c, labels=labels, op='OR')
+    return G
+
+
+def neighborhood_view(index: GraphViewIndex, center: str, k: int = 2, max_nodes: Optional[int] = 500,
+                      collapse_or: int = OR_COLLAPSE_THRESHOLD) -> nx.DiGraph:
+    return build_view(index, neighborhood(index, center, k, max_nodes), collapse_or)
+
+
+def cone_view(index: GraphViewIndex, goal: str, facts: Set[str] = frozenset(),
+              collapse_or: int = OR_COLLAPSE_THRESHOLD) -> nx.DiGraph:
+    return build_view(index, derivation_cone(index, goal, facts), collapse_or)
+
+
+def draw_view_on(ax, G: nx.DiGraph, facts: Set[str] = frozenset(), prov: Prov = None, title: str = ""):
+    """Vẽ khung nhìn lên trục `ax` với bố cục phân tầng (fpg_layout)."""
+    from fpg_layout import longest_path_levels, order_layers, layered_positions
+
+    prov = prov or {}
+    levels = longest_path_levels(sorted(G.nodes()), G.predecessors)
+    pos = layered_positions(order_layers(levels, G.edges()), 4.0, 3.0)
+
+    def kind(n: str) -> str:
+        if G.nodes[n].get('kind') == 'group':
+            return 'group'
+        if n in facts:
+            return 'initial'
+        return 'derived' if n in prov else 'fact'
+
+    for k, color in COLORS.items():
+        nodelist = [n for n in G.nodes() if kind(n) == k]
+        if nodelist:
+            nx.draw_networkx_nodes(G, pos, ax=ax, nodelist=nodelist, node_color=color, node_size=1800,
+                                   edgecolors="black", linewidths=1.5)
+    nx.draw_networkx_labels(G, pos, ax=ax, font_size=9, font_weight="bold")
+
+    fpg_edges = {(p, c) for c in G.nodes() if c in prov for p in prov[c][1]}
+    edge_colors = ["red" if e in fpg_edges else "#555555" for e in G.edges()]
+    nx.draw_networkx_edges(G, pos, ax=ax, arrows=True, arrowstyle="-|>", arrowsize=18, width=1.5,
+                           edge_color=edge_colors, min_source_margin=15, min_target_margin=15)
+    edge_labels = {(u, v): ", ".join(d['labels'][:2]) + (" …" if len(d['labels']) > 2 else "")
+                   for u, v, d in G.edges(data=True)}
+    nx.draw_networkx_edge_labels(G, pos, ax=ax, edge_labels=edge_labels, font_size=8, font_color="red")
+    ax.set_title(title, fontsize=14, fontweight='bold')
+    ax.axis("off")
@@ -0,0 +1,224 @@
+# =============================
+# KB Snapshot - Bản biên dịch nhị phân của tập luật (khởi động nhanh, chia sẻ qua mmap)
+# =============================
+import hashlib
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import List, Dict, Callable, Optional
+
+from rule_parser import PARSER_VERSION
+from rule_store import SymbolTable, RuleStore
+
+MAGIC = b"KBSNAP01"
+HEADER = struct.Struct("<8s32sI")   # magic, sha256(nguồn), số section
+SECTION = struct.Struct("<8sQQ")    # tên, offset, số byte
+
+# (tên section, kiểu phần tử array)
+SECTIONS = (
+    ("sym_off", 'q'), ("sym_str", 'B'),
+    ("prem_off", 'q'), ("prem_ids", 'i'), ("concl", 'i'), ("ops", 'b'),
+    ("lbl_off", 'q'), ("lbl_str", 'B'),
+    ("bp_ptr", 'q'), ("bp_ids", 'i'),     # fact -> các luật có fact làm tiền đề
+    ("bc_ptr", 'q'), ("bc_ids", 'i'),     # fact -> các luật kết luận ra fact
+)
+
+
+def source_digest(path: str, parser_key: str) -> bytes:
+    """Băm nội dung file luật cùng với tên bộ đọc (đổi bộ đọc thì snapshot cũ không còn hợp lệ)."""
+    h = hashlib.sha256(parser_key.encode('utf-8') + b"\0")
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.digest()
+
+
+def _csr(groups: List[List[int]]):
+    ptr = array('q', [0])
+    ids = array('i')
+    for g in groups:
+        ids.extend(g)
+        ptr.append(len(ids))
+    return ptr, ids
+
+
+def write_snapshot(store: RuleStore, path: str, digest: bytes):
+    """Ghi store cùng bảng ký hiệu và các chỉ mục dựng sẵn ra file (ghi tạm rồi đổi tên)."""
+    symbols = store.symbols
+    sym_off = array('q', [0])
+    sym_str = bytearray()
+    for i in range(len(symbols)):
+        sym_str += symbols[i].encode('utf-8')
+        sym_off.append(len(sym_str))
+
+    by_premise: List[List[int]] = [[] for _ in range(len(symbols))]
+    by_conclusion: List[List[int]] = [[] for _ in range(len(symbols))]
+    for i in range(len(store)):
+        for p in dict.fromkeys(store.premises_of(i)):
+            by_premise[p].append(i)
+        by_conclusion[store.conclusions[i]].append(i)
+    bp_ptr, bp_ids = _csr(by_premise)
+    bc_ptr, bc_ids = _csr(by_conclusion)
+
+    data = {
+        "sym_off": sym_off, "sym_str": sym_str,
+        "prem_off": store.premise_offsets, "prem_ids": store.premise_ids, "concl": store.conclusions,
+        "ops": store.ops, "lbl_off": store.label_offsets, "lbl_str": store.label_bytes,
+        "bp_ptr": bp_ptr, "bp_ids": bp_ids, "bc_ptr": bc_ptr, "bc_ids": bc_ids,
+    }
+
+    blobs = []
+    for name, typecode in SECTIONS:
+        arr = array(typecode, data[name])
+        if sys.byteorder == 'big':
+            arr.byteswap()
+        blobs.append((name, arr.tobytes()))
+
+    # Mỗi section căn lề 8 byte để có thể cast trực tiếp trên vùng mmap
+    offset = HEADER.size + SECTION.size * len(blobs)
+    table = []
+    for name, blob in blobs:
+        offset += -offset % 8
+        table.append((name, offset, len(blob)))
+        offset += len(blob)
+
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, digest, len(blobs)))
+        for name, off, size in table:
+            f.write(SECTION.pack(name.encode('ascii'), off, size))
+        for (name, off, size), (_, blob) in zip(table, blobs):
+            f.write(b"\0" * (off - f.tell()))
+            f.write(blob)
+    os.replace(tmp_path, path)
+
+
+class MappedSymbolTable(SymbolTable):
+    """Bảng ký hiệu chỉ đọc trên vùng mmap: tên được giải mã khi truy cập, dict tên -> id dựng khi cần."""
+
+    def __init__(self, offsets, blob):
+        self._offsets = offsets
+        self._blob = blob
+        self._ids: Optional[Dict[str, int]] = None
+
+    @property
+    def names(self) -> List[str]:
+        return [self[i] for i in range(len(self))]
+
+    @property
+    def ids(self) -> Dict[str, int]:
+        if self._ids is None:
+            self._ids = {self[i]: i for i in range(len(self))}
+        return self._ids
+
+    def intern(self, name: str) -> int:
+        sid = self.ids.get(name)
+        if sid is None:
+            raise ValueError("Snapshot chỉ đọc, không thể thêm ký hiệu mới")
+        return sid
+
+    def __getitem__(self, sid: int) -> str:
+        return str(self._blob[self._offsets[sid]:self._offsets[sid + 1]], 'utf-8')
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+
+class SnapshotRuleStore(RuleStore):
+    """RuleStore chỉ đọc, các mảng là memoryview trên file snapshot (nhiều tiến trình dùng chung trang)."""
+
+    def __init__(self, sections: Dict[str, memoryview], buffer=None):
+        self._buffer = buffer
+        self.symbols = MappedSymbolTable(sections["sym_off"], sections["sym_str"])
+        self.premise_offsets = sections["prem_off"]
+        self.premise_ids = sections["prem_ids"]
+        self.conclusions = sections["concl"]
+        self.ops = sections["ops"]
+        self.label_offsets = sections["lbl_off"]
+        self.label_bytes = sections["lbl_str"]
+        self._bp_ptr, self._bp_ids = sections["bp_ptr"], sections["bp_ids"]
+        self._bc_ptr, self._bc_ids = sections["bc_ptr"], sections["bc_ids"]
+
+    def append(self, premises, conclusion, label, op) -> int:
+        raise ValueError("Snapshot chỉ đọc; hãy dùng to_rules() hoặc RuleStore.from_rules() để chỉnh sửa")
+
+    def rules_with_premise(self, fact: str):
+        """Chỉ số các luật có `fact` làm tiền đề (theo thứ tự tăng dần)."""
+        sid = self.symbols.get(fact)
+        return self._bp_ids[self._bp_ptr[sid]:self._bp_ptr[sid + 1]] if sid >= 0 else ()
+
+    def rules_with_conclusion(self, fact: str):
+        """Chỉ số các luật kết luận ra `fact` (theo thứ tự tăng dần)."""
+        sid = self.symbols.get(fact)
+        return self._bc_ids[self._bc_ptr[sid]:self._bc_ptr[sid + 1]] if sid >= 0 else ()
+
+
+def open_snapshot(path: str, digest: bytes = None) -> Optional[SnapshotRuleStore]:
+    """Mở snapshot bằng mmap; trả về None nếu không có, hỏng hoặc không khớp digest."""
+    try:
+        with open(path, 'rb') as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    view = memoryview(buffer)
+    try:
+        magic, file_digest, n_sections = HEADER.unpack_from(view, 0)
+        if magic != MAGIC or (digest is not None and file_digest != digest) or n_sections != len(SECTIONS):
+            return None
+
+        sections = {}
+        for i, (name, typecode) in enumerate(SECTIONS):
+            raw_name, off, size = SECTION.unpack_from(view, HEADER.size + i * SECTION.size)
+            if raw_name.rstrip(b"\0").decode('ascii') != name or off + size > len(view):
+                return None
+            chunk = view[off:off + size]
+            if sys.byteorder == 'big':
+                # Máy big-endian: phải chép và đảo byte, không dùng chung trang được
+                arr = array(typecode, chunk.tobytes())
+                arr.byteswap()
+                sections[name] = memoryview(arr)
+            else:
+                sections[name] = chunk.cast(typecode)
+    except (struct.error, TypeError, ValueError):
+        return None
+
+    return SnapshotRuleStore(sections, buffer)
+
+
+def load_rules_cached(path: str, parse: Callable[[str], list] = None, parser_key: str = None,
+                      snapshot_path: str = None) -> RuleStore:
+    """
+    Đọc tập luật, dùng lại snapshot `<path>.kbc` nếu nội dung file nguồn chưa đổi.
+    Nếu chưa có (hoặc đã cũ) thì đọc bằng `parse`, ghi snapshot mới rồi trả về bản mmap.
+    """
+    if parse is None:
+        from ToanHoc import load_and_parse_rules
+        parse = load_and_parse_rules
+    if parser_key is None:
+        parser_key = parse.__qualname__
+    parser_key = f"{parser_key}@{PARSER_VERSION}"
+    if snapshot_path is None:
+        snapshot_path = path + ".kbc"
+
+    try:
+        digest = source_digest(path, parser_key)
+    except OSError:
+        # Để bộ đọc tự báo lỗi (ví dụ không tìm thấy file)
+        return RuleStore.from_rules(parse(path))
+
+    store = open_snapshot(snapshot_path, digest)
+    if store is not None:
+        return store
+
+    store = RuleStore.from_rules(parse(path))
+    if not len(store):
+        # Không lưu kết quả rỗng (thường do lỗi đọc file) để lần sau còn báo lỗi lại
+        return store
+    try:
+        write_snapshot(store, snapshot_path, digest)
+    except OSError:
+        return store
+    return open_snapshot(snapshot_path, digest) or store
@@ -0,0 +1,163 @@
+# =============================
+# Proof Analysis - Độ dài / số lượng đường chứng minh trên siêu đồ thị AND-OR (không liệt kê)
+# =============================
+from typing import Tuple, List, Set, Dict, Optional
+
+from ToanHoc import Rule, ConclusionIndex
+from proof_dag import ProofForest
+from tabled_backward import TabledBackwardChainer, strongly_connected_components
+
+# Một lựa chọn chứng minh mục tiêu: (luật, các tiền đề phải chứng minh). Luật AND cho một lựa chọn
+# gồm mọi tiền đề, luật OR cho một lựa chọn cho mỗi tiền đề (kể cả tiền đề lặp), đúng như cách
+# backward_chain_all ghép đường chứng minh.
+Option = Tuple[Rule, Tuple[str, ...]]
+
+
+class ProofAnalysis:
+    """
+    Quy hoạch động trên siêu đồ thị AND-OR của tập luật, cùng ngữ nghĩa với backward_chain_all
+    (độ dài đường = số luật, đếm cả luật lặp lại khi ghép các nhánh AND):
+    - shortest / count_shortest: luôn xác định. Chứng minh ngắn nhất không lặp mục tiêu trên
+      một nhánh, và các cạnh "chặt" (đạt đúng chi phí nhỏ nhất) giảm chi phí nên không có chu trình.
+    - longest / count_longest / count: quy hoạch động khi phần đồ thị chứng minh được đạt tới từ
+      mục tiêu không có chu trình (khi đó phép cắt theo tổ tiên không bao giờ xảy ra); có chu trình thì
+      đếm trên ProofForest, nơi chu trình bị cắt theo tổ tiên đúng như backward_chain_all.
+    should_stop của `tabled` cũng được kiểm tra trong lúc đếm (ném SolveInterrupted).
+    """
+
+    def __init__(self, rules: List[Rule], facts: Set[str], selection_mode: str = 'Min', index: ConclusionIndex = None,
+                 tabled: TabledBackwardChainer = None):
+        if tabled is None:
+            tabled = TabledBackwardChainer(rules, facts, selection_mode, index)
+        self.tabled = tabled
+        self.rules = rules
+        self.index = tabled.index
+        self.facts = tabled.facts
+        self._options: Dict[str, List[Option]] = {}
+        self._shortest_count: Dict[str, int] = {}
+        # _acyclic[g] = (dài nhất, số đường dài nhất, tổng số đường) hoặc None nếu có chu trình
+        self._acyclic: Dict[str, Optional[Tuple[int, int, int]]] = {}
+        # Cùng bộ ba cho các mục tiêu có chu trình, tính trên ProofForest
+        self._cyclic: Dict[str, Tuple[int, int, int]] = {}
+
+    # ---------- Truy vấn ----------
+    def shortest(self, goal: str) -> Optional[int]:
+        """Độ dài đường chứng minh ngắn nhất, None nếu không chứng minh được."""
+        return self.tabled.cost(goal)
+
+    def count_shortest(self, goal: str) -> int:
+        """Số đường chứng minh có độ dài ngắn nhất (0 nếu không chứng minh được)."""
+        if goal in self.facts:
+            return 1
+        if self.tabled.cost(goal) is None:
+            return 0
+        self._count_tight(goal)
+        return self._shortest_count[goal]
+
+    def longest(self, goal: str) -> Optional[int]:
+        """Độ dài đường chứng minh dài nhất; None nếu không chứng minh được."""
+        entry = self._entry(goal)
+        return None if entry is None else entry[0]
+
+    def count_longest(self, goal: str) -> Optional[int]:
+        entry = self._entry(goal)
+        return None if entry is None else entry[1]
+
+    def count(self, goal: str) -> int:
+        """Tổng số đường chứng minh (= len(backward_chain_all(...)))."""
+        entry = self._entry(goal)
+        return 0 if entry is None else entry[2]
+
+    # ---------- Hỗ trợ ----------
+    def _provable(self, g: str) -> bool:
+        return g in self.facts or self.tabled.cost(g) is not None
+
+    def options(self, goal: str) -> List[Option]:
+        """Các lựa chọn chứng minh được của `goal` (mọi tiền đề đều chứng minh được)."""
+        opts = self._options.get(goal)
+        if opts is None:
+            self.tabled.check_stop()
+            opts = []
+            for r in self.index.rules_for(goal, self.tabled.selection_mode):
+                if r.op == 'AND':
+                    if all(self._provable(p) for p in r.premises):
+                        opts.append((r, r.premises))
+                else:
+                    opts.extend((r, (p,)) for p in r.premises if self._provable(p))
+            self._options[goal] = opts
+        return opts
+
+    def _subgoals(self, goal: str) -> List[str]:
+        return [p for _, used in self.options(goal) for p in used if p not in self.facts]
+
+    def _count_tight(self, goal: str):
+        """Đếm chứng minh ngắn nhất theo các lựa chọn chặt, duyệt hậu thứ tự (đồ thị chặt không chu trình)."""
+        cost = self.tabled.cost
+        counts = self._shortest_count
+        stack = [(goal, False)]
+        while stack:
+            self.tabled.check_stop()
+            g, done = stack.pop()
+            if g in counts:
+                continue
+            tight = [used for _, used in self.options(g)
+                     if 1 + sum(cost(p) for p in used) == cost(g)]
+            if done:
+                total = 0
+                for used in tight:
+                    n = 1
+                    for p in used:
+                        n *= 1 if p in self.facts else counts[p]
+                    total += n
+                counts[g] = total
+                continue
+            stack.append((g, True))
+            stack.extend((p, False) for used in tight for p in used if p not in self.facts and p not in counts)
+
+    def _entry(self, goal: str) -> Optional[Tuple[int, int, int]]:
+        """(dài nhất, số đường dài nhất, tổng số đường); None nếu không chứng minh được."""
+        if not self._provable(goal):
+            return None
+        entry = self._acyclic_entry(goal)
+        if entry is None:
+            entry = self._cyclic.get(goal)
+            if entry is None:
+                forest = ProofForest(goal, self.rules, self.facts, self.tabled.selection_mode, self.index,
+                                     self.tabled.should_stop)
+                counts = forest.length_counts()
+                longest = max(counts)
+                entry = self._cyclic[goal] = (longest, counts[longest], sum(counts.values()))
+        return entry
+
+    def _acyclic_entry(self, goal: str) -> Optional[Tuple[int, int, int]]:
+        if goal in self.facts:
+            return 0, 1, 1
+        if self.tabled.cost(goal) is None:
+            return None
+        if goal not in self._acyclic:
+            for component in strongly_connected_components(goal, self._pending_subgoals):
+                g = component[0]
+                if len(component) > 1 or g in self._subgoals(g) or \
+                        any(self._acyclic[p] is None for p in self._subgoals(g)):
+                    for c in component:
+                        self._acyclic[c] = None
+                    continue
+
+                longest, n_longest, total = -1, 0, 0
+                for _, used in self.options(g):
+                    size, n_size, n_all = 1, 1, 1
+                    for p in used:
+                        sub = (0, 1, 1) if p in self.facts else self._acyclic[p]
+                        size += sub[0]
+                        n_size *= sub[1]
+                        n_all *= sub[2]
+                    total += n_all
+                    if size > longest:
+                        longest, n_longest = size, n_size
+                    elif size == longest:
+                        n_longest += n_size
+                self._acyclic[g] = (longest, n_longest, total)
+        return self._acyclic[goal]
+
+    def _pending_subgoals(self, goal: str) -> List[str]:
+        return [p for p in self._subgoals(goal) if p not in self._acyclic]
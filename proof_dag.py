@@ -0,0 +1,276 @@
+# =============================
+# Proof DAG - Rừng chứng minh dùng chung chứng minh con, thay cho danh sách các đường chứng minh
+# =============================
+from collections import Counter
+from typing import Tuple, List, Set, Dict, Iterator, Optional, FrozenSet, Callable
+
+from ToanHoc import Rule, ConclusionIndex
+from tabled_backward import SolveInterrupted, strongly_connected_components
+
+
+class ProofNode:
+    """
+    Tập chứng minh của một mục tiêu trong một ngữ cảnh tổ tiên. Mỗi lựa chọn là
+    (luật, các nút con): luật AND có một lựa chọn gồm mọi tiền đề không phải giả thiết,
+    luật OR có một lựa chọn cho mỗi tiền đề. Giả thiết không tạo nút (chứng minh rỗng).
+    """
+    __slots__ = ('goal', 'alternatives')
+
+    def __init__(self, goal: str):
+        self.goal = goal
+        self.alternatives: List[Tuple[Rule, Tuple['ProofNode', ...]]] = []
+
+    def __bool__(self):
+        return bool(self.alternatives)
+
+
+class _BuildFrame:
+    """Trạng thái dựng một nút: luật / tiền đề đang xét và các nút con đã có của luật AND hiện tại."""
+    __slots__ = ('node', 'child_seen', 'rules', 'rule', 'premise', 'children', 'waiting')
+
+    def __init__(self, node: ProofNode, child_seen: FrozenSet[str], rules: List[Rule]):
+        self.node = node
+        self.child_seen = child_seen
+        self.rules = rules
+        self.rule = 0
+        self.premise = 0
+        self.children: List[ProofNode] = []
+        self.waiting = False
+
+    def next_rule(self):
+        self.rule += 1
+        self.premise = 0
+        self.children = []
+
+
+class ProofForest:
+    """
+    Toàn bộ đường chứng minh của backward_chain_all dưới dạng DAG AND-OR: chứng minh con giống
+    nhau chỉ lưu một lần, nên bộ nhớ theo số nút thay vì số đường x độ dài.
+    - Kết quả của backward_chain_all(g, seen) chỉ phụ thuộc vào các tổ tiên cùng thành phần liên
+      thông mạnh với g (tổ tiên khác không đạt tới được từ g), nên nút được dùng chung theo khóa
+      (g, tổ tiên trong thành phần của g). Đồ thị không chu trình thì mỗi mục tiêu đúng một nút.
+    - Duyệt `for proof in forest` sinh từng đường theo đúng thứ tự của backward_chain_all.
+    - should_stop: được gọi định kỳ khi dựng rừng và khi đếm; trả về True thì ném SolveInterrupted.
+    """
+
+    def __init__(self, goal: str, rules: List[Rule], facts: Set[str], selection_mode: str = 'Min',
+                 index: ConclusionIndex = None, should_stop: Callable[[], bool] = None):
+        if index is None:
+            index = ConclusionIndex(rules)
+        self.goal = goal
+        self.facts = set(facts)
+        self.selection_mode = selection_mode
+        self.index = index
+        self.nodes: Dict[Tuple[str, FrozenSet[str]], ProofNode] = {}
+        self._length_counts: Dict[int, Counter] = {}
+        self._shortest: Dict[int, int] = {}
+        self.should_stop = should_stop
+        self._ticks = 0
+
+        self._component: Dict[str, FrozenSet[str]] = {}
+        if goal in self.facts:
+            self.root: Optional[ProofNode] = None
+            return
+        for component in strongly_connected_components(goal, self._subgoals):
+            members = frozenset(component)
+            for g in component:
+                self._component[g] = members
+        self.root = self._build(goal, frozenset())
+
+    def _check_stop(self):
+        self._ticks += 1
+        if self.should_stop is not None and self._ticks % 256 == 0 and self.should_stop():
+            raise SolveInterrupted()
+
+    def _subgoals(self, goal: str) -> List[str]:
+        return [p for r in self.index.rules_for(goal, self.selection_mode)
+                for p in r.premises if p not in self.facts]
+
+    def _build(self, goal: str, seen: FrozenSet[str]) -> Optional[ProofNode]:
+        """
+        Nút của backward_chain_all(goal, seen); None nếu không có đường chứng minh.
+        Duyệt sâu bằng ngăn xếp tường minh nên chuỗi suy diễn dài không chạm giới hạn đệ quy.
+        """
+        facts = self.facts
+        node, frame = self._open(goal, seen)
+        if frame is None:
+            return node
+        stack = [frame]
+        result: Optional[ProofNode] = None
+        while stack:
+            self._check_stop()
+            frame = stack[-1]
+            node, rules = frame.node, frame.rules
+            if frame.waiting:
+                # Kết quả của mục tiêu con vừa dựng xong nằm trong `result`
+                frame.waiting = False
+                r = rules[frame.rule]
+                if r.op == 'AND':
+                    if result is None:
+                        frame.next_rule()
+                        continue
+                    frame.children.append(result)
+                elif result is not None:
+                    node.alternatives.append((r, (result,)))
+                frame.premise += 1
+
+            if frame.rule == len(rules):
+                stack.pop()
+                result = node if node else None
+                continue
+            r = rules[frame.rule]
+            if frame.premise == len(r.premises):
+                if r.op == 'AND':
+                    node.alternatives.append((r, tuple(frame.children)))
+                frame.next_rule()
+                continue
+
+            p = r.premises[frame.premise]
+            if p in facts:
+                if r.op == 'OR':
+                    node.alternatives.append((r, ()))
+                frame.premise += 1
+            elif p in frame.child_seen:
+                if r.op == 'AND':
+                    frame.next_rule()
+                else:
+                    frame.premise += 1
+            else:
+                frame.waiting = True
+                result, child_frame = self._open(p, frame.child_seen)
+                if child_frame is not None:
+                    stack.append(child_frame)
+        return result
+
+    def _open(self, goal: str, seen: FrozenSet[str]) -> Tuple[Optional[ProofNode], Optional['_BuildFrame']]:
+        """(nút đã dựng, None) nếu khóa đã có; ngược lại (None, khung dựng nút mới)."""
+        key = (goal, seen & self._component[goal])
+        if key in self.nodes:
+            node = self.nodes[key]
+            return (node if node else None), None
+        node = self.nodes[key] = ProofNode(goal)
+        # Tiền đề là tổ tiên thì phải cùng thành phần với goal, nên chỉ cần giữ tổ tiên trong thành phần
+        return None, _BuildFrame(node, key[1] | {goal}, self.index.rules_for(goal, self.selection_mode))
+
+    # ---------- Duyệt lười ----------
+    def __iter__(self) -> Iterator[List[Rule]]:
+        if self.goal in self.facts:
+            yield []
+        elif self.root is not None:
+            yield from self._iter_node(self.root)
+
+    def _iter_node(self, node: ProofNode) -> Iterator[List[Rule]]:
+        """
+        Các đường chứng minh của `node` theo thứ tự của backward_chain_all, không đệ quy.
+        Một đường ứng với dãy lựa chọn (nút, chỉ số lựa chọn) theo tiền thứ tự của cây chứng minh;
+        thứ tự cần sinh chính là thứ tự từ điển của dãy này (lựa chọn ở nút cha, rồi nút con đầu
+        thay đổi chậm nhất). Mỗi mục của dãy giữ các nút còn chờ và các luật đã xuất (danh sách
+        liên kết dùng chung) để cắt dãy và dựng tiếp mà không phải duyệt lại phần đầu.
+        """
+        # Mục: [nút, chỉ số lựa chọn, nút / luật còn chờ sau nút này, luật đã xuất trước nút này]
+        choices = [[node, 0, None, None]]
+        while choices:
+            n, alt, pending, emitted = choices[-1]
+            while True:
+                r, children = n.alternatives[alt]
+                pending = (r, pending)
+                for child in reversed(children):
+                    pending = (child, pending)
+                # Xuất các luật đã đủ nút con, dừng ở nút kế tiếp cần chọn
+                while pending is not None and not isinstance(pending[0], ProofNode):
+                    emitted = (pending[0], emitted)
+                    pending = pending[1]
+                if pending is None:
+                    break
+                n, alt, pending = pending[0], 0, pending[1]
+                choices.append([n, 0, pending, emitted])
+
+            proof: List[Rule] = []
+            while emitted is not None:
+                proof.append(emitted[0])
+                emitted = emitted[1]
+            proof.reverse()
+            yield proof
+
+            # Tăng lựa chọn cuối cùng còn tăng được, bỏ phần sau nó
+            while choices and choices[-1][1] + 1 == len(choices[-1][0].alternatives):
+                choices.pop()
+            if choices:
+                choices[-1][1] += 1
+
+    # ---------- Thống kê ----------
+    def length_counts(self) -> Counter:
+        """Số đường chứng minh theo độ dài (số luật)."""
+        if self.goal in self.facts:
+            return Counter({0: 1})
+        return Counter() if self.root is None else self._node_lengths(self.root)
+
+    def _node_lengths(self, node: ProofNode) -> Counter:
+        """Phân bố độ dài của `node`, tính theo hậu thứ tự bằng ngăn xếp (nút con trước nút cha)."""
+        memo = self._length_counts
+        stack: List[Tuple[ProofNode, bool]] = [(node, False)]
+        while stack:
+            self._check_stop()
+            n, ready = stack.pop()
+            if id(n) in memo:
+                continue
+            if not ready:
+                stack.append((n, True))
+                stack.extend((c, False) for _, children in n.alternatives for c in children if id(c) not in memo)
+                continue
+            counts = Counter()
+            for _, children in n.alternatives:
+                combined = Counter({1: 1})
+                for child in children:
+                    nxt = Counter()
+                    for a, k in combined.items():
+                        for b, m in memo[id(child)].items():
+                            nxt[a + b] += k * m
+                    combined = nxt
+                counts.update(combined)
+            memo[id(n)] = counts
+        return memo[id(node)]
+
+    def count(self) -> int:
+        """Tổng số đường chứng minh (= len(backward_chain_all(...)))."""
+        return sum(self.length_counts().values())
+
+    def shortest(self) -> Optional[int]:
+        counts = self.length_counts()
+        return min(counts) if counts else None
+
+    def longest(self) -> Optional[int]:
+        counts = self.length_counts()
+        return max(counts) if counts else None
+
+    # ---------- Chuyển đổi ----------
+    def shortest_proof(self) -> Optional[List[Rule]]:
+        """Đường ngắn nhất đứng đầu theo thứ tự backward_chain_all, dựng trực tiếp trên DAG."""
+        if self.goal in self.facts:
+            return []
+        if self.root is None:
+            return None
+        proof: List[Rule] = []
+        stack: List[Tuple[ProofNode, bool]] = [(self.root, False)]
+        while stack:
+            node, done = stack.pop()
+            r, children = min(node.alternatives, key=lambda alt: sum(self._min_length(c) for c in alt[1]))
+            if done:
+                proof.append(r)
+                continue
+            stack.append((node, True))
+            stack.extend((c, False) for c in reversed(children))
+        return proof
+
+    def _min_length(self, node: ProofNode) -> int:
+        size = self._shortest.get(id(node))
+        if size is None:
+            size = self._shortest[id(node)] = min(self._node_lengths(node))
+        return size
+
+    def to_prov(self, proof: List[Rule] = None) -> Dict[str, Tuple[Rule, Tuple[str, ...]]]:
+        """Vết prov cho draw_process_graph từ `proof` (mặc định là đường ngắn nhất)."""
+        if proof is None:
+            proof = self.shortest_proof() or []
+        return {r.conclusion: (r, r.premises) for r in proof}
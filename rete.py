@@ -0,0 +1,167 @@
+# =============================
+# Rete Network - Suy diễn tiến tăng dần (alpha/beta memory)
+# =============================
+from collections import deque
+from typing import Tuple, List, Set, Dict, Deque, Iterable
+
+from ToanHoc import Rule
+from closure_index import ClosureIndex, is_unit_rule
+
+
+class ReteNetwork:
+    """
+    Mạng luật biên dịch một lần từ danh sách Rule.
+    - Alpha: mỗi fact là một nút alpha, trỏ tới các nút beta join trên fact đó.
+    - Beta: mỗi luật AND là một chuỗi nút join theo tiền đề (đã sắp xếp), các luật
+      có chung tiền tố tiền đề dùng chung nút; nút cuối chuỗi kích hoạt luật.
+    - Luật OR nối thẳng từ nút alpha của từng tiền đề.
+    - use_closure=True: luật OR và luật một tiền đề không vào mạng mà được giải bằng tra cứu
+      ClosureIndex dựng sẵn (phù hợp knowledge base nặng phân cấp IsA).
+    """
+
+    def __init__(self, rules: List[Rule], selection_mode: str = 'Min', use_closure: bool = False):
+        self.selection_mode = selection_mode
+        self.rule_source: List[Rule] = rules if selection_mode == 'Min' else list(reversed(rules))
+        self.closure = ClosureIndex(rules, selection_mode) if use_closure else None
+
+        # Nút beta 0 là gốc: tiền tố rỗng, luôn thỏa
+        self.beta_atom: List[str] = [""]
+        self.beta_parent: List[int] = [-1]
+        self.beta_children: List[List[int]] = [[]]
+        self.beta_rules: List[List[int]] = [[]]
+
+        self.alpha_beta: Dict[str, List[int]] = {}
+        self.alpha_rules: Dict[str, List[int]] = {}
+        self.by_conclusion: Dict[str, List[int]] = {}
+        # rule_node[pos] = nút beta cuối của luật AND, -1 với luật OR
+        self.rule_node: List[int] = []
+
+        join_nodes: Dict[Tuple[int, str], int] = {}
+        for pos, r in enumerate(self.rule_source):
+            self.by_conclusion.setdefault(r.conclusion, []).append(pos)
+
+            if self.closure is not None and is_unit_rule(r):
+                self.rule_node.append(-1)
+                continue
+            if r.op == 'OR':
+                for p in dict.fromkeys(r.premises):
+                    self.alpha_rules.setdefault(p, []).append(pos)
+                self.rule_node.append(-1)
+                continue
+
+            node = 0
+            for atom in sorted(set(r.premises)):
+                child = join_nodes.get((node, atom))
+                if child is None:
+                    child = len(self.beta_atom)
+                    join_nodes[(node, atom)] = child
+                    self.beta_atom.append(atom)
+                    self.beta_parent.append(node)
+                    self.beta_children.append([])
+                    self.beta_rules.append([])
+                    self.beta_children[node].append(child)
+                    self.alpha_beta.setdefault(atom, []).append(child)
+                node = child
+            self.beta_rules[node].append(pos)
+            self.rule_node.append(node)
+
+    def new_session(self, facts: Iterable[str] = ()) -> "ReteSession":
+        return ReteSession(self, facts)
+
+
+class ReteSession:
+    """
+    Phiên suy diễn trên một ReteNetwork. Giữ known/prov và các beta memory giữa các lần
+    gọi assert_fact(), nên mỗi fact mới chỉ lan truyền hệ quả của chính nó.
+    """
+
+    def __init__(self, network: ReteNetwork, facts: Iterable[str] = ()):
+        self.network = network
+        self.initial: Set[str] = set()
+        self.known: Set[str] = set()
+        self.prov: Dict[str, Tuple[Rule, Tuple[str, ...]]] = {}
+
+        # beta_memory[n] = 1 nếu mọi tiền đề trên đường gốc -> n đã biết
+        self.beta_memory = bytearray(len(network.beta_atom))
+        self.beta_memory[0] = 1
+        self._agenda: Deque[int] = deque(network.beta_rules[0])
+        # Các fact suy ra từ lần _run() trước (gồm cả fact tra từ bao đóng)
+        self._derived: List[str] = []
+
+        self.assert_facts(facts)
+
+    def assert_fact(self, fact: str) -> List[str]:
+        """Thêm một fact ban đầu, trả về các fact mới suy ra từ nó."""
+        self.initial.add(fact)
+        if fact in self.known:
+            # Fact đã được suy ra trước đó nay trở thành giả thiết
+            self.prov.pop(fact, None)
+            return []
+        self._add(fact)
+        return self._run()
+
+    def assert_facts(self, facts: Iterable[str]) -> List[str]:
+        derived: List[str] = []
+        for fact in facts:
+            derived.extend(self.assert_fact(fact))
+        return derived
+
+    @property
+    def steps(self) -> List[str]:
+        """Các bước suy diễn, dựng lại từ prov theo thứ tự kích hoạt."""
+        return [f"({i}) Kích hoạt '{r.label}': {{{', '.join(used)}}} → {fact}"
+                for i, (fact, (r, used)) in enumerate(self.prov.items(), 1)]
+
+    def result(self):
+        """Trả về (known, prov, steps) như forward_chain_bfs."""
+        return set(self.known), dict(self.prov), self.steps
+
+    # ---------- Lan truyền ----------
+    def _add(self, fact: str):
+        self._join(fact)
+        net = self.network
+        if net.closure is not None:
+            for pos in net.closure.reach(fact, self.known):
+                r = net.rule_source[pos]
+                self._justify(r)
+                self._join(r.conclusion)
+
+    def _join(self, fact: str):
+        net = self.network
+        self.known.add(fact)
+
+        for node in net.alpha_beta.get(fact, ()):
+            if self.beta_memory[net.beta_parent[node]]:
+                self._activate(node)
+        self._agenda.extend(net.alpha_rules.get(fact, ()))
+
+    def _activate(self, node: int):
+        net = self.network
+        stack = [node]
+        while stack:
+            n = stack.pop()
+            if self.beta_memory[n]:
+                continue
+            self.beta_memory[n] = 1
+            self._agenda.extend(net.beta_rules[n])
+            for child in net.beta_children[n]:
+                if net.beta_atom[child] in self.known:
+                    stack.append(child)
+
+    def _run(self) -> List[str]:
+        rule_source = self.network.rule_source
+        while self._agenda:
+            r = rule_source[self._agenda.popleft()]
+            if r.conclusion in self.known:
+                continue
+            self._fire(r)
+        derived, self._derived = self._derived, []
+        return derived
+
+    def _fire(self, r: Rule):
+        self._justify(r)
+        self._add(r.conclusion)
+
+    def _justify(self, r: Rule):
+        self.prov[r.conclusion] = (r, r.premises)
+        self._derived.append(r.conclusion)
@@ -0,0 +1,206 @@
+# =============================
+# Rule Parser - Đọc file luật theo luồng, song song theo khối, trả về chẩn đoán có cấu trúc
+# =============================
+import hashlib
+import multiprocessing as mp
+import os
+import re
+from collections import deque
+from dataclasses import dataclass
+from typing import Tuple, List, Optional, Iterator
+
+from ToanHoc import Rule
+
+# Tăng khi cách đọc luật thay đổi để các snapshot (.kbc) cũ bị dựng lại
+PARSER_VERSION = "2"
+
+# Kích thước khối mặc định khi đọc song song
+CHUNK_BYTES = 8 << 20
+
+# 'v' là toán tử OR chỉ khi đứng riêng thành một từ ("convertible" không bị tách)
+OR_SEPARATOR = re.compile(r"\s+v\s+")
+
+MESSAGES = {
+    'missing-arrow': "Thiếu '->'",
+    'mixed-ops': "Luật chứa cả '&' và 'v' không được hỗ trợ",
+    'no-premises': "Luật không có tiền đề",
+    'no-conclusion': "Luật không có kết luận",
+    'duplicate': "Luật trùng lặp",
+    'io-error': "Không đọc được file",
+}
+
+
+@dataclass(frozen=True)
+class Diagnostic:
+    line: int
+    code: str
+    message: str
+    text: str
+
+    def __str__(self):
+        if self.code == 'io-error':
+            return f"{self.message}: {self.text}"
+        return f"Bỏ qua dòng {self.line}: {self.message}. Nội dung: '{self.text}'"
+
+
+def tokenize_premises(left: str) -> Tuple[Optional[str], List[str]]:
+    """Tách vế trái thành (op, danh sách tiền đề); op là None nếu trộn lẫn '&' và 'v'."""
+    has_and = "&" in left or "^" in left
+    if "v" in left:
+        or_parts = OR_SEPARATOR.split(left)
+        if len(or_parts) > 1:
+            if has_and:
+                return None, []
+            return 'OR', [p.strip() for p in or_parts if p.strip()]
+    if "^" in left:
+        left = left.replace("^", "&")
+    return 'AND', [p.strip() for p in left.split("&") if p.strip()]
+
+
+def parse_line(raw: str, lowercase: bool = False):
+    """
+    Đọc một dòng đã strip. Trả về None (dòng trống/chú thích), mã lỗi (str),
+    hoặc bộ (premises, conclusion, label hoặc None, op).
+    """
+    if not raw or raw.startswith("#"):
+        return None
+    if "->" not in raw:
+        return 'missing-arrow'
+    left, right = raw.split("->", 1)
+    right, raw_label = right.split("|", 1) if "|" in right else (right, None)
+    if lowercase:
+        left, right = left.lower(), right.lower()
+
+    op, premises = tokenize_premises(left)
+    if op is None:
+        return 'mixed-ops'
+    if not premises:
+        return 'no-premises'
+    conclusion = right.strip()
+    if not conclusion:
+        return 'no-conclusion'
+    label = raw_label.strip() if raw_label is not None else None
+    return tuple(premises), conclusion, label, op
+
+
+def _parse_chunk(path: str, start: int, end: int, lowercase: bool):
+    """Đọc đoạn byte [start, end) (đã căn theo đầu dòng); số dòng trả về là số dòng trong đoạn."""
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+
+    records = []
+    errors = []
+    lines = data.decode('utf-8').split("\n")
+    if lines and lines[-1] == "":
+        lines.pop()
+    for local_no, ln in enumerate(lines, 1):
+        raw = ln.strip()
+        parsed = parse_line(raw, lowercase)
+        if parsed is None:
+            continue
+        if isinstance(parsed, str):
+            errors.append((local_no, parsed, raw))
+        else:
+            premises, conclusion, label, op = parsed
+            records.append((local_no, raw, _canonical_key(premises, conclusion, op)) + parsed)
+    return len(lines), records, errors
+
+
+def _canonical_key(premises: Tuple[str, ...], conclusion: str, op: str) -> bytes:
+    """Khóa chuẩn hóa để loại trùng, băm gọn để tập đã thấy không phình theo độ dài luật."""
+    return hashlib.blake2b("\0".join((op, conclusion) + tuple(sorted(premises))).encode('utf-8'),
+                           digest_size=16).digest()
+
+
+def iter_chunks(path: str, chunk_bytes: int) -> Iterator[Tuple[int, int]]:
+    """Chia file thành các đoạn byte khoảng `chunk_bytes`, mỗi đoạn kết thúc ở cuối một dòng."""
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        start = 0
+        while start < size:
+            end = min(start + chunk_bytes, size)
+            if end < size:
+                f.seek(end)
+                f.readline()
+                end = f.tell()
+            yield start, end
+            start = end
+
+
+def iter_rules(path: str, diagnostics: List[Diagnostic] = None, workers: Optional[int] = None,
+               chunk_bytes: Optional[int] = None, lowercase: bool = False, label_format: str = "R{number}") -> Iterator[Rule]:
+    """
+    Đọc file luật theo luồng và trả về từng Rule hợp lệ theo đúng thứ tự trong file.
+    - File lớn được chia khối và đọc song song trên `workers` tiến trình; chỉ giữ tối đa
+      2 * workers khối đang chờ nên bộ nhớ bị chặn theo kích thước khối.
+    - id luật được gán tuần tự sau khi loại trùng lặp (cùng tiền đề, kết luận, toán tử),
+      nhãn mặc định là label_format.format(index=id, number=id + 1).
+    - Các dòng bị bỏ qua được ghi vào `diagnostics` (nếu có) thay vì in ra / hiện hộp thoại.
+    """
+    if diagnostics is None:
+        diagnostics = []
+
+    try:
+        chunks = list(iter_chunks(path, chunk_bytes or CHUNK_BYTES))
+    except OSError as e:
+        diagnostics.append(Diagnostic(0, 'io-error', MESSAGES['io-error'], str(e)))
+        return
+
+    seen = set()
+    count = 0
+    line_base = 0
+    try:
+        for n_lines, records, errors in _chunk_results(path, chunks, workers, lowercase):
+            pending = deque(errors)
+            for local_no, raw, key, premises, conclusion, label, op in records:
+                while pending and pending[0][0] < local_no:
+                    err_no, code, err_raw = pending.popleft()
+                    diagnostics.append(Diagnostic(line_base + err_no, code, MESSAGES[code], err_raw))
+
+                if key in seen:
+                    diagnostics.append(Diagnostic(line_base + local_no, 'duplicate', MESSAGES['duplicate'], raw))
+                    continue
+                seen.add(key)
+
+                if label is None:
+                    label = label_format.format(index=count, number=count + 1)
+                yield Rule(premises=premises, conclusion=conclusion, label=label, id=count, op=op)
+                count += 1
+
+            for err_no, code, err_raw in pending:
+                diagnostics.append(Diagnostic(line_base + err_no, code, MESSAGES[code], err_raw))
+            line_base += n_lines
+    except (OSError, UnicodeDecodeError) as e:
+        diagnostics.append(Diagnostic(line_base, 'io-error', MESSAGES['io-error'], str(e)))
+
+
+def _chunk_results(path: str, chunks: List[Tuple[int, int]], workers: Optional[int], lowercase: bool):
+    workers = workers or os.cpu_count() or 1
+    # Tiến trình daemon (ví dụ worker của một pool khác) không được tạo tiến trình con
+    if len(chunks) <= 1 or workers == 1 or mp.current_process().daemon:
+        for start, end in chunks:
+            yield _parse_chunk(path, start, end, lowercase)
+        return
+
+    with mp.Pool(workers) as pool:
+        window = deque()
+        chunk_iter = iter(chunks)
+        for start, end in chunk_iter:
+            window.append(pool.apply_async(_parse_chunk, (path, start, end, lowercase)))
+            if len(window) >= 2 * workers:
+                break
+        while window:
+            result = window.popleft().get()
+            for start, end in chunk_iter:
+                window.append(pool.apply_async(_parse_chunk, (path, start, end, lowercase)))
+                break
+            yield result
+
+
+def parse_rules_file(path: str, workers: Optional[int] = None, chunk_bytes: Optional[int] = None,
+                     lowercase: bool = False, label_format: str = "R{number}") -> Tuple[List[Rule], List[Diagnostic]]:
+    """Đọc toàn bộ file luật, trả về (rules, diagnostics)."""
+    diagnostics: List[Diagnostic] = []
+    rules = list(iter_rules(path, diagnostics, workers, chunk_bytes, lowercase, label_format))
+    return rules, diagnostics
@@ -0,0 +1,153 @@
+# =============================
+# Rule Store - Lưu trữ luật gọn cho tập luật rất lớn
+# =============================
+from array import array
+from collections.abc import Sequence
+from typing import List, Dict, Iterable
+
+from ToanHoc import Rule
+
+OPS = ('AND', 'OR')
+
+
+class SymbolTable:
+    """Bảng ký hiệu: mỗi tên fact được intern thành một số nguyên duy nhất."""
+
+    def __init__(self, names: Iterable[str] = ()):
+        self.names: List[str] = []
+        self.ids: Dict[str, int] = {}
+        for name in names:
+            self.intern(name)
+
+    def intern(self, name: str) -> int:
+        sid = self.ids.get(name)
+        if sid is None:
+            sid = len(self.names)
+            self.ids[name] = sid
+            self.names.append(name)
+        return sid
+
+    def get(self, name: str, default: int = -1) -> int:
+        return self.ids.get(name, default)
+
+    def __getitem__(self, sid: int) -> str:
+        return self.names[sid]
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name: str):
+        return name in self.ids
+
+
+class RuleStore(Sequence):
+    """
+    Kho luật dạng mảng: tiền đề của luật i là premise_ids[premise_offsets[i]:premise_offsets[i + 1]],
+    kết luận và toán tử là các mảng số nguyên song song, nhãn nằm trong một khối byte.
+    Truy cập store[i] trả về một Rule (id = i) dựng khi cần, nên các hàm nhận List[Rule]
+    và GUI vẫn dùng được.
+    """
+
+    def __init__(self, symbols: SymbolTable = None):
+        self.symbols = symbols if symbols is not None else SymbolTable()
+        self.premise_offsets = array('q', [0])
+        self.premise_ids = array('i')
+        self.conclusions = array('i')
+        self.ops = array('b')
+        # Nhãn hầu như không trùng nhau nên lưu nối tiếp dạng UTF-8 thay vì intern
+        self.label_offsets = array('q', [0])
+        self.label_bytes = bytearray()
+
+    @classmethod
+    def from_rules(cls, rules: Iterable[Rule]) -> "RuleStore":
+        store = cls()
+        for r in rules:
+            store.append(r.premises, r.conclusion, r.label, r.op)
+        return store
+
+    def append(self, premises: Iterable[str], conclusion: str, label: str, op: str) -> int:
+        """Thêm một luật, trả về chỉ số (id) của nó."""
+        intern = self.symbols.intern
+        self.premise_ids.extend(intern(p) for p in premises)
+        self.premise_offsets.append(len(self.premise_ids))
+        self.conclusions.append(intern(conclusion))
+        self.ops.append(OPS.index(op))
+        self.label_bytes += label.encode('utf-8')
+        self.label_offsets.append(len(self.label_bytes))
+        return len(self.conclusions) - 1
+
+    # ---------- Truy cập dạng số nguyên (cho engine) ----------
+    def premise_range(self, i: int) -> range:
+        return range(self.premise_offsets[i], self.premise_offsets[i + 1])
+
+    def premises_of(self, i: int):
+        return self.premise_ids[self.premise_offsets[i]:self.premise_offsets[i + 1]]
+
+    def op_of(self, i: int) -> str:
+        return OPS[self.ops[i]]
+
+    def label_of(self, i: int) -> str:
+        return str(self.label_bytes[self.label_offsets[i]:self.label_offsets[i + 1]], 'utf-8')
+
+    # ---------- Giao diện List[Rule] ----------
+    def __len__(self):
+        return len(self.conclusions)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        names = self.symbols
+        return Rule(premises=tuple(names[p] for p in self.premises_of(i)),
+                    conclusion=names[self.conclusions[i]],
+                    label=self.label_of(i),
+                    id=i,
+                    op=OPS[self.ops[i]])
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def to_rules(self) -> List[Rule]:
+        return list(self)
+
+
+# ---------- Benchmark bộ nhớ ----------
+def bench_memory(n_rules: int = 1_000_000, n_facts: int = 50_000, max_premises: int = 4, seed: int = 42):
+    """So sánh bộ nhớ List[Rule] (như load_and_parse_rules tạo ra) với RuleStore trên cùng dữ liệu."""
+    import gc
+    import random
+    import tracemalloc
+
+    def _lines():
+        rnd = random.Random(seed)
+        for i in range(n_rules):
+            k = rnd.randint(1, max_premises)
+            # Tạo chuỗi mới cho mỗi dòng, giống khi tách chuỗi lúc đọc file
+            premises = tuple(f"fact_{rnd.randrange(n_facts)}" for _ in range(k))
+            yield premises, f"fact_{rnd.randrange(n_facts)}", f"R{i + 1}", 'AND' if k > 1 else 'OR'
+
+    results = {}
+    for name in ("List[Rule]", "RuleStore"):
+        gc.collect()
+        tracemalloc.start()
+        if name == "List[Rule]":
+            built = [Rule(premises=p, conclusion=c, label=lb, id=i, op=op)
+                     for i, (p, c, lb, op) in enumerate(_lines())]
+        else:
+            built = RuleStore()
+            for p, c, lb, op in _lines():
+                built.append(p, c, lb, op)
+        results[name] = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del built
+
+    for name, size in results.items():
+        print(f"{name:>12}: {size / 2 ** 20:8.1f} MB")
+    print(f"{'Tiết kiệm':>12}: {1 - results['RuleStore'] / results['List[Rule]']:8.1%}")
+    return results
+
+
+if __name__ == "__main__":
+    bench_memory()
@@ -0,0 +1,203 @@
+# =============================
+# Tabled Backward Chaining - Suy diễn lùi có bảng nhớ (kiểu SLG) dùng chung giữa các mục tiêu
+# =============================
+import heapq
+import threading
+from typing import Tuple, List, Set, Dict, Optional, Callable, Iterable
+
+from ToanHoc import Rule, ConclusionIndex
+
+
+def strongly_connected_components(root: str, successors: Callable[[str], Iterable[str]]) -> List[List[str]]:
+    """Tarjan không đệ quy: các thành phần liên thông mạnh đạt tới từ `root`, lá trước gốc sau."""
+    order: Dict[str, int] = {root: 0}
+    low: Dict[str, int] = {root: 0}
+    on_stack: Set[str] = {root}
+    tarjan_stack: List[str] = [root]
+    components: List[List[str]] = []
+
+    work = [(root, iter(successors(root)))]
+    while work:
+        g, children = work[-1]
+        for c in children:
+            if c not in order:
+                order[c] = low[c] = len(order)
+                tarjan_stack.append(c)
+                on_stack.add(c)
+                work.append((c, iter(successors(c))))
+                break
+            if c in on_stack:
+                low[g] = min(low[g], order[c])
+        else:
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                low[parent] = min(low[parent], low[g])
+            if low[g] == order[g]:
+                component = []
+                while True:
+                    c = tarjan_stack.pop()
+                    on_stack.discard(c)
+                    component.append(c)
+                    if c == g:
+                        break
+                components.append(component)
+    return components
+
+
+class SolveInterrupted(Exception):
+    """Việc giải bị dừng giữa chừng vì should_stop() trả về True."""
+
+
+class TabledBackwardChainer:
+    """
+    Mỗi mục tiêu con chỉ được giải một lần cho mỗi truy vấn, kết quả lưu trong bảng
+    table[g] = (kích thước chứng minh nhỏ nhất, luật dùng, tiền đề dùng) hoặc None nếu không
+    chứng minh được. Nhiều mục tiêu của cùng một truy vấn dùng chung bảng.
+    - Đồ thị mục tiêu con được tách thành các thành phần liên thông mạnh (Tarjan); chu trình
+      chỉ nằm trong một thành phần nên không cần tập `seen` như backward_chain_all.
+    - Mỗi thành phần được giải bằng thuật toán Knuth (Dijkstra tổng quát cho đồ thị AND-OR)
+      khi mọi thành phần nó phụ thuộc đã có trong bảng. Kích thước ở đây là số luật của
+      chứng minh dạng cây, đúng bằng độ dài đường chứng minh ngắn nhất của backward_chain_all.
+    - should_stop: được gọi định kỳ trong lúc giải; trả về True thì ném SolveInterrupted. Các mục
+      đã ghi vào bảng vẫn đúng, nên có thể giải tiếp sau đó.
+    - Dùng chung được giữa các luồng (mỗi mục tiêu một luồng): việc giải được tuần tự hóa bằng khóa.
+    """
+
+    def __init__(self, rules: List[Rule], facts: Set[str], selection_mode: str = 'Min',
+                 index: ConclusionIndex = None, should_stop: Callable[[], bool] = None):
+        if index is None:
+            index = ConclusionIndex(rules)
+        self.index = index
+        self.selection_mode = selection_mode
+        self.facts = set(facts)
+        self.table: Dict[str, Optional[Tuple[int, Rule, Tuple[str, ...]]]] = {}
+        self.should_stop = should_stop
+        self._ticks = 0
+        self._lock = threading.Lock()
+
+    # ---------- Truy vấn ----------
+    def solve(self, goal: str) -> Optional[Tuple[int, Rule, Tuple[str, ...]]]:
+        """Mục trong bảng của `goal` (giải nếu chưa có); None nếu không chứng minh được hoặc là giả thiết."""
+        if goal in self.facts:
+            return None
+        if goal not in self.table:
+            with self._lock:
+                if goal not in self.table:
+                    for component in self._components(goal):
+                        self._solve_component(component)
+        return self.table[goal]
+
+    def is_provable(self, goal: str) -> bool:
+        return goal in self.facts or self.solve(goal) is not None
+
+    def cost(self, goal: str) -> Optional[int]:
+        """Số luật của chứng minh ngắn nhất (0 với giả thiết), None nếu không chứng minh được."""
+        if goal in self.facts:
+            return 0
+        entry = self.solve(goal)
+        return None if entry is None else entry[0]
+
+    def proof(self, goal: str) -> Optional[List[Rule]]:
+        """Một đường chứng minh ngắn nhất (thứ tự như backward_chain_all), None nếu không chứng minh được."""
+        if not self.is_provable(goal):
+            return None
+        proof: List[Rule] = []
+        stack = [(goal, False)]
+        while stack:
+            g, done = stack.pop()
+            if g in self.facts:
+                continue
+            _, r, used = self.table[g]
+            if done:
+                proof.append(r)
+                continue
+            stack.append((g, True))
+            stack.extend((p, False) for p in reversed(used))
+        return proof
+
+    def check_stop(self):
+        """Gọi should_stop sau mỗi 256 bước; ném SolveInterrupted nếu nó trả về True."""
+        self._ticks += 1
+        if self.should_stop is not None and self._ticks % 256 == 0 and self.should_stop():
+            raise SolveInterrupted()
+
+    # ---------- Tách thành phần ----------
+    def _subgoals(self, goal: str) -> List[str]:
+        """Các mục tiêu con chưa có trong bảng mà `goal` phụ thuộc trực tiếp."""
+        self.check_stop()
+        facts, table = self.facts, self.table
+        out = []
+        for r in self.index.rules_for(goal, self.selection_mode):
+            for p in r.premises:
+                if p not in facts and p not in table:
+                    out.append(p)
+        return out
+
+    def _components(self, goal: str) -> List[List[str]]:
+        """Các thành phần liên thông mạnh chưa giải, theo thứ tự phụ thuộc (lá trước)."""
+        return strongly_connected_components(goal, self._subgoals)
+
+    # ---------- Giải một thành phần (Knuth) ----------
+    def _solve_component(self, component: List[str]):
+        facts, table = self.facts, self.table
+        members = set(component)
+
+        # Ứng viên: (kích thước, mục tiêu, thứ hạng luật, chỉ số tiền đề, luật, tiền đề dùng);
+        # cùng kích thước thì ưu tiên luật đứng trước theo Min/Max
+        heap: List[Tuple[int, str, int, int, Rule, Tuple[str, ...]]] = []
+        # Luật AND đang chờ: (mục tiêu, thứ hạng) -> [số tiền đề trong thành phần chưa giải, tổng kích thước đã biết]
+        waiting: Dict[Tuple[str, int], List[int]] = {}
+        users: Dict[str, List[Tuple[str, int, Rule, int]]] = {}
+
+        for g in component:
+            for rank, r in enumerate(self.index.rules_for(g, self.selection_mode)):
+                if r.op == 'AND':
+                    total, inside = 1, {}
+                    for p in r.premises:
+                        if p in facts:
+                            continue
+                        if p in members:
+                            inside[p] = inside.get(p, 0) + 1
+                            continue
+                        entry = table[p]
+                        if entry is None:
+                            break
+                        total += entry[0]
+                    else:
+                        if not inside:
+                            heapq.heappush(heap, (total, g, rank, 0, r, r.premises))
+                        else:
+                            waiting[(g, rank)] = [len(inside), total]
+                            for p, mult in inside.items():
+                                users.setdefault(p, []).append((g, rank, r, mult))
+                else:
+                    for i, p in enumerate(r.premises):
+                        if p in facts:
+                            heapq.heappush(heap, (1, g, rank, i, r, (p,)))
+                        elif p in members:
+                            users.setdefault(p, []).append((g, rank, r, -1 - i))
+                        elif table[p] is not None:
+                            heapq.heappush(heap, (1 + table[p][0], g, rank, i, r, (p,)))
+
+        solved: Dict[str, int] = {}
+        while heap:
+            self.check_stop()
+            size, g, _, _, r, used = heapq.heappop(heap)
+            if g in solved:
+                continue
+            solved[g] = size
+            table[g] = (size, r, used)
+            for user_goal, rank, user_rule, slot in users.get(g, ()):
+                if slot < 0:
+                    heapq.heappush(heap, (1 + size, user_goal, rank, -1 - slot, user_rule, (g,)))
+                    continue
+                state = waiting[(user_goal, rank)]
+                state[0] -= 1
+                state[1] += slot * size
+                if state[0] == 0:
+                    heapq.heappush(heap, (state[1], user_goal, rank, 0, user_rule, user_rule.premises))
+
+        for g in component:
+            if g not in solved:
+                table[g] = None
@@ -0,0 +1,11 @@
+# Cho phép import các module ở gốc repo và trong SieuUngDung khi chạy pytest từ bất kỳ đâu
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, "SieuUngDung")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+# Vẽ đồ thị không cần màn hình
+os.environ.setdefault("MPLBACKEND", "Agg")
@@ -0,0 +1,92 @@
+# SPARQL server giả lập cục bộ cho kiểm thử harvester (không cần mạng)
+import json
+import re
+import threading
+import time
+from collections import deque
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, List, Tuple
+from urllib.parse import parse_qs
+
+KEYWORD = re.compile(r'"((?:[^"\\]|\\.)*)"@en')
+# Mỗi truy vấn con: VALUES ?kw { ... } ... LIMIT n
+BLOCK = re.compile(r'VALUES \?kw \{([^}]*)\}.*?LIMIT (\d+)', re.S)
+
+
+class SparqlStandIn:
+    """
+    Trả lời truy vấn composition_query từ bảng `parts` (từ khóa -> nhãn thành phần), áp LIMIT của
+    từng truy vấn con; mỗi yêu cầu chờ `delay` giây. Ghi lại các lô từ khóa nhận được và số yêu cầu chạy đồng thời lớn nhất.
+    `script` là các phản hồi (mã, header, nội dung) trả trước cho những yêu cầu đầu tiên.
+    Dùng làm context manager; `url` là địa chỉ endpoint.
+    """
+
+    def __init__(self, parts: Dict[str, List[str]], delay: float = 0.0,
+                 script: List[Tuple[int, Dict[str, str], bytes]] = ()):
+        self.parts = parts
+        self.delay = delay
+        self.script = deque(script)
+        self.batches: List[List[str]] = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}/sparql"
+
+    @property
+    def requests(self) -> int:
+        return len(self.batches)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def answer(self, query: str) -> Tuple[int, Dict[str, str], bytes]:
+        blocks = [([k.replace('\\"', '"').replace('\\\\', '\\') for k in KEYWORD.findall(values)], int(limit))
+                  for values, limit in BLOCK.findall(query)]
+        with self._lock:
+            self.batches.append([kw for keywords, _ in blocks for kw in keywords])
+            if self.script:
+                return self.script.popleft()
+        rows = []
+        for keywords, limit in blocks:
+            rows += [{'kw': {'value': kw}, 'compLabel': {'value': part}}
+                     for kw in keywords for part in self.parts.get(kw, ())][:limit]
+        body = json.dumps({'results': {'bindings': rows}}).encode('utf-8')
+        return 200, {'Content-Type': 'application/sparql-results+json'}, body
+
+    def _handler(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                query = parse_qs(self.rfile.read(length).decode('utf-8'))['query'][0]
+                with standin._lock:
+                    standin.active += 1
+                    standin.max_active = max(standin.max_active, standin.active)
+                try:
+                    time.sleep(standin.delay)
+                    status, headers, body = standin.answer(query)
+                finally:
+                    with standin._lock:
+                        standin.active -= 1
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
@@ -0,0 +1,114 @@
+import threading
+import time
+
+from ToanHoc import Rule
+from backward_executor import (prove_goal, ProofBudget, BackwardExecutor,
+                               PROVED, BUDGET_EXHAUSTED, CANCELLED, UNPROVABLE)
+
+SLACK = 0.5
+
+
+def chain_with_back_edges(n):
+    rules = [Rule((f"c{i}",), f"c{i + 1}", f"R{i}", i, 'AND') for i in range(n)]
+    rules += [Rule((f"c{i + 5}",), f"c{i}", f"B{i}", n + i, 'AND') for i in range(0, n - 5, 50)]
+    return rules
+
+
+def dense_cycle(n):
+    # Mỗi mục tiêu suy ra từ mọi mục tiêu khác hoặc từ 'a': số đường chứng minh bùng nổ
+    return [Rule(tuple(f"g{j}" for j in range(n) if j != i) + ("a",), f"g{i}", f"R{i}", i, 'OR')
+            for i in range(n)]
+
+
+def run(goal, rules, facts, mode, budget, cancel_event=None):
+    expires = None if budget.deadline is None else time.time() + budget.deadline
+    return prove_goal(goal, rules, facts, mode, budget, expires, cancel_event)
+
+
+def test_long_chain_finishes_well_within_deadline():
+    rules = chain_with_back_edges(2000)
+    for mode in ('Min', 'Max'):
+        result = run("c2000", rules, {"c0"}, mode, ProofBudget(deadline=2.0))
+        assert result.status == PROVED
+        assert len(result.proofs) == 1 and len(result.proofs[0]) == 2000
+        assert result.elapsed < 2.0
+
+
+def test_deadline_stops_enumeration():
+    deadline = 1.0
+    for mode in ('Min', 'Max'):
+        result = run("g0", dense_cycle(12), {"a"}, mode, ProofBudget(deadline=deadline))
+        assert result.status == BUDGET_EXHAUSTED
+        assert result.total is None
+        assert deadline <= result.elapsed < deadline + SLACK
+
+
+def test_deadline_stops_counting():
+    # Một đường đến ngay; phần đếm trên rừng chứng minh (đồ thị có chu trình) phải dừng đúng hạn
+    deadline = 0.5
+    result = run("g0", dense_cycle(14), {"a"}, 'Min', ProofBudget(deadline=deadline, max_proofs=1))
+    assert result.status == BUDGET_EXHAUSTED
+    assert len(result.proofs) == 1
+    assert result.total is None
+    assert deadline <= result.elapsed < deadline + SLACK
+
+
+def test_cancel_interrupts_running_goal():
+    cancel_event = threading.Event()
+    threading.Timer(0.3, cancel_event.set).start()
+    result = run("g0", dense_cycle(12), {"a"}, 'Max', ProofBudget(), cancel_event)
+    assert result.status == CANCELLED
+    assert result.elapsed < 0.3 + SLACK
+
+
+def test_executor_results():
+    rules = [Rule(("a",), "b", "R1", 0, 'AND'), Rule(("b",), "c", "R2", 1, 'AND'),
+             Rule(("a",), "c", "R3", 2, 'AND')]
+    executor = BackwardExecutor(max_workers=2)
+    try:
+        results = executor.submit(rules, {"a"}, ["c", "z"], budget=ProofBudget(deadline=2.0)).results()
+    finally:
+        executor.shutdown()
+    assert results["c"].status == PROVED
+    assert [[r.label for r in p] for p in results["c"].proofs] == [["R3"], ["R1", "R2"]]
+    assert (results["c"].best_count, results["c"].total) == (1, 2)
+    assert results["z"].status == UNPROVABLE
+
+
+def test_goals_of_one_query_share_the_subgoal_table(monkeypatch):
+    from tabled_backward import TabledBackwardChainer
+    solved = []
+    original = TabledBackwardChainer._solve_component
+
+    def counting(self, component):
+        solved.extend(component)
+        return original(self, component)
+
+    monkeypatch.setattr(TabledBackwardChainer, '_solve_component', counting)
+    n = 300
+    rules = chain_with_back_edges(n)
+    goals = [f"c{n}", f"c{n - 1}", f"c{n // 2}"]
+    executor = BackwardExecutor(max_workers=3)
+    try:
+        results = executor.submit(rules, {"c0"}, goals, budget=ProofBudget(deadline=5.0)).results()
+    finally:
+        executor.shutdown()
+    assert all(results[g].status == PROVED for g in goals)
+    assert results[f"c{n}"].proofs[0] == rules[:n]
+    # Mỗi mục tiêu con của chuỗi chỉ được giải một lần cho cả truy vấn
+    assert sorted(solved) == sorted({f"c{i}" for i in range(1, n + 1)})
+
+
+def test_cyclic_rule_base_is_counted():
+    from ToanHoc import backward_chain_all
+    # a <-> b là chu trình; backward_chain_all cắt theo tổ tiên nên số đường vẫn hữu hạn
+    rules = [Rule(("x",), "a", "R1", 0, 'AND'), Rule(("b",), "a", "R2", 1, 'AND'),
+             Rule(("a",), "b", "R3", 2, 'AND'), Rule(("x",), "b", "R4", 3, 'AND'),
+             Rule(("a", "b"), "c", "R5", 4, 'AND')]
+    for mode in ('Min', 'Max'):
+        paths = backward_chain_all("c", rules, {"x"}, set(), mode)
+        result = run("c", rules, {"x"}, mode, ProofBudget(deadline=2.0))
+        assert result.status == PROVED
+        assert result.total == len(paths) == len(result.proofs)
+        best = (min if mode == 'Min' else max)(map(len, paths))
+        assert result.best_count == sum(len(p) == best for p in paths)
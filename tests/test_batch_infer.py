@@ -0,0 +1,49 @@
+import multiprocessing as mp
+import os
+import threading
+
+import pytest
+
+import rule_parser
+from batch_infer import batch_infer
+from rule_parser import parse_rules_file
+from ToanHoc import forward_chain_indexed
+
+TIMEOUT = 60
+
+
+@pytest.fixture
+def large_rules_file(tmp_path, monkeypatch):
+    """File luật lớn hơn nhiều khối đọc, trên máy 'nhiều lõi' (đọc song song được bật)."""
+    path = tmp_path / "kb.txt"
+    path.write_text("".join(f"a{i} & b{i} -> a{i + 1} | R{i}\n" for i in range(3000)), encoding="utf-8")
+    monkeypatch.setattr(rule_parser, 'CHUNK_BYTES', 4096)
+    monkeypatch.setattr(os, 'cpu_count', lambda: 4)
+    assert path.stat().st_size > 10 * rule_parser.CHUNK_BYTES
+    return str(path)
+
+
+def run_with_timeout(fn):
+    result = []
+    thread = threading.Thread(target=lambda: result.append(fn()), daemon=True)
+    thread.start()
+    thread.join(TIMEOUT)
+    assert result, "batch_infer không kết thúc (pool lồng trong tiến trình daemon?)"
+    return result[0]
+
+
+def test_batch_infer_on_multi_chunk_file(large_rules_file):
+    fact_sets = [{"a0"} | {f"b{i}" for i in range(k)} for k in (0, 10, 3000)]
+    results = run_with_timeout(lambda: list(batch_infer(large_rules_file, fact_sets, processes=2, trace=False)))
+    rules = parse_rules_file(large_rules_file, workers=1)[0]
+    assert len(rules) == 3000
+    for (i, (known, prov, _)), facts in zip(results, fact_sets):
+        assert (known, prov) == forward_chain_indexed(rules, facts, 'Min', trace=False)[:2]
+    assert "a3000" in results[2][1][0]
+
+
+def test_parser_inside_daemonic_worker_reads_sequentially(large_rules_file):
+    with mp.Pool(1) as pool:
+        rules, diagnostics = run_with_timeout(lambda: pool.apply(parse_rules_file, (large_rules_file,)))
+    assert diagnostics == []
+    assert rules == parse_rules_file(large_rules_file, workers=1)[0]
@@ -0,0 +1,191 @@
+# Kiểm thử đối chiếu: các engine tối ưu phải cho cùng kết quả với forward_chain_bfs / backward_chain_all
+import random
+from collections import Counter
+
+import pytest
+
+from ToanHoc import (Rule, ConclusionIndex, RuleIndex, forward_chain_bfs, forward_chain_indexed,
+                     forward_chain_goal, backward_chain_all, iter_proofs)
+from bitset_engine import BitsetEngine
+from closure_index import forward_chain_closure
+from proof_analysis import ProofAnalysis
+from proof_dag import ProofForest
+from rete import ReteNetwork
+from truth_maintenance import TruthMaintenanceSession
+
+SEEDS = range(300)
+MODES = ('Min', 'Max')
+
+
+def random_kb(seed, n_facts=10, n_rules=24):
+    rnd = random.Random(seed)
+    facts = [f"f{i}" for i in range(n_facts)]
+    rules = [Rule(tuple(rnd.choice(facts) for _ in range(rnd.randint(1, 3))), rnd.choice(facts),
+                  f"R{i + 1}", i, rnd.choice(('AND', 'OR')))
+             for i in range(n_rules)]
+    return rules, set(rnd.sample(facts, rnd.randint(1, 3))), facts
+
+
+def chain(n, op='AND'):
+    return [Rule((f"c{i}",), f"c{i + 1}", f"R{i}", i, op) for i in range(n)]
+
+
+def ids(proofs):
+    return [[r.id for r in proof] for proof in proofs]
+
+
+def assert_valid_prov(known, prov, facts):
+    """Mỗi fact suy ra được kích hoạt bởi luật có tiền đề đã biết trước đó."""
+    order = {f: i for i, f in enumerate(prov)}
+    for i, (fact, (rule, _)) in enumerate(prov.items()):
+        assert rule.conclusion == fact and fact not in facts
+        ready = [p in facts or order.get(p, i) < i for p in rule.premises]
+        assert all(ready) if rule.op == 'AND' else any(ready)
+    assert set(prov) | facts == known
+
+
+# ---------- Suy diễn tiến ----------
+@pytest.mark.parametrize("mode", MODES)
+def test_forward_engines_match_bfs(mode):
+    for seed in SEEDS:
+        rules, facts, names = random_kb(seed)
+        known, prov, steps = forward_chain_bfs(rules, facts, mode)
+        index = RuleIndex(rules, mode)
+
+        assert forward_chain_indexed(rules, facts, mode, 'Queue', index)[:2] == (known, prov), seed
+        assert list(forward_chain_indexed(rules, facts, mode, 'Queue', index)[2]) == list(steps), seed
+
+        stack_known, stack_prov, _ = forward_chain_indexed(rules, facts, mode, 'Stack', index)
+        assert stack_known == known, seed
+        assert_valid_prov(stack_known, stack_prov, facts)
+
+        closure_known, closure_prov, closure_steps = forward_chain_closure(rules, facts, mode)
+        assert closure_known == known, seed
+        assert_valid_prov(closure_known, closure_prov, facts)
+        assert len(closure_steps) == len(closure_prov)
+
+        goal = random.Random(seed).choice(names)
+        goal_known = forward_chain_goal(rules, facts, [goal], mode, index=index)[0]
+        assert (goal in goal_known) == (goal in known) and goal_known <= known, seed
+
+        order = sorted(facts)
+        random.Random(seed).shuffle(order)
+        for use_closure in (False, True):
+            session = ReteNetwork(rules, mode, use_closure=use_closure).new_session()
+            derived = []
+            for fact in order:
+                derived += session.assert_fact(fact)
+            assert session.known == known, (seed, use_closure)
+            assert_valid_prov(session.known, session.prov, facts)
+            assert sorted(derived) == sorted(set(derived)) and set(derived) - facts == set(session.prov)
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_bitset_batch_matches_bfs(mode):
+    kbs = [random_kb(seed) for seed in SEEDS]
+    for seed, (rules, _, names) in enumerate(kbs):
+        rnd = random.Random(seed)
+        fact_sets = [set(rnd.sample(names, rnd.randint(0, 4))) for _ in range(70)]
+        knowns, provs = BitsetEngine(rules).infer_batch(fact_sets, with_prov=True, selection_mode=mode)
+        for facts, known, prov in zip(fact_sets, knowns, provs):
+            assert (known, prov) == forward_chain_bfs(rules, facts, mode)[:2], seed
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_truth_maintenance_matches_recompute(mode):
+    for seed in SEEDS:
+        rules, _, names = random_kb(seed)
+        rnd = random.Random(seed)
+        session = TruthMaintenanceSession(ReteNetwork(rules, mode, use_closure=seed % 2 == 0))
+        current = set()
+        for _ in range(10):
+            fact = rnd.choice(names)
+            if fact in current and rnd.random() < 0.6:
+                current.discard(fact)
+                session.retract_fact(fact)
+            else:
+                current.add(fact)
+                session.assert_fact(fact)
+            assert session.known == forward_chain_bfs(rules, current, mode)[0], seed
+            assert_valid_prov(session.known, session.prov, current)
+        target = set(rnd.sample(names, 3))
+        session.update(target)
+        assert session.known == forward_chain_bfs(rules, target, mode)[0], seed
+
+
+# ---------- Suy diễn lùi ----------
+@pytest.mark.parametrize("mode", MODES)
+def test_proof_enumeration_and_counts_match_backward_chain_all(mode):
+    for seed in SEEDS:
+        rules, facts, names = random_kb(seed, n_facts=8, n_rules=12)
+        index = ConclusionIndex(rules)
+        analysis = ProofAnalysis(rules, facts, mode, index)
+        for goal in names:
+            paths = backward_chain_all(goal, rules, facts, set(), mode, index)
+            lengths = Counter(len(p) for p in paths)
+
+            for longest in (False, True):
+                expected = sorted(paths, key=(lambda p: -len(p)) if longest else len)
+                assert ids(iter_proofs(goal, rules, facts, mode, longest, index)) == ids(expected), (seed, goal)
+
+            forest = ProofForest(goal, rules, facts, mode, index)
+            assert ids(forest) == ids(paths), (seed, goal)
+            assert forest.count() == len(paths) and forest.length_counts() == lengths
+
+            assert analysis.shortest(goal) == (min(lengths) if paths else None), (seed, goal)
+            assert analysis.count_shortest(goal) == (lengths[min(lengths)] if paths else 0)
+            assert analysis.count(goal) == len(paths), (seed, goal)
+            assert analysis.longest(goal) == (max(lengths) if paths else None), (seed, goal)
+            assert analysis.count_longest(goal) == (lengths[max(lengths)] if paths else None)
+
+
+# ---------- Trường hợp biên ----------
+@pytest.mark.parametrize("mode", MODES)
+def test_deep_chain(mode):
+    n = 2000  # Vượt giới hạn đệ quy mặc định (1000)
+    rules = chain(n)
+    facts = {"c0"}
+    expected = {f"c{i}" for i in range(n + 1)}
+    assert forward_chain_bfs(rules, facts, mode)[0] == expected
+    assert forward_chain_indexed(rules, facts, mode, 'Stack')[0] == expected
+    assert forward_chain_closure(rules, facts, mode)[0] == expected
+    assert ReteNetwork(rules, mode, use_closure=True).new_session(facts).known == expected
+    assert BitsetEngine(rules).infer_batch([facts])[0][0] == expected
+
+    goal = f"c{n}"
+    assert [len(p) for p in iter_proofs(goal, rules, facts, mode)] == [n]
+    forest = ProofForest(goal, rules, facts, mode)
+    assert forest.count() == 1 and forest.shortest() == n
+    analysis = ProofAnalysis(rules, facts, mode)
+    assert (analysis.shortest(goal), analysis.count(goal), analysis.longest(goal)) == (n, 1, n)
+
+    session = TruthMaintenanceSession(ReteNetwork(rules, mode, use_closure=True), facts)
+    session.retract_fact("c0")
+    assert session.known == set()
+
+
+@pytest.mark.parametrize("mode", MODES)
+@pytest.mark.parametrize("op", ('AND', 'OR'))
+def test_cycles(mode, op):
+    # Chu trình a -> b -> c -> a, vào từ x; thêm luật ngắn x & y -> c
+    rules = [Rule(("a",), "b", "R1", 0, op), Rule(("b",), "c", "R2", 1, op), Rule(("c",), "a", "R3", 2, op),
+             Rule(("x",), "a", "R4", 3, op), Rule(("x", "y"), "c", "R5", 4, op)]
+    for facts in ({"x"}, {"x", "y"}, {"y"}, set()):
+        known, _, _ = forward_chain_bfs(rules, facts, mode)
+        assert forward_chain_closure(rules, facts, mode)[0] == known
+        assert ReteNetwork(rules, mode).new_session(facts).known == known
+        assert BitsetEngine(rules).infer_batch([facts])[0][0] == known
+        analysis = ProofAnalysis(rules, facts, mode)
+        for goal in ("a", "b", "c"):
+            paths = backward_chain_all(goal, rules, facts, set(), mode)
+            assert bool(paths) == (goal in known)
+            assert ids(iter_proofs(goal, rules, facts, mode)) == ids(sorted(paths, key=len))
+            assert ProofForest(goal, rules, facts, mode).count() == len(paths)
+            assert analysis.shortest(goal) == (min(map(len, paths)) if paths else None)
+            assert analysis.count(goal) == len(paths)
+            assert analysis.longest(goal) == (max(map(len, paths)) if paths else None)
+
+    session = TruthMaintenanceSession(ReteNetwork(rules, mode), {"x"})
+    session.retract_fact("x")
+    # Các fact trong chu trình chỉ tự đỡ lẫn nhau nên phải bị rút hết
+    assert session.known == set()
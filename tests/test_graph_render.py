@@ -0,0 +1,41 @@
+import time
+
+import graph_export
+from graph_export import build_rpg, rpg_layout
+from graph_render import GraphRenderer, rules_digest
+from ToanHoc import Rule
+
+
+def chain(n):
+    return [Rule((f"c{i}",), f"c{i + 1}", f"R{i}", i, 'AND') for i in range(n)]
+
+
+def test_rpg_layout_is_layered_and_scales():
+    rules = chain(5000) + [Rule(("c10",), "c0", "B", 5000, 'AND')]
+    G = build_rpg(rules)
+    started = time.time()
+    pos = rpg_layout(G)
+    assert time.time() - started < 2.0
+    assert set(pos) == set(G.nodes())
+    # Chuỗi luật: mỗi luật một tầng, luật sau nằm dưới luật trước (ngoài chu trình R0..R9, B)
+    assert pos["R11"][1] > pos["R12"][1] > pos["R4999"][1]
+
+
+def test_renderer_reuses_rpg_layout(monkeypatch):
+    calls = []
+    monkeypatch.setattr(graph_export, 'rpg_layout', lambda G: calls.append(G) or rpg_layout(G))
+    renderer = GraphRenderer()
+    try:
+        rules = chain(5)
+        digest = rules_digest(rules)
+        first = renderer.submit('rpg', rules, digest, set(), {}, None).result()
+        renderer.clear()
+        second = renderer.submit('rpg', rules, digest, set(), {}, None).result()
+        assert first.png == second.png
+        assert len(calls) == 1
+
+        changed = rules + [Rule(("c5",), "c6", "R5", 5, 'AND')]
+        renderer.submit('rpg', changed, rules_digest(changed), set(), {}, None).result()
+        assert len(calls) == 2
+    finally:
+        renderer.shutdown()
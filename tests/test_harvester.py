@@ -0,0 +1,163 @@
+import asyncio
+import time
+
+from harvester import PARTS_PER_KEYWORD, SparqlClient, composition_query, harvest
+from lookup_cache import LookupCache
+from sparql_standin import SparqlStandIn
+
+PARTS = {'car': ['engine', 'wheel'], 'bike': ['frame', 'chain'], 'wheel': ['rim', 'spoke']}
+
+
+def compositions(client, keywords):
+    return asyncio.run(client.compositions(keywords))
+
+
+def test_concurrency_is_bounded():
+    keywords = [f"kw{i}" for i in range(8)]
+    with SparqlStandIn(PARTS, delay=0.2) as server:
+        client = SparqlClient(server.url, concurrency=3, batch_size=1)
+        try:
+            started = time.time()
+            result = compositions(client, keywords)
+            elapsed = time.time() - started
+        finally:
+            client.close()
+    assert result == {kw: [] for kw in keywords}
+    assert server.requests == 8
+    assert server.max_active == 3
+    # 8 yêu cầu, 3 yêu cầu mỗi đợt: 3 đợt nối tiếp
+    assert 0.6 <= elapsed < 1.5
+
+
+def test_inflight_requests_are_shared():
+    with SparqlStandIn(PARTS, delay=0.2) as server:
+        client = SparqlClient(server.url)
+
+        async def many():
+            return await asyncio.gather(*[client.composition('car') for _ in range(5)],
+                                        client.compositions(['car', 'bike']))
+        try:
+            *single, both = asyncio.run(many())
+        finally:
+            client.close()
+    assert all(sorted(parts) == ['engine', 'wheel'] for parts in single)
+    assert sorted(both['bike']) == ['chain', 'frame']
+    # 'car' chỉ được gửi một lần; 'bike' đi trong lô riêng
+    assert sorted(kw for batch in server.batches for kw in batch) == ['bike', 'car']
+
+
+def test_retryable_status_backs_off_and_retries():
+    script = [(503, {}, b"busy"), (429, {'Retry-After': '1'}, b"slow down")]
+    with SparqlStandIn(PARTS, script=script) as server:
+        client = SparqlClient(server.url, backoff=0.1, retries=3)
+        try:
+            started = time.time()
+            result = compositions(client, ['car'])
+            elapsed = time.time() - started
+        finally:
+            client.close()
+    assert sorted(result['car']) == ['engine', 'wheel']
+    assert server.requests == 3
+    # backoff 0.1 * (1..1.5) sau 503, rồi ít nhất Retry-After = 1 giây sau 429
+    assert elapsed >= 1.1
+
+
+def test_retries_exhausted_returns_empty():
+    script = [(503, {}, b"busy")] * 3
+    with SparqlStandIn(PARTS, script=script) as server:
+        client = SparqlClient(server.url, backoff=0.01, retries=2)
+        try:
+            result = compositions(client, ['car'])
+        finally:
+            client.close()
+    assert result == {'car': []}
+    assert server.requests == 3
+
+
+def test_non_retryable_status_is_not_parsed_or_retried():
+    script = [(400, {'Content-Type': 'text/html'}, b"<html>bad query</html>")]
+    with SparqlStandIn(PARTS, script=script) as server:
+        client = SparqlClient(server.url, backoff=0.01)
+        try:
+            assert compositions(client, ['car', 'bike']) == {'car': [], 'bike': []}
+        finally:
+            client.close()
+    assert server.requests == 1
+
+
+def run_harvest(client, topics, children, cache=None, **options):
+    return asyncio.run(harvest(topics, lambda w: children.get(w, []), client=client, cache=cache, **options))
+
+
+def test_harvest_sends_one_query_per_batch_and_level():
+    children = {'vehicle': ['car', 'bike', 'truck', 'bus', 'tram']}
+    with SparqlStandIn(PARTS) as server:
+        client = SparqlClient(server.url, batch_size=2)
+        try:
+            rules = run_harvest(client, ['vehicle'], children)
+        finally:
+            client.close()
+    # Tầng 0: một lô ['vehicle']; tầng 1: 5 từ chia thành 3 lô
+    assert sorted(map(len, server.batches)) == [1, 1, 2, 2]
+    assert sorted(kw for batch in server.batches for kw in batch) == sorted(['vehicle'] + children['vehicle'])
+    assert "engine & wheel -> car | Rule_AND_car" in rules
+    assert "chain & frame -> bike | Rule_AND_bike" in rules
+    assert not any(r.endswith("Rule_AND_truck") for r in rules)
+
+
+def test_rows_are_limited_per_keyword():
+    keywords = ['car', 'bike', 'wheel']
+    # 'car' có nhiều dòng hơn giới hạn của cả lô: các từ khóa khác vẫn phải nhận đủ thành phần
+    many = dict(PARTS, car=[f"part{i:02d}" for i in range(PARTS_PER_KEYWORD * len(keywords) + 5)])
+    query = composition_query(keywords)
+    assert query.count(f"LIMIT {PARTS_PER_KEYWORD}") == len(keywords)
+    with SparqlStandIn(many) as server:
+        client = SparqlClient(server.url)
+        try:
+            result = compositions(client, keywords)
+        finally:
+            client.close()
+    assert server.batches == [keywords]
+    assert sorted(result['car']) == many['car'][:PARTS_PER_KEYWORD]
+    assert sorted(result['bike']) == ['chain', 'frame']
+    assert sorted(result['wheel']) == ['rim', 'spoke']
+
+
+def test_harvest_retries_busy_level():
+    with SparqlStandIn(PARTS, script=[(503, {}, b"busy")]) as server:
+        client = SparqlClient(server.url, backoff=0.01)
+        try:
+            rules = run_harvest(client, ['car'], {})
+        finally:
+            client.close()
+    assert server.batches == [['car'], ['car']]
+    assert rules == ["engine & wheel -> car | Rule_AND_car"]
+
+
+def test_cached_keywords_are_not_sent(tmp_path):
+    cache = LookupCache(str(tmp_path / "c.sqlite3"))
+    cache.put('wikidata', 'car', ['piston', 'valve'])
+    with SparqlStandIn(PARTS) as server:
+        client = SparqlClient(server.url, cache=cache)
+        try:
+            result = compositions(client, ['car', 'bike'])
+        finally:
+            client.close()
+    assert server.batches == [['bike']]
+    assert result['car'] == ['piston', 'valve']
+    assert sorted(cache.get('wikidata', 'bike')) == ['chain', 'frame']
+
+
+def test_read_timeout_grows_with_batch():
+    keywords = ['car', 'bike', 'wheel', 'kw3', 'kw4']
+    with SparqlStandIn(PARTS, delay=0.5) as server:
+        single = SparqlClient(server.url, timeout=0.2, timeout_per_keyword=0.1, retries=0)
+        batched = SparqlClient(server.url, timeout=0.2, timeout_per_keyword=0.1, retries=0)
+        try:
+            # Một từ khóa: chờ đọc 0.3 giây < 0.5 nên hết giờ; năm từ khóa: 0.7 giây là đủ
+            assert compositions(single, ['car']) == {'car': []}
+            result = compositions(batched, keywords)
+        finally:
+            single.close()
+            batched.close()
+    assert sorted(result['car']) == ['engine', 'wheel']
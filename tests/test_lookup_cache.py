@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+
+import lookup_cache
+from harvester import SparqlClient, harvest
+from lookup_cache import LookupCache
+from sparql_standin import SparqlStandIn
+
+
+class Clock:
+    """Thay time.time của lookup_cache để TTL / LRU không phụ thuộc đồng hồ thật."""
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(lookup_cache.time, 'time', clock)
+    return clock
+
+
+def test_ttl_expiry(tmp_path, clock):
+    cache = LookupCache(str(tmp_path / "c.sqlite3"), ttl=10)
+    cache.put('wikidata', 'Car', ['engine'])
+    clock.now += 5
+    assert cache.get('wikidata', ' car ') == ['engine']
+    clock.now += 6
+    assert cache.get('wikidata', 'car') is None
+    assert (cache.stats.hits, cache.stats.misses, cache.stats.expired) == (1, 1, 1)
+    assert len(cache) == 0
+
+
+def test_lru_eviction_keeps_recently_read(tmp_path, clock):
+    cache = LookupCache(str(tmp_path / "c.sqlite3"), max_entries=2)
+    cache.put('s', 'a', ['1'])
+    clock.now += 1
+    cache.put('s', 'b', ['2'])
+    clock.now += 1
+    assert cache.get('s', 'a') == ['1']
+    clock.now += 1
+    cache.put('s', 'c', ['3'])
+    assert cache.get_many('s', ['a', 'b', 'c']) == {'a': ['1'], 'c': ['3']}
+    assert cache.stats.evictions == 1
+    assert len(cache) == 2
+
+
+def test_row_count_survives_reopen_and_replace(tmp_path, clock):
+    path = str(tmp_path / "c.sqlite3")
+    cache = LookupCache(path)
+    cache.put_many('s', [('a', ['1']), ('b', ['2']), ('A', ['3'])])
+    assert len(cache) == 2
+    assert cache.get('s', 'a') == ['3']
+    cache.close()
+    cache = LookupCache(path)
+    assert len(cache) == 2
+    clock.now += lookup_cache.DEFAULT_TTL + 1
+    assert cache.purge_expired() == 2
+    assert len(cache) == 0
+
+
+def test_hit_rate_and_lookup_many_calls_only_missing(tmp_path, clock):
+    cache = LookupCache(str(tmp_path / "c.sqlite3"))
+    cache.put('wordnet', 'car', ['coupe'])
+    calls = []
+
+    def children_of(word):
+        calls.append(word)
+        return [word + "_kid"]
+
+    result = cache.lookup_many('wordnet', ['car', 'bike', 'car'], children_of)
+    assert result == {'car': ['coupe'], 'bike': ['bike_kid']}
+    assert calls == ['bike']
+    assert cache.lookup_many('wordnet', ['bike'], children_of) == {'bike': ['bike_kid']}
+    assert calls == ['bike']
+    assert (cache.stats.hits, cache.stats.misses) == (2, 1)
+    assert cache.stats.hit_rate == pytest.approx(2 / 3)
+
+
+def test_second_harvest_is_served_from_cache(tmp_path):
+    parts = {'car': ['engine', 'wheel'], 'coupe': ['door', 'roof']}
+    kids = {'car': ['coupe']}
+    cache = LookupCache(str(tmp_path / "c.sqlite3"))
+
+    def run(url):
+        client = SparqlClient(url, cache=cache, backoff=0.01)
+        try:
+            return asyncio.run(harvest(['car'], lambda w: kids.get(w, []), client=client, cache=cache))
+        finally:
+            client.close()
+
+    with SparqlStandIn(parts) as server:
+        first = run(server.url)
+    assert server.requests == 2
+    with SparqlStandIn({}) as server:
+        assert run(server.url) == first
+    assert server.requests == 0
@@ -0,0 +1,107 @@
+# =============================
+# Truth Maintenance - Rút fact ban đầu (delete / rederive) trên prov
+# =============================
+from typing import Tuple, List, Set, Dict, Iterable, Optional
+
+from ToanHoc import Rule
+from rete import ReteNetwork, ReteSession
+
+
+class TruthMaintenanceSession(ReteSession):
+    """
+    Phiên Rete có thêm retract_fact(). Từ prov giữ ánh xạ ngược tiền đề -> các fact
+    mà biện minh (prov) dùng tới nó. Khi rút một fact ban đầu:
+    1. Xóa mọi fact có biện minh phụ thuộc (trực tiếp hoặc gián tiếp) vào fact đó.
+    2. Suy ra lại các fact bị xóa vẫn còn một luật khác thỏa mãn.
+    """
+
+    def __init__(self, network: ReteNetwork, facts: Iterable[str] = ()):
+        # supports[p] = các fact có prov dùng p làm tiền đề
+        self.supports: Dict[str, Set[str]] = {}
+        super().__init__(network, facts)
+
+    def retract_fact(self, fact: str) -> Tuple[List[str], List[str]]:
+        """Rút một fact ban đầu; trả về (các fact bị mất, các fact được suy ra lại)."""
+        if fact not in self.initial:
+            return [], []
+        self.initial.discard(fact)
+
+        # 1. Xóa quá tay (over-delete) theo chuỗi biện minh trong prov
+        deleted = [fact]
+        seen = {fact}
+        stack = [fact]
+        while stack:
+            f = stack.pop()
+            for d in self.supports.pop(f, ()):
+                # Bỏ qua ánh xạ cũ: d đã thành giả thiết hoặc đổi biện minh
+                if d in seen or d not in self.prov or f not in self.prov[d][1]:
+                    continue
+                seen.add(d)
+                deleted.append(d)
+                stack.append(d)
+
+        for d in deleted:
+            self.known.discard(d)
+            self.prov.pop(d, None)
+        self._deactivate(deleted)
+
+        # 2. Suy ra lại: fact nào còn luật thỏa mãn thì kích hoạt lại và lan truyền qua mạng
+        rederived: List[str] = []
+        pending = deleted
+        while pending:
+            progress = False
+            for d in pending:
+                if d in self.known:
+                    continue
+                pos = self._find_support(d)
+                if pos is not None:
+                    self._agenda.append(pos)
+                    rederived.extend(self._run())
+                    progress = True
+            # Tra cứu bao đóng bỏ qua cây con của fact còn lại (có thể chưa đủ bao đóng sau khi xóa),
+            # nên lặp lại tới khi không suy ra thêm; mạng thường chỉ cần một lượt.
+            if not progress or self.network.closure is None:
+                break
+            pending = [d for d in pending if d not in self.known]
+
+        lost = [d for d in deleted if d not in self.known]
+        return lost, rederived
+
+    def update(self, facts: Set[str]) -> Tuple[List[str], List[str]]:
+        """Đưa tập giả thiết về đúng `facts`: rút các fact bị bỏ, thêm các fact mới."""
+        lost: List[str] = []
+        for fact in self.initial - facts:
+            lost.extend(self.retract_fact(fact)[0])
+        derived = self.assert_facts(facts - self.initial)
+        return lost, derived
+
+    # ---------- Hỗ trợ ----------
+    def _justify(self, r: Rule):
+        for p in r.premises:
+            self.supports.setdefault(p, set()).add(r.conclusion)
+        super()._justify(r)
+
+    def _deactivate(self, facts: List[str]):
+        """Xóa các beta memory có tiền tố chứa fact bị rút (cùng toàn bộ nút con)."""
+        net = self.network
+        stack: List[int] = []
+        for f in facts:
+            stack.extend(net.alpha_beta.get(f, ()))
+        while stack:
+            n = stack.pop()
+            if not self.beta_memory[n]:
+                continue
+            self.beta_memory[n] = 0
+            stack.extend(net.beta_children[n])
+
+    def _find_support(self, fact: str) -> Optional[int]:
+        """Vị trí luật đầu tiên (theo Min/Max) kết luận `fact` và đang thỏa mãn."""
+        net = self.network
+        for pos in net.by_conclusion.get(fact, ()):
+            node = net.rule_node[pos]
+            if node >= 0:
+                if self.beta_memory[node]:
+                    return pos
+            elif any(p in self.known for p in net.rule_source[pos].premises):
+                return pos
+        return None